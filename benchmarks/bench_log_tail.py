@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la lecture de fin de log (log_server.read_log_file)
+
+Génère un log synthétique au format de logging (1 Go par défaut), puis compare
+readlines() sur tout le fichier à la lecture depuis la fin par blocs (log_tail).
+
+Usage :
+    python benchmarks/bench_log_tail.py --size 1G --lines 50,500,5000 --output bench_tail.json
+    python benchmarks/bench_log_tail.py --size 200M --skip-readlines
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vector_index_chatgpt"))
+
+from log_tail import lire_dernieres_lignes, TAIL_BLOCK_SIZE  # noqa: E402
+
+DEFAULT_SIZE = "1G"
+DEFAULT_LINES = "50,500,5000"
+DEFAULT_LOG = os.path.join(tempfile.gettempdir(), "secondmind_bench", "gradio_local_bench.log")
+REPETITIONS = 20
+WRITE_CHUNK = 8 * 1024 * 1024
+
+MESSAGES = (
+    "INFO - Recherche effectuée : '{q}' -> 5 résultats (premier résultat {ms} ms, total {ms2} ms)",
+    "INFO - 📚 Index lexical chargé ({n} termes)",
+    "WARNING - ⚠️ Index online désactivé : délai dépassé ({ms} ms)",
+    "ERROR - ❌ Erreur de recherche : requête vide ({n})",
+    "INFO - ✅ Système initialisé avec {n} documents",
+)
+
+
+def parse_taille(texte):
+    """'200M' → 209715200, '1G' → 1073741824"""
+    texte = texte.strip().upper()
+    facteur = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}.get(texte[-1], 1)
+    return int(float(texte.rstrip('KMG')) * facteur)
+
+
+def generer_log(path, taille, seed=3):
+    """Écrit un log synthétique d'au moins `taille` octets (réutilisé s'il existe déjà)"""
+    if os.path.exists(path) and os.path.getsize(path) >= taille:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = random.Random(seed)
+    debut = datetime(2025, 1, 1)
+    ecrits = 0
+    i = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while ecrits < taille:
+            lignes = []
+            for _ in range(20000):
+                horodatage = (debut + timedelta(milliseconds=i * 250)).strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
+                message = rng.choice(MESSAGES).format(
+                    q="douleur genou", ms=rng.randint(5, 900), ms2=rng.randint(900, 2000), n=rng.randint(1, 10 ** 6)
+                )
+                lignes.append(f"{horodatage} - {message}\n")
+                i += 1
+            bloc = "".join(lignes)
+            f.write(bloc)
+            ecrits += len(bloc.encode("utf-8"))
+
+
+def lecture_readlines(path, lines):
+    """Ancienne implémentation de read_log_file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        all_lines = f.readlines()
+        return [line.strip() for line in all_lines[-lines:]]
+
+
+def mesurer(fn, path, lines, repetitions):
+    durees = []
+    resultat = None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fn(path, lines)
+        durees.append((time.perf_counter() - debut) * 1000)
+    arr = np.asarray(durees)
+    return {
+        'p50_ms': float(np.percentile(arr, 50)),
+        'p95_ms': float(np.percentile(arr, 95)),
+        'max_ms': float(arr.max()),
+    }, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark readlines() vs lecture depuis la fin")
+    parser.add_argument("--size", default=DEFAULT_SIZE, help="taille du log, ex. 200M, 1G")
+    parser.add_argument("--lines", default=DEFAULT_LINES, help="lignes demandées, ex. 50,500")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="fichier de log synthétique")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS)
+    parser.add_argument("--skip-readlines", action="store_true", help="ne mesure pas l'ancienne lecture")
+    parser.add_argument("--output", help="fichier JSON de résultats (défaut : stdout)")
+    args = parser.parse_args()
+
+    taille = parse_taille(args.size)
+    print(f"📝 Préparation du log ({args.size})...")
+    generer_log(args.log, taille)
+
+    resultats = []
+    for lines in (int(n) for n in args.lines.split(",")):
+        tail, attendu = mesurer(lire_dernieres_lignes, args.log, lines, args.repetitions)
+        entree = {'lines': lines, 'tail': tail}
+        if not args.skip_readlines:
+            # readlines() charge tout le fichier : peu de répétitions suffisent
+            complet, reference = mesurer(lecture_readlines, args.log, lines, min(args.repetitions, 3))
+            entree['readlines'] = complet
+            entree['identical'] = reference == attendu
+        resultats.append(entree)
+        print(f"✅ {lines} lignes : p50 {tail['p50_ms']:.3f} ms")
+
+    rapport = {
+        'generated_at': datetime.now().isoformat(),
+        'config': {
+            'log': args.log,
+            'log_bytes': os.path.getsize(args.log),
+            'block_size': TAIL_BLOCK_SIZE,
+            'repetitions': args.repetitions,
+            'platform': platform.platform(),
+        },
+        'results': resultats,
+    }
+
+    sortie = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(sortie)
+        print(f"✅ Résultats écrits dans {args.output}")
+    else:
+        print(sortie)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark du moteur NumPy (numpy_index) face à faiss.IndexFlatL2
+
+Vecteurs aléatoires normalisés (dimension MiniLM), recherche exacte k-NN
+par requête unique et par lot. Mesure latence, débit et rappel par rapport à FAISS.
+--float16 mesure aussi l'index demi-précision écrit sur disque puis mappé (IO_FLAG_MMAP).
+
+Usage :
+    python benchmarks/bench_numpy_index.py --sizes 10k,100k,1M --output bench_numpy.json
+    python benchmarks/bench_numpy_index.py --sizes 100k --threads 1,4 --float16
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vector_index_chatgpt"))
+
+import numpy_index  # noqa: E402
+from bench_search import parse_size  # noqa: E402
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+DEFAULT_SIZES = "10k,100k"
+EMBEDDING_DIM = 384
+N_QUERIES = 200
+BATCH_SIZE = 32
+
+
+def vecteurs_aleatoires(n, d, seed):
+    x = np.random.default_rng(seed).standard_normal((n, d), dtype=np.float32)
+    numpy_index.normalize_L2(x)
+    return x
+
+
+def mesurer(index, queries, k, batch_size):
+    """Latence par requête unique et débit par lots : retourne (stats, ids des requêtes uniques)"""
+    index.search(queries[:1], k)  # échauffement (normes, pool de threads)
+
+    latences, ids = [], []
+    for q in queries:
+        debut = time.perf_counter()
+        _, I = index.search(q[None, :], k)
+        latences.append((time.perf_counter() - debut) * 1000)
+        ids.append(I[0])
+
+    debut = time.perf_counter()
+    for start in range(0, len(queries), batch_size):
+        index.search(queries[start:start + batch_size], k)
+    duree_lots = time.perf_counter() - debut
+
+    arr = np.asarray(latences)
+    return {
+        'p50_ms': float(np.percentile(arr, 50)),
+        'p95_ms': float(np.percentile(arr, 95)),
+        'p99_ms': float(np.percentile(arr, 99)),
+        'qps_single': len(queries) / (arr.sum() / 1000),
+        'qps_batch': len(queries) / duree_lots,
+    }, np.asarray(ids)
+
+
+def rappel(ids, reference):
+    """Part des voisins FAISS retrouvés (recherche exacte : 1.0 attendu en float32)"""
+    trouves = sum(len(np.intersect1d(a, b)) for a, b in zip(ids, reference))
+    return trouves / reference.size
+
+
+def benchmark_taille(n, args):
+    vectors = vecteurs_aleatoires(n, EMBEDDING_DIM, seed=0)
+    queries = vecteurs_aleatoires(args.queries, EMBEDDING_DIM, seed=1)
+    resultat = {'vectors': n, 'dim': EMBEDDING_DIM, 'engines': {}}
+
+    reference = None
+    if faiss is not None:
+        debut = time.perf_counter()
+        index = faiss.IndexFlatL2(EMBEDDING_DIM)
+        index.add(vectors)
+        build = time.perf_counter() - debut
+        stats, reference = mesurer(index, queries, args.k, args.batch)
+        resultat['engines']['faiss.IndexFlatL2'] = dict(stats, build_s=build, threads=faiss.omp_get_max_threads())
+        del index
+
+    variantes = [("float32", False)] + ([("float16 mmap", True)] if args.float16 else [])
+    with tempfile.TemporaryDirectory() as dossier:
+        for threads in args.threads:
+            numpy_index.omp_set_num_threads(threads)
+            for nom_type, demi in variantes:
+                debut = time.perf_counter()
+                index = numpy_index.IndexFlatL2(EMBEDDING_DIM)
+                index.add(vectors)
+                if demi:
+                    # Variante servie en production : float16 sur disque, vecteurs mappés
+                    chemin = os.path.join(dossier, "index_float16.faiss")
+                    numpy_index.write_index(index.to_float16(), chemin)
+                    index = numpy_index.read_index(chemin, numpy_index.IO_FLAG_MMAP)
+                build = time.perf_counter() - debut
+                stats, ids = mesurer(index, queries, args.k, args.batch)
+                if reference is not None:
+                    stats['recall_vs_faiss'] = rappel(ids, reference)
+                resultat['engines'][f"numpy_index.IndexFlatL2[{nom_type}, {threads} threads]"] = dict(
+                    stats, build_s=build, threads=threads
+                )
+                print(f"✅ {n} vecteurs, {nom_type}, {threads} threads : p50 {stats['p50_ms']:.2f} ms")
+                del index  # mmap fermé avant la suppression du dossier (Windows)
+    return resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark numpy_index vs faiss.IndexFlatL2")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="tailles du corpus, ex. 10k,100k,1M")
+    parser.add_argument("--queries", type=int, default=N_QUERIES)
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", default=str(os.cpu_count() or 1), help="ex. 1,4,8")
+    parser.add_argument("--float16", action="store_true", help="mesure aussi l'index demi-précision mappé")
+    parser.add_argument("--output", help="fichier JSON de résultats (défaut : stdout)")
+    args = parser.parse_args()
+    args.threads = [int(t) for t in args.threads.split(",")]
+
+    if faiss is None:
+        print("⚠️ faiss-cpu non installé : pas de référence ni de mesure de rappel")
+
+    rapport = {
+        'generated_at': datetime.now().isoformat(),
+        'config': {
+            'sizes': args.sizes,
+            'queries': args.queries,
+            'batch': args.batch,
+            'k': args.k,
+            'block_size': numpy_index.SEARCH_BLOCK_SIZE,
+            'numpy': np.__version__,
+            'faiss': faiss.__version__ if faiss is not None else None,
+            'platform': platform.platform(),
+        },
+        'results': [benchmark_taille(parse_size(taille), args) for taille in args.sizes.split(",")],
+    }
+
+    sortie = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(sortie)
+        print(f"✅ Résultats écrits dans {args.output}")
+    else:
+        print(sortie)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de charge et de latence pour la recherche SecondMind RAG
+
+Génère des conversations synthétiques (formats "role|contenu" et "user: ..."),
+construit les index par le chemin de vectorisation réel (ingestion.py, FAISS,
+BM25, colonnes de métadonnées), puis interroge LocalRAGSystem en parallèle
+avec un mélange de requêtes. Résultats JSON : p50/p95/p99, QPS, mémoire.
+
+Usage :
+    python benchmarks/bench_search.py --sizes 10k,100k --stub --threads 8 --output bench.json
+    python benchmarks/bench_search.py --sizes 1M,5M --stub --queries 5000
+
+--stub remplace MiniLM par un encodeur déterministe (hachage de termes) :
+hors ligne, rapide et reproductible. Sans --stub, le vrai modèle est utilisé.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import zlib
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vector_index_chatgpt"))
+
+from vector_backend import faiss, BACKEND_NAME  # noqa: E402
+from ingestion import extraire_documents, sauvegarder_documents_partages  # noqa: E402
+from lexical_index import tokeniser  # noqa: E402
+from federated_search import LOCAL_INDEX_NAME  # noqa: E402
+from hierarchical_index import BlockIndex, BLOCKS_INDEX_FILENAME  # noqa: E402
+
+DEFAULT_SIZES = "10k,100k"
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "secondmind_bench")
+EMBEDDING_DIM = 384
+ENCODE_BATCH = 10000
+STUB_TABLE_SIZE = 1 << 14
+
+MOTS = (
+    "douleur main droite genou dos tête fatigue sommeil mémoire règle logique alignement "
+    "agent contexte index vecteur recherche script fichier erreur journal conversation "
+    "hypothèse doute correction dérive intention objectif tâche projet rappel semaine "
+    "matin soir médecin exercice lecture écriture question réponse résumé analyse"
+).split()
+
+# Mélange de requêtes : (type, poids)
+QUERY_MIX = (
+    ("vector", 30),
+    ("hybrid", 20),
+    ("lexical", 20),
+    ("vector_filtre", 10),
+    ("range", 5),
+    ("hierarchical", 5),
+    ("recent", 5),
+    ("position", 5),
+)
+
+
+def parse_size(texte):
+    """'10k' → 10000, '1M' → 1000000"""
+    texte = texte.strip().lower()
+    facteur = {'k': 1_000, 'm': 1_000_000}.get(texte[-1], 1)
+    return int(float(texte.rstrip('km')) * facteur)
+
+
+def generer_conversations(path, n_lignes, seed=42):
+    """Écrit un fichier de conversations synthétiques dans les formats reconnus par l'ingestion"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        tour = 0
+        for i in range(n_lignes):
+            tirage = rng.random()
+            if tirage < 0.02:
+                # Une conversation datée tous les ~50 lignes, sur environ un an par 10k lignes
+                date = datetime(2024, 1, 1) + timedelta(days=i * 0.036)
+                f.write(f"=== Conversation {i} {date.isoformat(sep=' ', timespec='minutes')} ===\n")
+                continue
+            if tirage < 0.05:
+                f.write("\n")
+                continue
+            role = "user" if tour % 2 == 0 else "assistant"
+            tour += 1
+            mots = rng.choices(MOTS, k=rng.randint(5, 30))
+            if rng.random() < 0.1:
+                mots.append(f"ERR_{rng.randint(0, 9999)}")
+            if rng.random() < 0.05:
+                mots.append(f"script_{rng.randint(0, 500)}.py")
+            contenu = " ".join(mots)
+            if rng.random() < 0.5:
+                f.write(f"{role}|{contenu}\n")
+            else:
+                f.write(f"{role}: {contenu}\n")
+
+
+class StubEncoder:
+    """Encodeur déterministe par hachage de termes (même interface que SentenceTransformer.encode)
+
+    Les textes partageant des termes ont des vecteurs proches : la recherche reste réaliste.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, seed=0):
+        rng = np.random.default_rng(seed)
+        self.table = rng.standard_normal((STUB_TABLE_SIZE, dim)).astype(np.float32)
+
+    def encode(self, texts, **kwargs):
+        offsets, ids = [], []
+        for texte in texts:
+            offsets.append(len(ids))
+            ids.append(0)  # terme constant : aucun texte n'a une somme vide
+            ids.extend(zlib.crc32(t.encode()) % STUB_TABLE_SIZE for t in tokeniser(texte))
+        vectors = np.add.reduceat(self.table[np.asarray(ids)], np.asarray(offsets), axis=0)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def rss_mb():
+    """Mémoire résidente du processus (Mo)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 ** 2)
+    except ImportError:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / (1024 ** 2) if sys.platform == "darwin" else maxrss / 1024
+
+
+def construire_index(source, index_dir, encoder):
+    """Chemin de vectorisation : ingestion → embeddings → FAISS + fichiers partagés"""
+    timings = {}
+    os.makedirs(os.path.join(index_dir, LOCAL_INDEX_NAME), exist_ok=True)
+
+    debut = time.perf_counter()
+    with open(source, "r", encoding="utf-8") as f:
+        all_lines = f.readlines()
+    contenus, metadatas, stats = extraire_documents(all_lines)
+    del all_lines
+    timings['ingestion_s'] = time.perf_counter() - debut
+
+    # Index plat produit scalaire, comme vectorize_local_fixed.py, mais sans objets Document
+    debut = time.perf_counter()
+    index = None
+    for start in range(0, len(contenus), ENCODE_BATCH):
+        batch = encoder.encode(contenus[start:start + ENCODE_BATCH], normalize_embeddings=True)
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if index is None:
+            index = faiss.IndexFlatIP(batch.shape[1])
+        index.add(batch)
+    timings['embedding_faiss_s'] = time.perf_counter() - debut
+    faiss.write_index(index, os.path.join(index_dir, LOCAL_INDEX_NAME, "index.faiss"))
+
+    debut = time.perf_counter()
+    lexical, columns = sauvegarder_documents_partages(contenus, metadatas, index_dir)
+    timings['fichiers_partages_s'] = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    blocks = BlockIndex.build(index, columns.conversations)
+    blocks.save(os.path.join(index_dir, LOCAL_INDEX_NAME, BLOCKS_INDEX_FILENAME))
+    timings['index_conversations_s'] = time.perf_counter() - debut
+
+    return len(contenus), stats, timings
+
+
+def preparer_requetes(n, max_ligne, seed=7):
+    """Tire un mélange reproductible de requêtes"""
+    rng = random.Random(seed)
+    types = [t for t, _ in QUERY_MIX]
+    poids = [w for _, w in QUERY_MIX]
+    requetes = []
+    for _ in range(n):
+        kind = rng.choices(types, poids)[0]
+        texte = " ".join(rng.choices(MOTS, k=rng.randint(1, 5)))
+        if kind == "lexical" and rng.random() < 0.3:
+            texte = f"ERR_{rng.randint(0, 9999)}"
+        ligne = rng.randint(1, max_ligne)
+        requetes.append((kind, texte, ligne))
+    return requetes
+
+
+def executer_requete(rag, requete, k):
+    kind, texte, ligne = requete
+    if kind == "position":
+        return rag.get_line(ligne, voisins=2)
+    if kind == "vector_filtre":
+        filters = {'role': 'assistant', 'ligne_min': max(1, ligne - 5000), 'ligne_max': ligne + 5000}
+        return rag.search_similar(texte, k, mode="vector", filters=filters)
+    return rag.search_similar(texte, k, mode=kind)
+
+
+def percentiles(latences):
+    if not latences:
+        return {}
+    arr = np.asarray(latences)
+    return {
+        'count': len(arr),
+        'mean_ms': float(arr.mean()),
+        'p50_ms': float(np.percentile(arr, 50)),
+        'p95_ms': float(np.percentile(arr, 95)),
+        'p99_ms': float(np.percentile(arr, 99)),
+        'max_ms': float(arr.max()),
+    }
+
+
+def mesurer_charge(rag, requetes, threads, k):
+    """Exécute les requêtes en parallèle et mesure latences et débit"""
+    latences = {t: [] for t, _ in QUERY_MIX}
+    erreurs = []
+    verrou = threading.Lock()
+
+    def run(requete):
+        debut = time.perf_counter()
+        results, status = executer_requete(rag, requete, k)
+        duree = (time.perf_counter() - debut) * 1000
+        with verrou:
+            latences[requete[0]].append(duree)
+            if status.startswith("❌"):
+                erreurs.append(status)
+
+    # Échauffement (caches, premiers appels FAISS)
+    for requete in requetes[:min(50, len(requetes))]:
+        executer_requete(rag, requete, k)
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run, requetes))
+    duree_totale = time.perf_counter() - debut
+
+    toutes = [x for valeurs in latences.values() for x in valeurs]
+    return {
+        'threads': threads,
+        'queries': len(requetes),
+        'duration_s': duree_totale,
+        'qps': len(requetes) / duree_totale if duree_totale else None,
+        'errors': len(erreurs),
+        'first_errors': sorted(set(erreurs))[:5],
+        'latency_ms': dict(
+            {'all': percentiles(toutes)},
+            **{kind: percentiles(valeurs) for kind, valeurs in latences.items()}
+        ),
+    }
+
+
+def taille_dossier(path):
+    return sum(
+        os.path.getsize(os.path.join(racine, nom))
+        for racine, _, fichiers in os.walk(path) for nom in fichiers
+    )
+
+
+def benchmark_taille(n_lignes, args, encoder):
+    from app_gradio_local import LocalRAGSystem
+
+    source = os.path.join(args.workdir, f"conversations_{n_lignes}.txt")
+    index_dir = os.path.join(args.workdir, f"index_{n_lignes}")
+    if not os.path.exists(source):
+        print(f"📝 Génération de {n_lignes} lignes synthétiques...")
+        generer_conversations(source, n_lignes)
+
+    print(f"🏗️ Construction des index ({n_lignes} lignes)...")
+    rss_avant = rss_mb()
+    n_docs, stats, timings = construire_index(source, index_dir, encoder)
+
+    rag = LocalRAGSystem(index_dir=index_dir)
+    debut = time.perf_counter()
+    success, message = rag.initialize(load_model=not args.stub)
+    if not success:
+        raise RuntimeError(message)
+    if args.stub:
+        rag.model = encoder
+    timings['chargement_s'] = time.perf_counter() - debut
+    rss_charge = rss_mb()
+
+    print(f"⚡ {args.queries} requêtes sur {args.threads} threads...")
+    requetes = preparer_requetes(args.queries, n_lignes)
+    charge = mesurer_charge(rag, requetes, args.threads, args.k)
+
+    return {
+        'lines': n_lignes,
+        'documents': n_docs,
+        'roles': stats,
+        'timings': timings,
+        'index_mb': taille_dossier(index_dir) / (1024 ** 2),
+        'rss_mb': {'before_build': rss_avant, 'after_load': rss_charge, 'after_queries': rss_mb()},
+        **charge,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de recherche SecondMind RAG")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="tailles en lignes, ex. 10k,100k,1M,5M")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--stub", action="store_true", help="encodeur déterministe hors ligne")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--output", help="fichier JSON de résultats (défaut : stdout)")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    if args.stub:
+        encoder = StubEncoder()
+    else:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer('all-MiniLM-L6-v2')
+
+    rapport = {
+        'generated_at': datetime.now().isoformat(),
+        'config': {
+            'sizes': args.sizes,
+            'queries': args.queries,
+            'threads': args.threads,
+            'k': args.k,
+            'encoder': 'stub' if args.stub else 'all-MiniLM-L6-v2',
+            'query_mix': dict(QUERY_MIX),
+            'python': platform.python_version(),
+            'backend': BACKEND_NAME,
+            'faiss': faiss.__version__,
+            'platform': platform.platform(),
+        },
+        'results': [],
+    }
+    for taille in args.sizes.split(","):
+        rapport['results'].append(benchmark_taille(parse_size(taille), args, encoder))
+
+    sortie = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(sortie)
+        print(f"✅ Résultats écrits dans {args.output}")
+    else:
+        print(sortie)
+
+
+if __name__ == "__main__":
+    main()
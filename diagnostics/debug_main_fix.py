@@ -10,9 +10,18 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Chargement FAISS avec gestion d'erreur
-DB_FAISS_PATH = "Logs/vector_index_chatgpt"
+DB_FAISS_PATH = "Logs/vector_index_chatgpt/online"
 embedding = OpenAIEmbeddings()
 
+# Seuil de pertinence : les documents sous ce score ne partent pas dans le contexte du LLM
+MAX_DOCUMENTS = 3
+SCORE_MIN = 0.75
+
+
+def similarite_cosinus(distance):
+    """Distance L2² entre embeddings OpenAI (normalisés) → similarité cosinus"""
+    return 1.0 - distance / 2.0
+
 print("🔄 Tentative de chargement de l'index FAISS...")
 
 try:
@@ -20,7 +29,8 @@ try:
     vectorstore = FAISS.load_local(
         DB_FAISS_PATH, 
         embedding, 
-        allow_dangerous_deserialization=True
+        allow_dangerous_deserialization=True,
+        relevance_score_fn=similarite_cosinus
     )
     print("✅ Index FAISS chargé avec succès (méthode normale)")
     
@@ -49,7 +59,8 @@ except Exception as e1:
             embedding_function=embedding,
             index=index,
             docstore=store_data.get('docstore', {}),
-            index_to_docstore_id=store_data.get('index_to_docstore_id', {})
+            index_to_docstore_id=store_data.get('index_to_docstore_id', {}),
+            relevance_score_fn=similarite_cosinus
         )
         print("✅ Vectorstore reconstruit manuellement")
         
@@ -64,12 +75,15 @@ except Exception as e1:
 
 # Test du retriever
 print("\n🔍 TEST DU RETRIEVER :")
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+retriever = vectorstore.as_retriever(
+    search_type="similarity_score_threshold",
+    search_kwargs={"k": MAX_DOCUMENTS, "score_threshold": SCORE_MIN}
+)
 
 test_query = "douleur main droite"
 try:
     docs = retriever.get_relevant_documents(test_query)
-    print(f"📄 DOCUMENTS TROUVÉS ({len(docs)}) :")
+    print(f"📄 DOCUMENTS TROUVÉS ({len(docs)}, score ≥ {SCORE_MIN}) :")
     for i, doc in enumerate(docs):
         print(f"\n--- Document {i+1} ---")
         print(f"Contenu: {doc.page_content[:200]}...")
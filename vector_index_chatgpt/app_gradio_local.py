@@ -7,63 +7,155 @@ Version corrigée avec chemins absolus et améliorations
 import os
 import sys
 import json
-import gradio as gr
 from datetime import datetime
 from sentence_transformers import SentenceTransformer
-import faiss
+from vector_backend import faiss
 import pickle
 import numpy as np
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+import search_api
+from lexical_index import BM25Index, LEXICAL_INDEX_FILENAME, fusion_rrf
+from metadata_columns import MetadataColumns, METADATA_COLUMNS_FILENAME
+from mmap_store import DocumentStore, DOCUMENTS_STORE_FILENAME, charger_faiss
+from search_metrics import metrics
+from hierarchical_index import BlockIndex, BLOCKS_INDEX_FILENAME
+from diversification import MMR_LAMBDA, MMR_MIN_CANDIDATES, MMR_OVERFETCH, selection_mmr
+from recency import RECENCY_HALF_LIFE_DAYS, RECENCY_MIN_CANDIDATES, RECENCY_OVERFETCH, scores_recence
+from federated_search import (
+    LOCAL_INDEX_NAME, ONLINE_INDEX_NAME, OnlineIndex, fusion_scores, rayon_faiss, similarite_faiss,
+    similarite_l2
+)
 
 # Configuration des chemins absolus
 BASE_DIR = r"C:\Users\rag_personnel\Logs"
 INDEX_DIR = os.path.join(BASE_DIR, "vector_index_chatgpt")
 INDEX_FILE = os.path.join(INDEX_DIR, "index.pkl")
-FAISS_INDEX = os.path.join(INDEX_DIR, "index.faiss")
+FAISS_INDEX = os.path.join(INDEX_DIR, LOCAL_INDEX_NAME, "index.faiss")
+ONLINE_FAISS_INDEX = os.path.join(INDEX_DIR, ONLINE_INDEX_NAME, "index.faiss")
 CONVERSATIONS_FILE = os.path.join(BASE_DIR, "conversations_extraites.txt")
 LOG_FILE = os.path.join(BASE_DIR, "gradio_local.log")
+QUERY_CACHE_SIZE = 1024
+SEARCH_MODES = ("vector", "hybrid", "lexical", "federated", "range", "hierarchical", "recent")
+RANGE_MIN_SCORE = 0.4  # similarité cosinus minimale par défaut du mode "range"
+HYBRID_OVERFETCH = 4
+HYBRID_MIN_CANDIDATES = 20
+HIERARCHICAL_BLOCKS = 8  # conversations retenues par l'index grossier
+FEDERATED_ONLINE_TIMEOUT = 0.25  # secondes d'attente max de l'index online après le local (au-delà : local seul)
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Configuration du logging (au lancement de l'application ou d'un worker, pas à l'import :
+# les benchmarks importent LocalRAGSystem sans écrire dans le log de production)
+def configurer_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
 
 class LocalRAGSystem:
-    def __init__(self):
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
         self.model = None
         self.vectorstore = None
+        self.lexical = None
+        self.columns = None
+        self.blocks = None
+        self.online = None
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="federation")
         self.texts = None
+        self.metadatas = None
         self.embeddings = None
         
-    def initialize(self):
-        """Initialise le système RAG local"""
+    def initialize(self, load_model=True, mmap=False):
+        """Initialise le système RAG local
+
+        load_model=False permet un démarrage en mode lexical seul, sans modèle neuronal.
+        mmap=True ouvre les index en lecture seule via mmap (processus de service multiples :
+        une seule copie en mémoire, dans le cache de pages). Repli sur index.pkl si
+        documents.npz n'existe pas encore (relancer la vectorisation).
+        """
         try:
             logging.info("🚀 Démarrage du système RAG LOCAL...")
             
             # Chargement du modèle
-            logging.info("📥 Chargement du modèle SentenceTransformer...")
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            if load_model:
+                logging.info("📥 Chargement du modèle SentenceTransformer...")
+                self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            
+            index_file = os.path.join(self.index_dir, "index.pkl")
+            faiss_index = os.path.join(self.index_dir, LOCAL_INDEX_NAME, "index.faiss")
+            lexical_index = os.path.join(self.index_dir, LEXICAL_INDEX_FILENAME)
+            metadata_columns = os.path.join(self.index_dir, METADATA_COLUMNS_FILENAME)
+            documents_store = os.path.join(self.index_dir, DOCUMENTS_STORE_FILENAME)
+            if mmap and not (os.path.exists(documents_store) and os.path.exists(metadata_columns)):
+                logging.warning("⚠️ documents.npz absent : chargement complet de index.pkl (sans mmap)")
+                mmap_documents = False
+            else:
+                mmap_documents = mmap
             
             # Vérification des fichiers
-            if not os.path.exists(INDEX_FILE):
-                raise FileNotFoundError(f"Index introuvable : {INDEX_FILE}")
-            if not os.path.exists(FAISS_INDEX):
-                raise FileNotFoundError(f"Index FAISS introuvable : {FAISS_INDEX}")
+            if not mmap_documents and not os.path.exists(index_file):
+                raise FileNotFoundError(f"Index introuvable : {index_file}")
+            if not os.path.exists(faiss_index):
+                raise FileNotFoundError(f"Index FAISS introuvable : {faiss_index}")
                 
             # Chargement de l'index
             logging.info("📂 Chargement des données vectorisées...")
-            with open(INDEX_FILE, 'rb') as f:
-                data = pickle.load(f)
-                self.texts = data['texts']
-                self.embeddings = data['embeddings']
+            if mmap_documents:
+                # Textes mappés ; rôle et ligne lus dans les colonnes de métadonnées
+                self.texts = DocumentStore.load(documents_store, mmap=True)
+                self.metadatas, self.embeddings = None, None
+            else:
+                with open(index_file, 'rb') as f:
+                    data = pickle.load(f)
+                self.texts, self.metadatas, self.embeddings = charger_documents(data)
+            self._encode_query.cache_clear()
             
             # Chargement de l'index FAISS
-            self.vectorstore = faiss.read_index(FAISS_INDEX)
+            self.vectorstore = charger_faiss(faiss_index, mmap)
+            
+            # Index lexical BM25 (optionnel, produit par les scripts de vectorisation)
+            if os.path.exists(lexical_index):
+                self.lexical = BM25Index.load(lexical_index, mmap)
+                logging.info(f"📚 Index lexical chargé ({len(self.lexical.terms)} termes)")
+            else:
+                self.lexical = None
+                logging.warning(f"⚠️ Index lexical introuvable : {lexical_index}")
+            
+            # Colonnes de métadonnées (filtres rôle / ligne / horodatage)
+            self.columns = None
+            if os.path.exists(metadata_columns):
+                self.columns = MetadataColumns.load(metadata_columns, mmap)
+                if len(self.columns) != len(self.texts):
+                    logging.warning("⚠️ Colonnes de métadonnées désalignées (filtres désactivés) : relancez la vectorisation")
+                    self.columns = None
+            else:
+                logging.warning(f"⚠️ Colonnes de métadonnées introuvables : {metadata_columns}")
+            if self.columns is None and self.metadatas is None:
+                # documents.npz sans colonnes utilisables : textes, rôles et lignes relus dans index.pkl
+                with open(index_file, 'rb') as f:
+                    data = pickle.load(f)
+                self.texts, self.metadatas, self.embeddings = charger_documents(data)
+            
+            # Index grossier des conversations (recherche hiérarchique), facultatif
+            blocks_index = os.path.join(self.index_dir, LOCAL_INDEX_NAME, BLOCKS_INDEX_FILENAME)
+            self.blocks = None
+            if os.path.exists(blocks_index):
+                self.blocks = BlockIndex.load(blocks_index, mmap)
+                if self.blocks.n_docs != len(self.texts):
+                    logging.warning("⚠️ Index des conversations désaligné : relancez la vectorisation")
+                    self.blocks = None
+            
+            # Index online (OpenAI) pour la recherche fédérée, facultatif
+            self.online = OnlineIndex(os.path.join(self.index_dir, ONLINE_INDEX_NAME, "index.faiss"))
+            if self.online.load(len(self.texts)):
+                logging.info("🌐 Index online chargé : recherche fédérée disponible")
             
             logging.info(f"✅ Système initialisé avec {len(self.texts)} documents")
             return True, f"✅ Système prêt avec {len(self.texts)} documents"
@@ -73,37 +165,368 @@ class LocalRAGSystem:
             logging.error(error_msg)
             return False, error_msg
     
-    def search_similar(self, query, k=5):
-        """Recherche de documents similaires"""
+    def search_similar(self, query, k=5, mode="vector", filters=None, expand_context=0,
+                       min_score=None, mmr_lambda=None, demi_vie=None):
+        """Recherche de documents similaires
+
+        mode : "vector" (MiniLM + FAISS), "lexical" (BM25 seul, sans modèle),
+        "hybrid" (fusion RRF des deux classements), "federated" (index local et online
+        interrogés en parallèle, repli automatique sur le local si l'online est indisponible)
+        "range" (tous les documents de similarité cosinus ≥ min_score, k au plus),
+        "hierarchical" (conversations proches d'abord, puis seulement leurs lignes)
+        ou "recent" (similarité pondérée par l'âge, demi-vie demi_vie jours).
+        filters : dict optionnel (role, ligne_min, ligne_max, timestamp_min, timestamp_max, jours),
+        appliqué pendant la recherche et non après.
+        expand_context : nombre de tours adjacents (±N) ajoutés à chaque résultat sous 'context'.
+        mmr_lambda : si fourni (0-1), diversification MMR des candidats sur-échantillonnés
+        et suppression des quasi-doublons (1 = pertinence seule).
+        """
+        with metrics.span("local.search"):
+            try:
+                with metrics.span("local.normalisation"):
+                    query = normaliser_requete(query)
+                if mode not in SEARCH_MODES:
+                    return [], f"❌ Mode de recherche inconnu : {mode}"
+                metrics.incr("queries", mode=mode)
+                if self.texts is None:
+                    return [], "❌ Système non initialisé"
+                if mode in ("lexical", "hybrid") and self.lexical is None:
+                    return [], "❌ Index lexical absent : relancez la vectorisation"
+                if mode != "lexical" and (not self.model or not self.vectorstore):
+                    return [], "❌ Système non initialisé"
+                if mode == "hierarchical" and self.blocks is None:
+                    return [], "❌ Index des conversations absent : relancez la vectorisation"
+                if mode == "recent" and self.columns is None:
+                    return [], "❌ Horodatages indisponibles : relancez la vectorisation"
+            
+                mask = None
+                if filters:
+                    if self.columns is None:
+                        return [], "❌ Filtres indisponibles : relancez la vectorisation"
+                    with metrics.span("local.filters"):
+                        mask = self.columns.mask(**filters)
+                    if mask is not None and not mask.any():
+                        return [], "✅ 0 résultats trouvés (aucun document ne satisfait les filtres)"
+                # bitmap doit rester référencé jusqu'à la fin des recherches (pointeur côté C++)
+                params, bitmap = parametres_recherche(mask)
+                detail = ""
+                # Avec MMR, la recherche ramène un pool de candidats réduit ensuite à k
+                k_recherche = k if mmr_lambda is None else max(k * MMR_OVERFETCH, MMR_MIN_CANDIDATES)
+            
+                if mode == "vector":
+                    distances, indices = self._vector_search(query, k_recherche, params)
+                    scores = similarite_faiss(distances, self.vectorstore.metric_type)
+                    hits = [
+                        (idx, float(score), float(distance))
+                        for score, distance, idx in zip(scores, distances, indices)
+                    ]
+                elif mode == "range":
+                    min_score = RANGE_MIN_SCORE if min_score is None else float(min_score)
+                    scores, indices = self._range_search(query, min_score, k_recherche, params)
+                    hits = [(idx, float(score), None) for score, idx in zip(scores, indices)]
+                    detail = f" (score ≥ {min_score:.2f})"
+                elif mode == "lexical":
+                    with metrics.span("local.lexical"):
+                        scores, indices = self.lexical.search(query, k_recherche, mask)
+                    hits = [(idx, float(score), None) for score, idx in zip(scores, indices)]
+                elif mode == "federated":
+                    hits, detail = self._federated_search(query, k_recherche, params)
+                elif mode == "hierarchical":
+                    scores, indices = self._hierarchical_search(query, k_recherche, mask)
+                    hits = [(idx, float(score), None) for score, idx in zip(scores, indices)]
+                elif mode == "recent":
+                    demi_vie = RECENCY_HALF_LIFE_DAYS if demi_vie is None else float(demi_vie)
+                    hits = self._recency_search(query, k_recherche, params, demi_vie)
+                    detail = f" (demi-vie {demi_vie:g} j)"
+                else:
+                    # Sur-échantillonnage des deux côtés avant fusion des rangs
+                    n_candidates = max(k_recherche * HYBRID_OVERFETCH, HYBRID_MIN_CANDIDATES)
+                    distances, vector_ids = self._vector_search(query, n_candidates, params)
+                    with metrics.span("local.lexical"):
+                        _, lexical_ids = self.lexical.search(query, n_candidates, mask)
+                    distance_by_id = dict(zip(vector_ids.tolist(), distances.tolist()))
+                    hits = [
+                        (idx, score, distance_by_id.get(idx))
+                        for idx, score in fusion_rrf([vector_ids, lexical_ids], k_recherche)
+                    ]
+                
+                if mmr_lambda is not None:
+                    with metrics.span("local.mmr"):
+                        hits = self._diversifier(hits, k, float(mmr_lambda))
+                    detail += " (diversifiés)"
+            
+                with metrics.span("local.fetch"):
+                    results = []
+                    for rank, (idx, score, distance) in enumerate(hits, start=1):
+                        result = self._document(idx)
+                        result.update({'rank': rank, 'score': score, 'distance': distance})
+                        results.append(result)
+                    if expand_context:
+                        self.attach_context(results, expand_context)
+            
+                return results, f"✅ {len(results)} résultats trouvés{detail}"
+            
+            except Exception as e:
+                error_msg = f"❌ Erreur de recherche : {str(e)}"
+                logging.error(error_msg)
+                metrics.incr("search_errors", mode=mode)
+                return [], error_msg
+
+    def search_progressive(self, query, k=5, mode="vector", filters=None, expand_context=0,
+                           min_score=None, mmr_lambda=None, demi_vie=None):
+        """Générateur de recherche par étapes : yield (results, status, final)
+
+        En mode hybride, le classement BM25 (sans modèle, quelques ms) est livré d'abord,
+        puis la fusion. Le contexte adjacent est ajouté en dernière étape.
+        """
+        if mode == "hybrid" and self.lexical is not None:
+            results, status = self.search_similar(query, k, mode="lexical", filters=filters)
+            if results:
+                yield results, status, False
+        
+        results, status = self.search_similar(query, k, mode=mode, filters=filters, min_score=min_score,
+                                              mmr_lambda=mmr_lambda, demi_vie=demi_vie)
+        if expand_context and results:
+            yield results, status, False
+            self.attach_context(results, expand_context)
+        yield results, status, True
+
+    def attach_context(self, results, n):
+        """Ajoute à chaque résultat ses ±n tours adjacents (clé 'context')"""
+        if self.columns is None:
+            return results
+        for result in results:
+            idx = result['id']
+            result['context'] = [
+                self._document(i) for i in self.columns.neighbours(idx, n) if i != idx
+            ]
+        return results
+
+    def get_line(self, ligne, voisins=0):
+        """Accès positionnel : document à une ligne donnée et ses ±voisins tours, sans embedding"""
         try:
-            if not self.model or not self.vectorstore:
+            if self.texts is None:
                 return [], "❌ Système non initialisé"
+            if self.columns is None:
+                return [], "❌ Index positionnel indisponible : relancez la vectorisation"
             
-            # Vectorisation de la requête
-            query_embedding = self.model.encode([query])
-            
-            # Recherche dans l'index FAISS
-            distances, indices = self.vectorstore.search(
-                query_embedding.astype('float32'), k
-            )
+            doc_id = self.columns.doc_for_line(int(ligne))
+            if doc_id is None:
+                return [], f"❌ Ligne {ligne} hors de l'index"
             
             results = []
-            for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx < len(self.texts):
-                    results.append({
-                        'rank': i + 1,
-                        'text': self.texts[idx],
-                        'score': float(1 - distance),  # Conversion en similarité
-                        'distance': float(distance)
-                    })
-            
-            return results, f"✅ {len(results)} résultats trouvés"
+            for i in self.columns.neighbours(doc_id, int(voisins)):
+                result = self._document(i)
+                result['offset'] = i - doc_id
+                results.append(result)
+            return results, f"✅ {len(results)} tours autour de la ligne {ligne}"
             
         except Exception as e:
-            error_msg = f"❌ Erreur de recherche : {str(e)}"
+            error_msg = f"❌ Erreur d'accès positionnel : {str(e)}"
             logging.error(error_msg)
             return [], error_msg
 
+    def _document(self, idx):
+        """Texte et métadonnées d'un document par id FAISS"""
+        date = self.columns.date(idx) if self.columns is not None else None
+        if self.metadatas is None:
+            return {'id': int(idx), 'text': self.texts[idx], 'ligne': int(self.columns.lignes[idx]),
+                    'role': self.columns.role(idx), 'date': date}
+        meta = self.metadatas[idx]
+        return {'id': int(idx), 'text': self.texts[idx], 'ligne': meta.get('ligne'), 'role': meta.get('role'),
+                'date': date}
+
+    def _diversifier(self, hits, k, mmr_lambda):
+        """Réduit les candidats à k résultats variés (MMR sur les vecteurs relus dans l'index)"""
+        if len(hits) <= 1:
+            return hits[:k]
+        ids = np.fromiter((hit[0] for hit in hits), dtype=np.int64, count=len(hits))
+        vectors = self.vectorstore.reconstruct_batch(ids)
+        faiss.normalize_L2(vectors)
+        relevance = np.fromiter((hit[1] for hit in hits), dtype=np.float32, count=len(hits))
+        return [hits[i] for i in selection_mmr(relevance, vectors, k, mmr_lambda)]
+
+    def _federated_search(self, query, k, params=None):
+        """Recherche fédérée local + online : retourne (hits, détail de la source)
+
+        L'appel online part en parallèle de la recherche locale. S'il est indisponible
+        (pas de clé, index absent, échec récent), il n'est pas attendu du tout ; s'il est
+        seulement lent, il n'est attendu que FEDERATED_ONLINE_TIMEOUT après le local
+        (résultats locaux seuls, l'index online n'est suspendu que sur un échec réel).
+        """
+        n_candidates = max(k * HYBRID_OVERFETCH, HYBRID_MIN_CANDIDATES)
+        online_future = None
+        if self.online is not None and self.online.available():
+            online_future = self._executor.submit(self.online.search, query, n_candidates, params)
+            online_future.add_done_callback(self._online_termine)
+        
+        distances, local_ids = self._vector_search(query, n_candidates, params)
+        listes = [(similarite_faiss(distances, self.vectorstore.metric_type), local_ids)]
+        source = "local seul"
+        if online_future is not None:
+            try:
+                online_distances, online_ids = online_future.result(timeout=FEDERATED_ONLINE_TIMEOUT)
+            except FutureTimeoutError:
+                source = "local seul, online trop lent"
+            except Exception:
+                source = "local seul, online en échec"  # suspendu par _online_termine
+            else:
+                listes.append((similarite_l2(online_distances), online_ids))
+                source = "local + online"
+        
+        distance_by_id = dict(zip(local_ids.tolist(), distances.tolist()))
+        hits = [
+            (idx, score, distance_by_id.get(idx))
+            for idx, score in fusion_scores(listes, k)
+        ]
+        return hits, f" (fédéré : {source})"
+
+    def _online_termine(self, future):
+        """Suspend l'index online sur un échec, même arrivé après le délai d'attente"""
+        erreur = future.exception()
+        if erreur is not None:
+            self.online.mark_down(str(erreur) or type(erreur).__name__)
+
+    def _vector_search(self, query, k, params=None):
+        """Recherche FAISS brute : retourne (distances, ids) sans les ids invalides (-1)
+
+        Les filtres arrivent sous forme de SearchParameters (IDSelector) :
+        les vecteurs exclus ne sont jamais comparés.
+        """
+        with metrics.span("local.embedding"):
+            query_embedding = self._embedding(query)
+        with metrics.span("local.ann"):
+            if params is None:
+                distances, indices = self.vectorstore.search(query_embedding, k)
+            else:
+                distances, indices = self.vectorstore.search(query_embedding, k, params=params)
+        valid = (indices[0] >= 0) & (indices[0] < len(self.texts))
+        return distances[0][valid], indices[0][valid]
+
+    def _recency_search(self, query, k, params, demi_vie):
+        """Similarité pondérée par la récence : retourne les hits (id, score combiné, distance)
+
+        Pool FAISS sur-échantillonné (filtres et fenêtre temporelle déjà appliqués par le
+        sélecteur), puis score combiné et tri en une passe NumPy sur les candidats.
+        La récence est mesurée depuis le document le plus récent de l'index.
+        """
+        n_candidates = max(k * RECENCY_OVERFETCH, RECENCY_MIN_CANDIDATES)
+        distances, indices = self._vector_search(query, n_candidates, params)
+        with metrics.span("local.recency"):
+            similarites = similarite_faiss(distances, self.vectorstore.metric_type)
+            scores = scores_recence(similarites, self.columns.timestamps[indices],
+                                    self.columns.timestamp_max, demi_vie)
+            top = np.argsort(-scores, kind='stable')[:k]
+        return [(int(indices[i]), float(scores[i]), float(distances[i])) for i in top]
+
+    def _hierarchical_search(self, query, k, mask=None):
+        """Recherche en deux temps : retourne (similarités, ids) triés, k au plus
+
+        L'index grossier (un centroïde par bloc de conversation) choisit HIERARCHICAL_BLOCKS
+        blocs ; seules leurs lignes sont comparées à la requête. Le coût dépend de la taille
+        des blocs retenus, pas de celle du corpus.
+        """
+        with metrics.span("local.embedding"):
+            query_embedding = self._embedding(query)
+        with metrics.span("local.coarse"):
+            blocs = self.blocks.search(query_embedding, HIERARCHICAL_BLOCKS, mask)
+            ids = self.blocks.documents(blocs)
+            if mask is not None:
+                ids = ids[mask[ids]]
+        if len(ids) == 0:
+            return np.zeros(0, dtype=np.float32), ids
+        with metrics.span("local.ann"):
+            # Vecteurs normalisés : le produit scalaire est la similarité cosinus
+            scores = self.vectorstore.reconstruct_batch(ids) @ query_embedding[0]
+            if len(ids) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                scores, ids = scores[top], ids[top]
+            order = np.argsort(-scores, kind='stable')
+        return scores[order], ids[order]
+
+    def _range_search(self, query, min_score, k, params=None):
+        """Recherche par seuil (range_search FAISS) : retourne (similarités, ids) triés, k au plus
+
+        Les voisins sous le seuil ne sortent jamais de FAISS : ni lecture, ni formatage,
+        ni envoi en contexte. Peut retourner moins de k résultats, voire aucun.
+        """
+        metric_type = self.vectorstore.metric_type
+        with metrics.span("local.embedding"):
+            query_embedding = self._embedding(query)
+        with metrics.span("local.ann"):
+            radius = rayon_faiss(min_score, metric_type)
+            if params is None:
+                _, distances, indices = self.vectorstore.range_search(query_embedding, radius)
+            else:
+                _, distances, indices = self.vectorstore.range_search(query_embedding, radius, params=params)
+        valid = indices < len(self.texts)
+        scores, indices = similarite_faiss(distances[valid], metric_type), indices[valid]
+        if len(indices) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            scores, indices = scores[top], indices[top]
+        order = np.argsort(-scores, kind='stable')
+        return scores[order], indices[order]
+
+    def _embedding(self, query):
+        """Vecteur de la requête, succès et échecs du cache d'embeddings comptés"""
+        echecs = self._encode_query.cache_info().misses
+        vecteur = self._encode_query(query)
+        succes = self._encode_query.cache_info().misses == echecs
+        metrics.incr("embedding_cache", result="hit" if succes else "miss")
+        return vecteur
+
+    @lru_cache(maxsize=QUERY_CACHE_SIZE)
+    def _encode_query(self, query):
+        """Vectorise une requête (mise en cache : les requêtes répétées sont fréquentes via l'API)
+
+        Vecteur normalisé, comme à la vectorisation : L2² et produit scalaire donnent le cosinus.
+        """
+        return self.model.encode([query], normalize_embeddings=True).astype('float32')
+
+def selecteur_faiss(mask):
+    """Construit un IDSelector FAISS à partir d'un masque booléen
+
+    Les documents étant numérotés dans l'ordre des lignes, un filtre de plage de lignes
+    donne un intervalle contigu : IDSelectorRange suffit. Sinon, bitmap compact (1 bit/doc).
+    Retourne (selector, bitmap) ; le bitmap doit rester référencé pendant la recherche.
+    """
+    ids = np.flatnonzero(mask)
+    if ids[-1] - ids[0] + 1 == len(ids):
+        return faiss.IDSelectorRange(int(ids[0]), int(ids[-1]) + 1), None
+    bitmap = np.packbits(mask, bitorder='little')
+    # Taille du bitmap en octets (pas en documents) : bornes vérifiées côté C++
+    return faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)), bitmap
+
+def normaliser_requete(query):
+    """Normalise les espaces d'une requête (et donc les clés du cache d'embeddings)"""
+    return " ".join(query.split())
+
+def parametres_recherche(mask):
+    """SearchParameters FAISS pour un masque de filtres : retourne (params, bitmap) ou (None, None)"""
+    if mask is None:
+        return None, None
+    selector, bitmap = selecteur_faiss(mask)
+    return faiss.SearchParameters(sel=selector), bitmap
+
+def charger_documents(data):
+    """Normalise le contenu de index.pkl en (textes, métadonnées, embeddings)
+
+    Deux formats coexistent :
+    - dict {'texts', 'embeddings'} produit par fix_faiss_index.regenerate_from_source()
+    - liste de dicts {'texte_complet', 'ligne_originale', 'role'} produite par vectorize_local_fixed.py
+    """
+    if isinstance(data, dict):
+        texts = data['texts']
+        metadatas = data.get('metadatas') or [{} for _ in texts]
+        return texts, metadatas, data.get('embeddings')
+    
+    texts = [entry['texte_complet'] for entry in data]
+    metadatas = [
+        {'ligne': entry.get('ligne_originale'), 'role': entry.get('role')}
+        for entry in data
+    ]
+    return texts, metadatas, None
+
 # Instance globale
 rag_system = LocalRAGSystem()
 
@@ -112,36 +535,117 @@ def initialize_system():
     success, message = rag_system.initialize()
     return message
 
-def search_interface(query, num_results=5):
-    """Interface de recherche pour Gradio"""
+def construire_filtres(role=None, ligne_min=None, ligne_max=None, jours=None):
+    """Construit le dict de filtres de search_similar à partir des champs de l'interface"""
+    filters = {}
+    if role and role != "tous":
+        filters['role'] = role
+    if ligne_min:
+        filters['ligne_min'] = int(ligne_min)
+    if ligne_max:
+        filters['ligne_max'] = int(ligne_max)
+    if jours:
+        filters['jours'] = float(jours)
+    return filters or None
+
+def formater_tour(doc, marqueur="   ↳"):
+    """Formate un tour de conversation (résultat positionnel ou contexte adjacent)"""
+    return f"{marqueur} L{doc['ligne']} [{doc['role']}] {doc['text'][:200]}{'...' if len(doc['text']) > 200 else ''}\n"
+
+def formater_resultat(result):
+    """Formate un résultat de recherche (et son contexte adjacent éventuel)"""
+    position = f" | Ligne {result['ligne']} ({result['role']})" if result['ligne'] else ""
+    if result.get('date'):
+        position += f" | {result['date'][:10]}"
+    output = f"**#{result['rank']} | Score: {result['score']:.3f}{position}**\n"
+    output += f"{result['text'][:500]}{'...' if len(result['text']) > 500 else ''}\n"
+    for doc in result.get('context', []):
+        output += formater_tour(doc)
+    output += "─" * 30 + "\n\n"
+    return output
+
+def search_interface(query, num_results=5, mode="vector", role="tous", ligne_min=None, ligne_max=None,
+                     contexte=0, score_min=RANGE_MIN_SCORE, diversifier=False, jours=None,
+                     demi_vie=RECENCY_HALF_LIFE_DAYS):
+    """Interface de recherche pour Gradio (générateur : affichage progressif)
+
+    Les premiers résultats sont affichés dès qu'ils sont disponibles, puis remplacés
+    par la version affinée (fusion hybride, contexte adjacent).
+    """
     if not query.strip():
-        return "⚠️ Veuillez saisir une requête"
+        yield "⚠️ Veuillez saisir une requête"
+        return
     
     try:
-        results, status = rag_system.search_similar(query, k=num_results)
+        filters = construire_filtres(role, ligne_min, ligne_max, jours)
+        debut = time.perf_counter()
+        premier_resultat = None
+        output = ""
+        status = ""
+        nb_resultats = 0
         
-        if not results:
-            return f"{status}\n\nAucun résultat trouvé pour : '{query}'"
+        for results, status, final in rag_system.search_progressive(
+            query, k=int(num_results), mode=mode, filters=filters, expand_context=int(contexte),
+            min_score=score_min, mmr_lambda=MMR_LAMBDA if diversifier else None, demi_vie=demi_vie
+        ):
+            if not results:
+                continue
+            nb_resultats = len(results)
+            
+            # Formatage des résultats
+            output = f"🔍 **Recherche :** {query}\n"
+            output += f"📊 **Résultats :** {len(results)} (mode {mode})"
+            output += "\n" if final else " — ⏳ affinage en cours...\n"
+            if filters:
+                output += f"🎯 **Filtres :** {filters}\n"
+            output += "─" * 50 + "\n\n"
+            
+            if premier_resultat is None:
+                premier_resultat = time.perf_counter() - debut
+                # Premier affichage : un résultat à la fois
+                for result in results:
+                    with metrics.span("local.formatting"):
+                        output += formater_resultat(result)
+                    yield output
+            else:
+                with metrics.span("local.formatting"):
+                    output += "".join(formater_resultat(result) for result in results)
+                yield output
         
-        # Formatage des résultats
-        output = f"🔍 **Recherche :** {query}\n"
-        output += f"📊 **Résultats :** {len(results)}\n"
-        output += "─" * 50 + "\n\n"
+        total = time.perf_counter() - debut
+        if premier_resultat is None:
+            yield f"{status}\n\nAucun résultat trouvé pour : '{query}'"
+            return
         
-        for result in results:
-            output += f"**#{result['rank']} | Score: {result['score']:.3f}**\n"
-            output += f"{result['text'][:500]}{'...' if len(result['text']) > 500 else ''}\n"
-            output += "─" * 30 + "\n\n"
+        output += f"⏱️ Premier résultat : {premier_resultat * 1000:.0f} ms | Total : {total * 1000:.0f} ms\n"
         
         # Log de la recherche
-        logging.info(f"Recherche effectuée : '{query}' -> {len(results)} résultats")
+        logging.info(
+            f"Recherche effectuée : '{query}' -> {nb_resultats} résultats "
+            f"(premier résultat {premier_resultat * 1000:.0f} ms, total {total * 1000:.0f} ms)"
+        )
         
-        return output
+        yield output
         
     except Exception as e:
         error_msg = f"❌ Erreur lors de la recherche : {str(e)}"
         logging.error(error_msg)
-        return error_msg
+        yield error_msg
+
+def line_interface(ligne, voisins=2):
+    """Interface d'accès positionnel pour Gradio"""
+    if not ligne:
+        return "⚠️ Veuillez saisir un numéro de ligne"
+    
+    results, status = rag_system.get_line(int(ligne), int(voisins))
+    if not results:
+        return status
+    
+    output = f"📍 **Ligne {int(ligne)}** ± {int(voisins)} tours\n"
+    output += "─" * 50 + "\n\n"
+    for doc in results:
+        output += formater_tour(doc, marqueur="👉" if doc['offset'] == 0 else "  ")
+    return output
 
 def get_system_stats():
     """Affiche les statistiques du système"""
@@ -153,7 +657,8 @@ def get_system_stats():
         files_to_check = [
             ("Conversations", CONVERSATIONS_FILE),
             ("Index PKL", INDEX_FILE),
-            ("Index FAISS", FAISS_INDEX)
+            ("Index FAISS", FAISS_INDEX),
+            ("Index FAISS online", ONLINE_FAISS_INDEX)
         ]
         
         for name, path in files_to_check:
@@ -181,6 +686,7 @@ def get_system_stats():
 # Interface Gradio
 def create_interface():
     """Crée l'interface Gradio"""
+    import gradio as gr
     
     with gr.Blocks(
         title="SecondMind RAG - Version LOCALE",
@@ -223,6 +729,47 @@ def create_interface():
                         step=1,
                         label="Nombre de résultats"
                     )
+                    search_mode = gr.Radio(
+                        choices=list(SEARCH_MODES),
+                        value="vector",
+                        label="Mode de recherche"
+                    )
+                    with gr.Accordion("🎯 Filtres", open=False):
+                        with gr.Row():
+                            role_filter = gr.Dropdown(
+                                choices=["tous", "user", "assistant", "human", "ai", "unknown"],
+                                value="tous",
+                                allow_custom_value=True,
+                                label="Rôle"
+                            )
+                            ligne_min_filter = gr.Number(label="Ligne min", precision=0)
+                            ligne_max_filter = gr.Number(label="Ligne max", precision=0)
+                            jours_filter = gr.Number(label="Derniers jours", precision=0)
+                    context_size = gr.Slider(
+                        minimum=0,
+                        maximum=5,
+                        value=0,
+                        step=1,
+                        label="Contexte (± tours adjacents)"
+                    )
+                    score_min = gr.Slider(
+                        minimum=0.0,
+                        maximum=1.0,
+                        value=RANGE_MIN_SCORE,
+                        step=0.05,
+                        label="Score minimum (mode range)"
+                    )
+                    half_life = gr.Slider(
+                        minimum=1,
+                        maximum=365,
+                        value=RECENCY_HALF_LIFE_DAYS,
+                        step=1,
+                        label="Demi-vie en jours (mode recent)"
+                    )
+                    diversify = gr.Checkbox(
+                        value=False,
+                        label="Diversifier les résultats (MMR, sans quasi-doublons)"
+                    )
                     search_btn = gr.Button("🔍 Rechercher", variant="primary", size="lg")
                 
                 with gr.Column(scale=1):
@@ -236,6 +783,23 @@ def create_interface():
                 show_copy_button=True
             )
         
+        with gr.Tab("📍 Position"):
+            with gr.Row():
+                line_input = gr.Number(label="Numéro de ligne", precision=0)
+                neighbours_input = gr.Slider(
+                    minimum=0,
+                    maximum=20,
+                    value=2,
+                    step=1,
+                    label="Tours voisins (±)"
+                )
+            line_btn = gr.Button("📍 Afficher", variant="primary")
+            line_output = gr.Textbox(
+                label="Conversation autour de la ligne",
+                lines=20,
+                show_copy_button=True
+            )
+        
         with gr.Tab("📊 Statistiques"):
             stats_output = gr.Textbox(
                 label="Informations système",
@@ -257,13 +821,24 @@ def create_interface():
             ### 📁 Fichiers requis :
             - `conversations_extraites.txt` : Conversations source
             - `vector_index_chatgpt/index.pkl` : Index vectoriel
-            - `vector_index_chatgpt/index.faiss` : Index FAISS
+            - `vector_index_chatgpt/local/index.faiss` : Index FAISS local (MiniLM, 384-d)
+            - `vector_index_chatgpt/online/index.faiss` : Index FAISS online (OpenAI, 1536-d, mode federated)
+            - `vector_index_chatgpt/lexical_index.npz` : Index lexical BM25 (modes lexical/hybrid)
             
             ### 🔧 Fonctionnalités :
             - **Recherche sémantique** : Trouve des réponses pertinentes
             - **Score de pertinence** : Évalue la qualité des résultats
+            - **Modes** : `vector` (sémantique), `lexical` (BM25 : noms, codes, fichiers), `hybrid` (fusion des deux),
+              `federated` (index local + online en parallèle, repli local automatique),
+              `range` (seulement les résultats au-dessus du score minimum, jusqu'au nombre demandé),
+              `hierarchical` (choisit d'abord les conversations proches, puis cherche dans leurs lignes),
+              `recent` (favorise les conversations récentes selon la demi-vie choisie)
+            - **Diversification** : écarte les copies d'un même message et favorise des résultats variés
             - **Interface intuitive** : Simple d'utilisation
             - **Statistiques** : Suivi des performances
+            - **Filtres** : rôle, plage de lignes et derniers jours, appliqués pendant la recherche FAISS
+            - **Position** : accès direct à une ligne et à ses tours voisins, sans recherche
+            - **API JSON** : `GET /api/search?q=...&k=5` sur le même port (résultats structurés)
             
             ### ⚠️ Notes importantes :
             - Ce système fonctionne en mode LOCAL (sans API)
@@ -274,10 +849,18 @@ def create_interface():
         # Événements
         search_btn.click(
             search_interface,
-            inputs=[query_input, num_results],
+            inputs=[query_input, num_results, search_mode,
+                    role_filter, ligne_min_filter, ligne_max_filter, context_size, score_min,
+                    diversify, jours_filter, half_life],
             outputs=[results_output]
         )
         
+        line_btn.click(
+            line_interface,
+            inputs=[line_input, neighbours_input],
+            outputs=[line_output]
+        )
+        
         init_btn.click(
             initialize_system,
             outputs=[results_output]
@@ -296,6 +879,8 @@ def create_interface():
         # Auto-load des stats au démarrage
         interface.load(get_system_stats, outputs=[stats_output])
     
+    # File d'attente requise pour les gestionnaires générateurs (affichage progressif)
+    interface.queue()
     return interface
 
 if __name__ == "__main__":
@@ -306,18 +891,29 @@ if __name__ == "__main__":
         # Vérification des dossiers
         os.makedirs(BASE_DIR, exist_ok=True)
         os.makedirs(INDEX_DIR, exist_ok=True)
+        configurer_logging()
+        
+        # --workers N : API JSON servie par N processus partageant les index mappés en mémoire
+        workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else 1
+        if workers > 1:
+            print(f"👷 Lancement de {workers} workers pour l'API JSON (sans interface Gradio)...")
+            search_api.launch_workers(workers, INDEX_DIR, host="127.0.0.1", port=7861)
+            sys.exit(0)
         
         # Création et lancement de l'interface
         interface = create_interface()
         
-        print("🌐 Lancement de l'interface web...")
-        interface.launch(
-            server_name="127.0.0.1",
-            server_port=7861,  # Port différent pour éviter les conflits
-            share=False,
-            show_error=True,
-            quiet=False
-        )
+        # Latences et compteurs envoyés au serveur de logs (sans effet s'il est arrêté)
+        metrics.connecter("gradio_local")
+        
+        # Chargement anticipé : l'API JSON doit répondre sans clic sur "Initialiser"
+        # --lexical-only : démarrage sans modèle neuronal (recherche BM25 uniquement)
+        success, message = rag_system.initialize(load_model="--lexical-only" not in sys.argv)
+        print(message)
+        
+        print("🌐 Lancement de l'interface web et de l'API JSON...")
+        # Port différent pour éviter les conflits
+        search_api.launch(interface, rag_system, host="127.0.0.1", port=7861)
         
     except Exception as e:
         print(f"❌ Erreur critique : {e}")
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Diversification des résultats pour SecondMind RAG
+Pertinence marginale maximale (MMR) et suppression des quasi-doublons (messages recollés),
+entièrement vectorisées sur le pool de candidats
+"""
+
+import numpy as np
+from federated_search import normaliser_scores
+
+MMR_LAMBDA = 0.7           # poids de la pertinence face à la nouveauté
+MMR_OVERFETCH = 4          # candidats examinés par résultat demandé
+MMR_MIN_CANDIDATES = 20
+DUPLICATE_THRESHOLD = 0.95  # similarité cosinus au-delà de laquelle deux documents sont des copies
+
+
+def selection_mmr(relevance, vectors, k, mmr_lambda=MMR_LAMBDA, seuil_doublon=DUPLICATE_THRESHOLD):
+    """Choisit k candidats pertinents et variés : retourne leurs positions, dans l'ordre de sélection
+
+    relevance : float[n], plus grand = meilleur (toute échelle, normalisée ici)
+    vectors : float32[n, d] normalisés, dans le même ordre
+    Une seule matrice de similarités n × n ; chaque tour de sélection est une opération
+    vectorielle sur n éléments (k tours, aucune boucle par paire).
+    """
+    n = len(relevance)
+    if n == 0:
+        return []
+    relevance = normaliser_scores(relevance)
+    similarites = vectors @ vectors.T
+    max_sim = np.zeros(n, dtype=np.float32)  # similarité max avec la sélection courante
+    disponible = np.ones(n, dtype=bool)
+    choisis = []
+
+    for _ in range(min(k, n)):
+        score = mmr_lambda * relevance - (1 - mmr_lambda) * max_sim
+        score[~disponible] = -np.inf
+        j = int(np.argmax(score))
+        if not disponible[j]:
+            break
+        choisis.append(j)
+        # Le choisi et ses quasi-copies sortent du pool
+        disponible &= similarites[j] < seuil_doublon
+        disponible[j] = False
+        np.maximum(max_sim, similarites[j], out=max_sim)
+    return choisis
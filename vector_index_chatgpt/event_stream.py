@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Flux d'événements (Server-Sent Events) pour le dashboard de monitoring SecondMind
+Les producteurs publient des événements numérotés ; chaque client reçoit seulement
+ce qui suit son dernier id (reprise après coupure via Last-Event-ID)
+"""
+
+import json
+import threading
+from collections import deque, namedtuple
+from itertools import islice
+
+STREAM_HISTORY = 1000   # événements gardés pour la reprise des clients déconnectés
+STREAM_HEARTBEAT = 15   # secondes sans événement avant un commentaire de maintien
+
+Event = namedtuple('Event', ['id', 'type', 'data'])
+
+
+class EventHub:
+    """Historique borné d'événements numérotés + réveil des clients en attente"""
+
+    def __init__(self, history=STREAM_HISTORY):
+        self._events = deque(maxlen=history)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    @property
+    def seq(self):
+        """Id du dernier événement publié (0 si aucun)"""
+        with self._cond:
+            return self._seq
+
+    def publish(self, type, data):
+        """Ajoute un événement et réveille les clients : retourne son id"""
+        with self._cond:
+            self._seq += 1
+            self._events.append(Event(self._seq, type, data))
+            self._cond.notify_all()
+            return self._seq
+
+    def _apres(self, last_id):
+        """Événements d'id > last_id, None si l'historique ne remonte plus jusque-là"""
+        if last_id > self._seq:
+            return None  # id d'une instance précédente du serveur
+        if last_id == self._seq:
+            return []
+        premier = self._events[0].id
+        if last_id < premier - 1:
+            return None
+        # Ids consécutifs : position directe dans l'historique
+        return list(islice(self._events, last_id - premier + 1, None))
+
+    def wait(self, last_id, timeout=STREAM_HEARTBEAT):
+        """Événements après last_id, en attendant au plus timeout s ([] si rien, None si trou)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_id, timeout)
+            return self._apres(last_id)
+
+
+def format_sse(event_id, type, data):
+    """Sérialise un événement au format text/event-stream"""
+    return f"id: {event_id}\nevent: {type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Recherche fédérée pour SecondMind RAG
+Interroge en parallèle l'index local (MiniLM, 384-d) et l'index online (OpenAI, 1536-d)
+construits sur les mêmes ids de documents, puis normalise et fusionne les scores
+"""
+
+import os
+import time
+import logging
+from vector_backend import faiss
+import numpy as np
+from search_metrics import metrics
+
+LOCAL_INDEX_NAME = "local"
+ONLINE_INDEX_NAME = "online"
+ONLINE_MODEL = "text-embedding-3-small"
+ONLINE_RETRY_DELAY = 60  # secondes sans tentative après un échec de l'API
+
+
+class OnlineIndex:
+    """Index OpenAI optionnel : indisponible = ignoré immédiatement, sans latence ajoutée"""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.index = None
+        self.embeddings = None
+        self.error = None
+        self._down_until = 0.0
+
+    def load(self, n_docs):
+        """Charge l'index online ; retourne False (sans lever) s'il est inutilisable"""
+        try:
+            if not os.getenv("OPENAI_API_KEY"):
+                raise RuntimeError("OPENAI_API_KEY non définie")
+            if not os.path.exists(self.index_path):
+                raise FileNotFoundError(f"Index online introuvable : {self.index_path}")
+
+            from langchain_openai import OpenAIEmbeddings
+            index = faiss.read_index(self.index_path)
+            if index.ntotal != n_docs:
+                raise ValueError(
+                    f"Index online désaligné ({index.ntotal} vecteurs pour {n_docs} documents) : "
+                    "relancez vectorize_online_fixed.py"
+                )
+            self.embeddings = OpenAIEmbeddings(model=ONLINE_MODEL, show_progress_bar=False)
+            self.index = index
+            self.error = None
+            return True
+        except Exception as e:
+            self.index = None
+            self.error = str(e)
+            logging.warning(f"⚠️ Index online désactivé : {e}")
+            return False
+
+    def available(self):
+        return self.index is not None and time.monotonic() >= self._down_until
+
+    def mark_down(self, reason):
+        """Suspend l'index online pendant ONLINE_RETRY_DELAY secondes"""
+        self._down_until = time.monotonic() + ONLINE_RETRY_DELAY
+        self.error = str(reason)
+        logging.warning(f"⚠️ Index online suspendu {ONLINE_RETRY_DELAY}s : {reason}")
+
+    def search(self, query, k, params=None):
+        """Recherche dans l'index online : retourne (distances, ids) valides"""
+        with metrics.span("online.embedding"):
+            query_embedding = np.asarray([self.embeddings.embed_query(query)], dtype='float32')
+        with metrics.span("online.ann"):
+            if params is None:
+                distances, indices = self.index.search(query_embedding, k)
+            else:
+                distances, indices = self.index.search(query_embedding, k, params=params)
+        valid = indices[0] >= 0
+        return distances[0][valid], indices[0][valid]
+
+
+def similarite_l2(distances):
+    """Distance L2² entre vecteurs normalisés → similarité cosinus"""
+    return 1.0 - np.asarray(distances, dtype=np.float32) / 2.0
+
+
+def similarite_faiss(distances, metric_type):
+    """Scores FAISS → similarité cosinus (vecteurs normalisés) selon la métrique de l'index"""
+    if metric_type == faiss.METRIC_INNER_PRODUCT:
+        return np.asarray(distances, dtype=np.float32)
+    return similarite_l2(distances)
+
+
+def rayon_faiss(min_score, metric_type):
+    """Seuil de similarité cosinus → rayon range_search équivalent pour la métrique de l'index
+
+    Produit scalaire : FAISS garde les scores > rayon. L2² : FAISS garde les distances < rayon.
+    """
+    if metric_type == faiss.METRIC_INNER_PRODUCT:
+        return float(min_score)
+    return 2.0 * (1.0 - float(min_score))
+
+
+def normaliser_scores(scores):
+    """Normalisation min-max dans [0, 1] (liste constante → 1)"""
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(scores) == 0:
+        return scores
+    etendue = scores.max() - scores.min()
+    if etendue <= 0:
+        return np.ones_like(scores)
+    return (scores - scores.min()) / etendue
+
+
+def fusion_scores(listes, k, poids=None):
+    """Fusion CombSUM de listes (scores, ids) après normalisation min-max
+
+    Un document absent d'une liste y contribue 0. Retourne [(id, score_fusionné)] trié.
+    """
+    poids = poids or [1.0] * len(listes)
+    fused = {}
+    for (scores, ids), w in zip(listes, poids):
+        for doc_id, score in zip(ids.tolist(), normaliser_scores(scores).tolist()):
+            fused[doc_id] = fused.get(doc_id, 0.0) + w * score
+    total = sum(poids)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [(doc_id, score / total) for doc_id, score in ranked]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Journal des changements de fichiers pour le serveur de monitoring SecondMind
+Historique borné et protégé par verrou (écrit par le thread watchdog, lu par Flask),
+regroupement des rafales, filtres de chemins et requêtes par fichier et par période
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from fnmatch import fnmatch
+
+FILE_EVENTS_MAX = 5000        # événements gardés, tous fichiers confondus
+FILE_EVENTS_PER_FILE = 500    # événements gardés par fichier
+DEBOUNCE_SECONDS = 2.0        # une rafale sur un même fichier devient un seul événement
+FILE_EVENT_PATTERNS = ('*.log',)
+
+
+class FileEventStore:
+    """Événements de fichiers ordonnés par date de début, indexés par nom de fichier
+
+    Les événements identiques (même fichier, même type) dans les DEBOUNCE_SECONDS qui suivent
+    le premier sont fusionnés : 'count' et 'last' sont mis à jour au lieu d'ajouter une entrée.
+    """
+
+    def __init__(self, patterns=FILE_EVENT_PATTERNS, ignore=(), max_events=FILE_EVENTS_MAX,
+                 per_file=FILE_EVENTS_PER_FILE, debounce=DEBOUNCE_SECONDS):
+        self.patterns = tuple(patterns)
+        self.ignore = tuple(ignore)
+        self.debounce = debounce
+        self.per_file = per_file
+        self._events = deque(maxlen=max_events)
+        self._by_file = {}
+        self._en_cours = {}   # (chemin, type) → dernier événement, pour le regroupement
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+    def accepte(self, path):
+        """Le chemin passe les filtres (motif sur le nom, exclusions sur le chemin complet)"""
+        nom = os.path.basename(path)
+        return any(fnmatch(nom, motif) for motif in self.patterns) and \
+            not any(fnmatch(path, motif) for motif in self.ignore)
+
+    def add(self, path, type, now=None):
+        """Enregistre un événement : retourne False s'il est filtré"""
+        if not self.accepte(path):
+            return False
+        now = time.time() if now is None else now
+        with self._lock:
+            dernier = self._en_cours.get((path, type))
+            plus_ancien = self._seq - len(self._events) + 1
+            if dernier is not None and now - dernier['first'] <= self.debounce and dernier['seq'] >= plus_ancien:
+                dernier['last'] = now
+                dernier['count'] += 1
+                return True
+
+            self._seq += 1
+            event = {'seq': self._seq, 'file': os.path.basename(path), 'path': path, 'type': type,
+                     'first': now, 'last': now, 'count': 1}
+            self._events.append(event)
+            self._by_file.setdefault(event['file'], deque(maxlen=self.per_file)).append(event)
+            self._en_cours[(path, type)] = event
+            return True
+
+    def query(self, file=None, since=None, until=None, type=None, limit=100):
+        """Les `limit` événements les plus récents satisfaisant les critères, du plus ancien au plus récent
+
+        since / until : epoch ; un événement est retenu s'il chevauche [since, until].
+        Le parcours part de la fin et s'arrête dès que les débuts sont antérieurs à since.
+        """
+        resultats = []
+        with self._lock:
+            source = self._by_file.get(file, ()) if file else self._events
+            for event in reversed(source):
+                if since is not None and event['first'] < since - self.debounce:
+                    break
+                if since is not None and event['last'] < since:
+                    continue
+                if until is not None and event['first'] > until:
+                    continue
+                if type and event['type'] != type:
+                    continue
+                resultats.append(self._format(event))
+                if len(resultats) >= limit:
+                    break
+        resultats.reverse()
+        return resultats
+
+    def files(self):
+        """Nombre d'événements gardés par fichier"""
+        with self._lock:
+            return {nom: len(events) for nom, events in self._by_file.items()}
+
+    @staticmethod
+    def _format(event):
+        return {
+            'file': event['file'],
+            'path': event['path'],
+            'type': event['type'],
+            'timestamp': datetime.fromtimestamp(event['first']).isoformat(),
+            'last': datetime.fromtimestamp(event['last']).isoformat(),
+            'count': event['count'],
+        }
@@ -6,18 +6,22 @@ Version corrigée avec chemins absolus et améliorations
 
 import os
 import sys
-import faiss
+from vector_backend import faiss
 import pickle
 import numpy as np
 from datetime import datetime
 import logging
 from sentence_transformers import SentenceTransformer
+from lexical_index import BM25Index, LEXICAL_INDEX_FILENAME
+from metadata_columns import METADATA_COLUMNS_FILENAME
+from mmap_store import DOCUMENTS_STORE_FILENAME
+from hierarchical_index import BLOCKS_INDEX_FILENAME
 
 # Configuration des chemins absolus
 BASE_DIR = r"C:\Users\rag_personnel\Logs"
 INDEX_DIR = os.path.join(BASE_DIR, "vector_index_chatgpt")
 INDEX_FILE = os.path.join(INDEX_DIR, "index.pkl")
-FAISS_INDEX = os.path.join(INDEX_DIR, "index.faiss")
+FAISS_INDEX = os.path.join(INDEX_DIR, "local", "index.faiss")
 CONVERSATIONS_FILE = os.path.join(BASE_DIR, "conversations_extraites.txt")
 LOG_FILE = os.path.join(BASE_DIR, "fix_faiss_index.log")
 
@@ -141,7 +145,9 @@ def rebuild_faiss_index(texts, embeddings):
         
         # Création de l'index FAISS
         print("🏗️ Création de l'index FAISS...")
-        index = faiss.IndexFlatL2(dimension)
+        # Produit scalaire sur vecteurs normalisés = similarité cosinus (comme la vectorisation)
+        faiss.normalize_L2(embeddings_array)
+        index = faiss.IndexFlatIP(dimension)
         
         # Ajout des vecteurs
         print("➕ Ajout des vecteurs à l'index...")
@@ -161,6 +167,20 @@ def rebuild_faiss_index(texts, embeddings):
         logging.error(f"Erreur reconstruction FAISS: {e}")
         return False
 
+def supprimer_fichiers_desalignes():
+    """Supprime les fichiers partagés numérotés comme l'ancien index (colonnes, documents, blocs)
+
+    La régénération découpe par conversation, sans rôle ni ligne : ces fichiers ne peuvent pas
+    être reconstruits ici et désigneraient d'autres documents (relancer la vectorisation).
+    """
+    for path in (os.path.join(INDEX_DIR, METADATA_COLUMNS_FILENAME),
+                 os.path.join(INDEX_DIR, DOCUMENTS_STORE_FILENAME),
+                 os.path.join(os.path.dirname(FAISS_INDEX), BLOCKS_INDEX_FILENAME)):
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"🗑️ Fichier désaligné supprimé : {path}")
+            logging.info(f"Fichier désaligné supprimé : {path}")
+
 def regenerate_from_source():
     """Régénère tout depuis le fichier source"""
     print("\n🔄 RÉGÉNÉRATION COMPLÈTE")
@@ -201,11 +221,11 @@ def regenerate_from_source():
         
         # Génération des embeddings
         print("🧠 Génération des embeddings...")
-        embeddings = model.encode(valid_chunks, show_progress_bar=True)
+        embeddings = model.encode(valid_chunks, show_progress_bar=True, normalize_embeddings=True)
         
         # Sauvegarde PKL
         print("💾 Sauvegarde des données...")
-        os.makedirs(INDEX_DIR, exist_ok=True)
+        os.makedirs(os.path.dirname(FAISS_INDEX), exist_ok=True)
         
         with open(INDEX_FILE, 'wb') as f:
             pickle.dump({
@@ -218,11 +238,15 @@ def regenerate_from_source():
         # Création de l'index FAISS
         print("🏗️ Création de l'index FAISS...")
         embeddings_array = embeddings.astype('float32')
-        index = faiss.IndexFlatL2(embeddings_array.shape[1])
+        index = faiss.IndexFlatIP(embeddings_array.shape[1])
         index.add(embeddings_array)
         
         faiss.write_index(index, FAISS_INDEX)
         
+        # Index lexical BM25 aligné sur les chunks
+        BM25Index.build(valid_chunks).save(os.path.join(INDEX_DIR, LEXICAL_INDEX_FILENAME))
+        supprimer_fichiers_desalignes()
+        
         print("✅ Régénération complète réussie!")
         print(f"📊 {len(valid_chunks)} documents indexés")
         
@@ -7,81 +7,227 @@ Version complète avec ouverture automatique du navigateur
 import os
 import sys
 import json
+import time
+import logging
 import gradio as gr
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
+import numpy as np
+from search_metrics import metrics, start_metrics_server
+from federated_search import LOCAL_INDEX_NAME, ONLINE_INDEX_NAME, ONLINE_MODEL, ONLINE_RETRY_DELAY
+from query_cache import QueryEmbeddingCache, QUERY_CACHE_FILENAME
 
 # Charger les variables d'environnement
 load_dotenv()
 
+METRICS_PORT = 7862
+ONLINE_LATENCY_BUDGET = 0.8  # secondes accordées à l'API d'embedding avant repli local
+# Point d'accès compatible OpenAI de substitution (tests hors ligne), ex. http://127.0.0.1:8080/v1
+EMBEDDINGS_URL_ENV = "SECONDMIND_EMBEDDINGS_URL"
+LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
 class SecondMindRAG:
     def __init__(self):
         self.vectorstore = None
+        self.local_vectorstore = None
         self.retriever = None
+        self.query_cache = None
         self.conversations_lines = []
         self.metadata_info = {}
+        self.online_model = ONLINE_MODEL
+        self.online_error = None
+        self._online_down_until = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embedding")
         self.setup_paths()
-        
+
     def setup_paths(self):
         """Configuration des chemins absolus"""
         self.BASE_DIR = r"C:\Users\rag_personnel"
-        self.DB_FAISS_PATH = os.path.join(self.BASE_DIR, "Logs", "vector_index_chatgpt")
+        self.INDEX_DIR = os.path.join(self.BASE_DIR, "Logs", "vector_index_chatgpt")
+        self.DB_FAISS_PATH = os.path.join(self.INDEX_DIR, ONLINE_INDEX_NAME)
+        self.LOCAL_FAISS_PATH = os.path.join(self.INDEX_DIR, LOCAL_INDEX_NAME)
         self.CONVERSATIONS_PATH = os.path.join(self.BASE_DIR, "Logs", "conversations_extraites.txt")
-        
+
     def load_system(self):
-        """Charge le système de recherche"""
+        """Charge le système de recherche
+
+        L'index online est facultatif : sans clé API, sans réseau ou sans index,
+        l'interface démarre sur l'index local (MiniLM) et l'indique à chaque réponse.
+        """
         try:
             print("🔄 Chargement du système SecondMind...")
 
-            if not os.path.exists(self.DB_FAISS_PATH):
-                return False, f"❌ Index FAISS introuvable : {self.DB_FAISS_PATH}"
-            
             if not os.path.exists(self.CONVERSATIONS_PATH):
                 return False, f"❌ Fichier conversations introuvable : {self.CONVERSATIONS_PATH}"
-            
-            if not os.getenv("OPENAI_API_KEY"):
-                return False, "❌ Variable d'environnement OPENAI_API_KEY non définie"
-            
-            metadata_file = os.path.join(self.DB_FAISS_PATH, "metadata.json")
-            if os.path.exists(metadata_file):
-                with open(metadata_file, "r", encoding="utf-8") as f:
-                    self.metadata_info = json.load(f)
-            
+
+            try:
+                self.vectorstore = self.load_online()
+                self.query_cache = QueryEmbeddingCache(os.path.join(self.DB_FAISS_PATH, QUERY_CACHE_FILENAME))
+                print(f"✅ Index online chargé ({len(self.query_cache)} requêtes en cache)")
+            except Exception as e:
+                self.vectorstore = None
+                self.online_error = str(e)
+                print(f"⚠️ Index online indisponible : {e}")
+
+            try:
+                self.local_vectorstore = self.load_local()
+                print("✅ Index local de repli chargé")
+            except Exception as e:
+                self.local_vectorstore = None
+                print(f"⚠️ Index local de repli indisponible : {e}")
+
+            if self.vectorstore is None and self.local_vectorstore is None:
+                return False, f"❌ Aucun index utilisable : {self.online_error}"
+            if self.vectorstore is None:
+                return True, "✅ Système chargé en mode LOCAL (repli)"
+            return True, "✅ Système chargé avec succès"
+
+        except Exception as e:
+            return False, f"❌ Erreur lors du chargement : {str(e)}"
+
+    def load_online(self):
+        """Index online (OpenAI, ou point d'accès de substitution via SECONDMIND_EMBEDDINGS_URL)"""
+        if not os.path.exists(self.DB_FAISS_PATH):
+            raise FileNotFoundError(f"Index FAISS introuvable : {self.DB_FAISS_PATH}")
+
+        base_url = os.getenv(EMBEDDINGS_URL_ENV)
+        if not base_url and not os.getenv("OPENAI_API_KEY"):
+            raise RuntimeError("Variable d'environnement OPENAI_API_KEY non définie")
+
+        metadata_file = os.path.join(self.DB_FAISS_PATH, "metadata.json")
+        if os.path.exists(metadata_file):
+            with open(metadata_file, "r", encoding="utf-8") as f:
+                self.metadata_info = json.load(f)
+
+        if base_url:
+            # Serveur local compatible OpenAI : pas de découpage tiktoken, clé factice acceptée
             embeddings = OpenAIEmbeddings(
-                model="text-embedding-3-small",
+                model=ONLINE_MODEL,
+                base_url=base_url,
+                api_key=os.getenv("OPENAI_API_KEY", "local"),
+                check_embedding_ctx_length=False,
                 show_progress_bar=False
             )
-            
-            self.vectorstore = FAISS.load_local(
-                self.DB_FAISS_PATH,
-                embeddings,
-                allow_dangerous_deserialization=True
+            # Clé de cache distincte : ces vecteurs ne doivent pas servir pour la vraie API
+            self.online_model = f"{ONLINE_MODEL}@{base_url}"
+        else:
+            embeddings = OpenAIEmbeddings(
+                model=ONLINE_MODEL,
+                show_progress_bar=False
             )
-            
-            return True, "✅ Système chargé avec succès"
-        
+
+        return FAISS.load_local(
+            self.DB_FAISS_PATH,
+            embeddings,
+            allow_dangerous_deserialization=True
+        )
+
+    def load_local(self):
+        """Index local (MiniLM, produit scalaire) construit sur les mêmes documents"""
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        if not os.path.exists(self.LOCAL_FAISS_PATH):
+            raise FileNotFoundError(f"Index FAISS introuvable : {self.LOCAL_FAISS_PATH}")
+        embeddings = HuggingFaceEmbeddings(
+            model_name=LOCAL_MODEL,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+        return FAISS.load_local(
+            self.LOCAL_FAISS_PATH,
+            embeddings,
+            allow_dangerous_deserialization=True,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+
+    def online_available(self):
+        return self.vectorstore is not None and time.monotonic() >= self._online_down_until
+
+    def rechercher(self, question, k=3):
+        """Recherche avec repli automatique : retourne (textes, chemin ayant servi la requête)
+
+        1. embedding en cache disque → index online, sans appel réseau (même API suspendue)
+        2. appel distant dans le budget de latence → index online
+        3. sinon (délai, erreur, hors ligne) → modèle et index locaux
+        """
+        if self.vectorstore is not None:
+            with metrics.span("online.cache"):
+                query_embedding = self.query_cache.get(self.online_model, question)
+            metrics.incr("embedding_cache", result="miss" if query_embedding is None else "hit")
+            if query_embedding is not None:
+                return self.chercher_dans(self.vectorstore, query_embedding, k, "online"), "🌐 online (cache)"
+
+        if self.online_available():
+            debut = time.perf_counter()
+            future = self._executor.submit(self.vectorstore.embeddings.embed_query, question)
+            # Réponse tardive : elle alimente quand même le cache pour la prochaine fois
+            future.add_done_callback(lambda f: self.mettre_en_cache(question, f))
+            try:
+                with metrics.span("online.embedding"):
+                    query_embedding = future.result(timeout=ONLINE_LATENCY_BUDGET)
+                duree = (time.perf_counter() - debut) * 1000
+                return self.chercher_dans(self.vectorstore, query_embedding, k, "online"), f"🌐 online ({duree:.0f} ms)"
+            except Exception as e:
+                raison = str(e) or f"budget de {ONLINE_LATENCY_BUDGET * 1000:.0f} ms dépassé"
+                # Lente ou en échec : on cesse d'attendre l'API pendant un moment
+                self._online_down_until = time.monotonic() + ONLINE_RETRY_DELAY
+                self.online_error = raison
+                logging.warning(f"⚠️ API d'embedding suspendue {ONLINE_RETRY_DELAY}s : {raison}")
+        else:
+            raison = self.online_error or "index online indisponible"
+
+        metrics.incr("fallbacks")
+        if self.local_vectorstore is None:
+            raise RuntimeError(f"{raison} et aucun index local de repli")
+        with metrics.span("local.embedding"):
+            query_embedding = self.local_vectorstore.embeddings.embed_query(question)
+        return self.chercher_dans(self.local_vectorstore, query_embedding, k, "local"), f"💻 local (repli : {raison})"
+
+    def chercher_dans(self, vectorstore, query_embedding, k, etape):
+        """Recherche FAISS + lecture du docstore LangChain pour un embedding donné"""
+        with metrics.span(f"{etape}.ann"):
+            _, indices = vectorstore.index.search(np.asarray([query_embedding], dtype='float32'), k)
+        with metrics.span(f"{etape}.fetch"):
+            return [
+                vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content
+                for i in indices[0] if i != -1
+            ]
+
+    def mettre_en_cache(self, question, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            self.query_cache.put(self.online_model, question, future.result())
         except Exception as e:
-            return False, f"❌ Erreur lors du chargement : {str(e)}"
+            logging.warning(f"⚠️ Cache des requêtes non mis à jour : {e}")
 
 def lancer_interface():
     rag = SecondMindRAG()
     success, message = rag.load_system()
+    print(message)
     if not success:
-        print(message)
         return
 
-    rag.retriever = rag.vectorstore.as_retriever()
+    rag.retriever = (rag.vectorstore or rag.local_vectorstore).as_retriever()
 
     def répondre(question):
         if not rag.retriever:
             return "Système non prêt."
         try:
-            docs = rag.retriever.get_relevant_documents(question)
-            réponses = [doc.page_content for doc in docs]
-            return "\n\n".join(réponses[:3]) if réponses else "Aucune réponse trouvée."
+            with metrics.span("online.search"):
+                with metrics.span("online.normalisation"):
+                    question = " ".join(question.split())
+                metrics.incr("queries", mode="online")
+                réponses, source = rag.rechercher(question, k=3)
+                with metrics.span("online.formatting"):
+                    texte = "\n\n".join(réponses) if réponses else "Aucune réponse trouvée."
+                    return f"{source}\n\n{texte}"
         except Exception as e:
+            metrics.incr("search_errors", mode="online")
             return f"Erreur lors de la récupération : {str(e)}"
 
     interface = gr.Interface(
@@ -92,7 +238,9 @@ def lancer_interface():
         description="Pose une question, reçois des réponses depuis ta base vectorielle locale."
     )
 
+    start_metrics_server(port=METRICS_PORT)
+    metrics.connecter("gradio_online")
     interface.launch(share=True, inbrowser=True)
 
 if __name__ == "__main__":
-    lancer_interface()
\ No newline at end of file
+    lancer_interface()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Sondes de santé pour le serveur de monitoring SecondMind
+Les sondes (fichiers, ports, recherche de bout en bout) tournent en parallèle dans un thread
+de fond à intervalle fixe ; /api/health sert le dernier résultat sans rien recalculer.
+Les latences et la disponibilité de chaque sonde sont gardées en séries temporelles.
+"""
+
+import os
+import json
+import math
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from metrics_history import MetricsHistory
+from search_metrics import PROBE_HEADER
+
+HEALTH_INTERVAL = 15        # secondes entre deux tours de sondes
+PROBE_TIMEOUT = 5           # secondes au plus pour un tour (une sonde plus lente = 'timeout')
+SEARCH_PROBE_URL = "http://127.0.0.1:7861/api/search"
+SEARCH_PROBE_QUERY = os.getenv("SECONDMIND_HEALTH_QUERY", "test")
+SEARCH_PROBE_SLOW_MS = 2000  # au-delà, la recherche répond mais le service est dégradé
+# Gravité des états, pour l'état global (le pire des sondes critiques)
+STATUS_ORDER = {'ok': 0, 'active': 0, 'degraded': 1, 'missing': 2, 'inactive': 2,
+                'down': 2, 'timeout': 2, 'error': 2}
+
+
+def sonde_fichier(path):
+    """Présence d'un fichier : {'status': 'ok'|'missing', 'path', 'size_mb'}"""
+    def sonde():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {'status': 'missing', 'path': path}
+        return {'status': 'ok', 'path': path, 'size_mb': round(stat.st_size / (1024 * 1024), 3)}
+    return sonde
+
+
+def sonde_port(port, host="127.0.0.1", timeout=1.0):
+    """Port TCP à l'écoute : {'status': 'active'|'inactive'}"""
+    def sonde():
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            return {'status': 'active' if s.connect_ex((host, port)) == 0 else 'inactive'}
+    return sonde
+
+
+def sonde_recherche(url=SEARCH_PROBE_URL, query=SEARCH_PROBE_QUERY, timeout=PROBE_TIMEOUT,
+                    slow_ms=SEARCH_PROBE_SLOW_MS):
+    """Recherche synthétique de bout en bout sur l'API JSON du RAG local
+
+    'ok' seulement si la requête aboutit avec au moins un résultat dans le délai slow_ms ;
+    'degraded' si la réponse est lente ou vide, 'down' si le service refuse ou n'est pas prêt.
+    Requête constante : l'embedding est servi par le cache de l'application, la mesure
+    couvre l'API, la recherche FAISS et la lecture des documents. L'en-tête PROBE_HEADER
+    exclut ces recherches des requêtes comptées, des latences et du cache d'embeddings.
+    """
+    def sonde():
+        params = urllib.parse.urlencode({'q': query, 'k': 1})
+        requete = urllib.request.Request(f"{url}?{params}", headers={PROBE_HEADER: "1"})
+        debut = time.perf_counter()
+        try:
+            with urllib.request.urlopen(requete, timeout=timeout) as reponse:
+                data = json.loads(reponse.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return {'status': 'down', 'http_status': e.code}
+        except (urllib.error.URLError, OSError) as e:
+            return {'status': 'down', 'error': str(getattr(e, 'reason', e))}
+        lente = (time.perf_counter() - debut) * 1000 > slow_ms
+        return {'status': 'degraded' if lente or not data.get('count') else 'ok',
+                'results': data.get('count', 0), 'detail': data.get('status')}
+    return sonde
+
+
+class HealthMonitor:
+    """Exécute les sondes en parallèle toutes les `interval` secondes et garde le dernier tour
+
+    Une sonde encore en cours au tour suivant n'est pas relancée (pas d'accumulation de
+    connexions bloquées) : elle reste 'timeout' jusqu'à ce qu'elle se termine.
+    """
+
+    def __init__(self, probes, critical=(), interval=HEALTH_INTERVAL, timeout=PROBE_TIMEOUT):
+        self.probes = dict(probes)
+        self.critical = tuple(critical)
+        self.interval = interval
+        self.timeout = timeout
+        self.history = MetricsHistory(
+            [f"{name}.{field}" for name in self.probes for field in ('latency_ms', 'up')]
+        )
+        self._results = {}
+        self._checked_at = None
+        self._en_cours = {}   # nom → future d'une sonde pas encore terminée
+        self._executor = ThreadPoolExecutor(max_workers=len(self.probes), thread_name_prefix="health")
+        self._lock = threading.Lock()
+        self._tour_lock = threading.Lock()   # un seul tour à la fois
+        self._thread = None
+
+    def start(self):
+        """Lance les tours de sondes dans un thread démon (le premier immédiatement)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def _boucle(self):
+        while True:
+            debut = time.monotonic()
+            self.run_once()
+            time.sleep(max(0.0, self.interval - (time.monotonic() - debut)))
+
+    def _mesurer(self, probe):
+        debut = time.perf_counter()
+        try:
+            resultat = probe()
+        except Exception as e:
+            resultat = {'status': 'error', 'error': str(e)}
+        resultat['latency_ms'] = round((time.perf_counter() - debut) * 1000, 3)
+        return resultat
+
+    def run_once(self):
+        """Un tour de toutes les sondes en parallèle (attente bornée par timeout)"""
+        with self._tour_lock:
+            return self._tour()
+
+    def _tour(self):
+        maintenant = time.time()
+        futures = {}
+        for name, probe in self.probes.items():
+            future = self._en_cours.get(name)
+            if future is None or future.done():
+                future = self._en_cours[name] = self._executor.submit(self._mesurer, probe)
+            futures[name] = future
+        wait(futures.values(), timeout=self.timeout)
+
+        resultats, echantillon = {}, {}
+        checked_at = datetime.fromtimestamp(maintenant).isoformat()
+        for name, future in futures.items():
+            if future.done():
+                resultat = dict(future.result(), checked_at=checked_at)
+                self._en_cours.pop(name, None)
+            else:
+                resultat = {'status': 'timeout', 'latency_ms': None, 'checked_at': checked_at}
+            resultats[name] = resultat
+            gravite = STATUS_ORDER.get(resultat['status'], 2)
+            # Latence gardée même lente (dégradée) ; pas de latence pour un service absent
+            echantillon[f"{name}.latency_ms"] = resultat['latency_ms'] if gravite <= 1 else math.nan
+            echantillon[f"{name}.up"] = 1.0 if gravite == 0 else 0.0
+        self.history.add(maintenant, echantillon)
+        with self._lock:
+            self._results = resultats
+            self._checked_at = maintenant
+        return resultats
+
+    def snapshot(self):
+        """Dernier tour : état global, âge du résultat et état de chaque service"""
+        with self._lock:
+            resultats, checked_at = self._results, self._checked_at
+        if checked_at is None:
+            # Jamais sondé (thread pas encore démarré) : un premier tour à la demande
+            self.run_once()
+            with self._lock:
+                resultats, checked_at = self._results, self._checked_at
+        pires = [resultats[name]['status'] for name in self.critical if name in resultats]
+        status = max(pires, key=lambda s: STATUS_ORDER.get(s, 2)) if pires else 'ok'
+        return {
+            'status': {0: 'ok', 1: 'degraded'}.get(STATUS_ORDER.get(status, 2), 'down'),
+            'timestamp': datetime.now().isoformat(),
+            'checked_at': datetime.fromtimestamp(checked_at).isoformat(),
+            'age_s': round(time.time() - checked_at, 3),
+            'interval_s': self.interval,
+            'services': resultats,
+        }
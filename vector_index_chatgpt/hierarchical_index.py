@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Index hiérarchique pour SecondMind RAG
+Un vecteur centroïde par bloc de conversation (index grossier), les lignes en dessous :
+la requête choisit d'abord les conversations, puis ne compare que leurs lignes
+"""
+
+import numpy as np
+from mmap_store import charger_npz
+
+BLOCKS_INDEX_FILENAME = "blocks.npz"
+BLOCK_MAX_DOCUMENTS = 200   # une longue conversation est découpée en tranches de cette taille
+BUILD_CHUNK_SIZE = 65536    # vecteurs relus à la fois pendant la construction
+
+
+def debuts_blocs(conversations, max_documents=BLOCK_MAX_DOCUMENTS):
+    """Premier id de document de chaque bloc (conversations contiguës, tranches ≤ max_documents)"""
+    n = len(conversations)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    changements = np.flatnonzero(np.diff(conversations)) + 1
+    debuts_conv = np.concatenate([[0], changements])
+    fins_conv = np.concatenate([changements, [n]])
+    return np.concatenate([
+        np.arange(debut, fin, max_documents) for debut, fin in zip(debuts_conv, fins_conv)
+    ]).astype(np.int64)
+
+
+class BlockIndex:
+    """Index grossier : centroïdes normalisés des blocs + bornes des blocs en ids de documents"""
+
+    def __init__(self, centroids, starts, n_docs):
+        self.centroids = centroids  # float32[n_blocs, d], normalisés
+        self.starts = starts        # int64[n_blocs], croissant
+        self.n_docs = int(n_docs)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def ends(self):
+        return np.append(self.starts[1:], self.n_docs)
+
+    @classmethod
+    def build(cls, index, conversations, max_documents=BLOCK_MAX_DOCUMENTS):
+        """Calcule les centroïdes à partir des vecteurs de l'index FAISS (relus par tranches)
+
+        conversations : int[n_docs], numéro de conversation de chaque document (ordre des ids).
+        """
+        starts = debuts_blocs(np.asarray(conversations), max_documents)
+        n_docs = index.ntotal
+        sums = np.zeros((len(starts), index.d), dtype=np.float32)
+        bloc_of_doc = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n_docs)))
+
+        for c0 in range(0, n_docs, BUILD_CHUNK_SIZE):
+            c1 = min(c0 + BUILD_CHUNK_SIZE, n_docs)
+            vectors = index.reconstruct_n(c0, c1 - c0)
+            blocs = bloc_of_doc[c0:c1]
+            # Segments de blocs dans la tranche : une somme par segment, sans boucle par document
+            segments = np.flatnonzero(np.diff(blocs, prepend=-1))
+            sums[blocs[segments]] += np.add.reduceat(vectors, segments, axis=0)
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        np.divide(sums, norms, out=sums, where=norms > 0)
+        return cls(sums, starts, n_docs)
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, starts=self.starts, n_docs=np.int64(self.n_docs))
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        data = charger_npz(path, mmap)
+        return cls(data['centroids'], data['starts'], int(data['n_docs']))
+
+    def search(self, query_vector, n_blocs, mask=None):
+        """Ids des n_blocs blocs les plus proches de la requête (vecteur normalisé)
+
+        mask : documents autorisés ; un bloc sans aucun document autorisé est ignoré.
+        """
+        scores = self.centroids @ np.asarray(query_vector, dtype=np.float32).ravel()
+        if mask is not None:
+            autorises = np.add.reduceat(mask.astype(np.int32), self.starts) > 0
+            scores[~autorises] = -np.inf
+        n_blocs = min(n_blocs, len(scores))
+        top = np.argpartition(-scores, n_blocs - 1)[:n_blocs]
+        return top[np.isfinite(scores[top])]
+
+    def documents(self, blocs):
+        """Ids des documents (lignes) contenus dans les blocs donnés"""
+        ends = self.ends
+        return np.concatenate([np.arange(self.starts[b], ends[b]) for b in blocs]) \
+            if len(blocs) else np.zeros(0, dtype=np.int64)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Ingestion commune aux scripts de vectorisation SecondMind
+Découpage des conversations en documents et écriture des fichiers partagés par les index nommés
+"""
+import os
+import re
+import pickle
+from datetime import datetime
+from lexical_index import BM25Index, LEXICAL_INDEX_FILENAME
+from metadata_columns import MetadataColumns, METADATA_COLUMNS_FILENAME
+from mmap_store import DocumentStore, DOCUMENTS_STORE_FILENAME
+
+DOCUMENTS_FILENAME = "index.pkl"
+# Début d'un bloc de conversation (même découpage que fix_faiss_index.regenerate_from_source)
+CONVERSATION_MARKERS = ('=== Conversation', '---')
+# Date d'un en-tête de conversation, ou préfixe "[2024-03-12 14:05]" d'une ligne
+HORODATAGE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})(?:[T ](\d{2}:\d{2}(?::\d{2})?))?')
+PREFIXE_HORODATAGE_RE = re.compile(r'^\s*\[(\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?)?)\]\s*')
+
+
+def nettoyer_ligne(texte):
+    """Nettoie et standardise une ligne de texte"""
+    return texte.strip().replace("\n", " ").replace("\r", "").replace("  ", " ").strip()
+
+
+def lire_horodatage(texte):
+    """Premier horodatage ISO trouvé dans le texte (ISO normalisé), ou None"""
+    match = HORODATAGE_RE.search(texte)
+    if not match:
+        return None
+    date, heure = match.groups()
+    try:
+        return datetime.fromisoformat(f"{date}T{heure}" if heure else date).isoformat()
+    except ValueError:
+        return None
+
+
+def extraire_role_et_contenu(ligne):
+    """Extrait le rôle et le contenu d'une ligne de conversation"""
+    ligne_nettoyee = nettoyer_ligne(ligne)
+    if not ligne_nettoyee:
+        return None, None
+
+    # Détection du format "role|contenu" ou similaire
+    if "|" in ligne_nettoyee:
+        parts = ligne_nettoyee.split("|", 1)
+        role = parts[0].strip().lower()
+        contenu = parts[1].strip()
+    elif ligne_nettoyee.lower().startswith(("user:", "assistant:", "human:", "ai:")):
+        parts = ligne_nettoyee.split(":", 1)
+        role = parts[0].strip().lower()
+        contenu = parts[1].strip() if len(parts) > 1 else ""
+    else:
+        role = "unknown"
+        contenu = ligne_nettoyee
+
+    return role, contenu
+
+
+def extraire_documents(all_lines, source="conversations_extraites.txt", horodatage_defaut=None):
+    """Transforme les lignes du fichier source en (contenus, métadonnées, statistiques)
+
+    Un document par ligne non vide ; l'ordre des documents est celui des ids FAISS.
+    Chaque document porte le numéro du bloc de conversation qui le contient et
+    l'horodatage de ce bloc (date de l'en-tête "=== Conversation 2024-03-12 ==="),
+    précisé par un préfixe "[2024-03-12 14:05]" en début de ligne s'il existe.
+    horodatage_defaut : horodatage des lignes sans date connue (ex. date du fichier source).
+    """
+    contenus = []
+    metadatas = []
+    stats = {"user": 0, "assistant": 0, "unknown": 0, "empty": 0}
+    conversation = 0
+    horodatage_conversation = horodatage_defaut
+
+    for i, line in enumerate(all_lines):
+        if line.startswith(CONVERSATION_MARKERS):
+            conversation += 1
+            horodatage_conversation = lire_horodatage(line) or horodatage_defaut
+        horodatage = horodatage_conversation
+        prefixe = PREFIXE_HORODATAGE_RE.match(line)
+        if prefixe:
+            horodatage = lire_horodatage(prefixe.group(1)) or horodatage
+            line = line[prefixe.end():]
+        role, contenu = extraire_role_et_contenu(line)
+
+        if not contenu:
+            stats["empty"] += 1
+            continue
+
+        # Mise à jour des statistiques
+        if role in stats:
+            stats[role] += 1
+        else:
+            stats["unknown"] += 1
+
+        contenus.append(contenu)
+        metadatas.append({
+            "source": source,
+            "ligne": i + 1,
+            "role": role,
+            "longueur": len(contenu),
+            "conversation": conversation,
+            "timestamp": horodatage
+        })
+
+    return contenus, metadatas, stats
+
+
+def horodatage_fichier(path):
+    """Date de dernière modification du fichier source (horodatage par défaut des lignes)"""
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+
+def sauvegarder_documents_partages(contenus, metadatas, db_path):
+    """Écrit les fichiers communs aux index local et online (mêmes ids de documents)
+
+    - index.pkl : textes, rôles et lignes (format lu par app_gradio_local.py)
+    - lexical_index.npz : index BM25
+    - metadata_columns.npz : colonnes rôle / ligne / horodatage et index positionnel
+    - documents.npz : textes en bloc UTF-8, mappables par les processus de service (--workers)
+    Retourne (BM25Index, MetadataColumns).
+    """
+    metadatas_list = []
+    for contenu, metadata in zip(contenus, metadatas):
+        metadatas_list.append({
+            "ligne_originale": metadata["ligne"],
+            "role": metadata["role"],
+            "texte_complet": contenu,
+            "longueur": metadata["longueur"]
+        })
+
+    with open(os.path.join(db_path, DOCUMENTS_FILENAME), "wb") as f:
+        pickle.dump(metadatas_list, f)
+
+    DocumentStore.build(contenus).save(os.path.join(db_path, DOCUMENTS_STORE_FILENAME))
+
+    lexical = BM25Index.build(contenus)
+    lexical.save(os.path.join(db_path, LEXICAL_INDEX_FILENAME))
+
+    columns = MetadataColumns.build(metadatas)
+    columns.save(os.path.join(db_path, METADATA_COLUMNS_FILENAME))
+
+    return lexical, columns
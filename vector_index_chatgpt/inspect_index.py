@@ -4,7 +4,7 @@ import os
 import json
 
 # === Chemin de l'index
-DB_FAISS_PATH = r"C:\Users\rag_personnel\Logs\vector_index_chatgpt"
+DB_FAISS_PATH = r"C:\Users\rag_personnel\Logs\vector_index_chatgpt\online"  # ou \local avec HuggingFace
 
 # === Chargement des embeddings
 embeddings = OpenAIEmbeddings(
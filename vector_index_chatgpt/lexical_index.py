@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Index lexical BM25 pour SecondMind RAG
+Index inversé compact (CSR NumPy) construit à la vectorisation, dans l'ordre des vecteurs FAISS
+"""
+
+import re
+import unicodedata
+from array import array
+import numpy as np
+from mmap_store import DocumentStore, charger_npz
+
+LEXICAL_INDEX_FILENAME = "lexical_index.npz"
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokeniser(texte):
+    """Découpe un texte en termes normalisés (minuscules, sans accents)"""
+    texte = unicodedata.normalize('NFKD', texte.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return TOKEN_PATTERN.findall(texte)
+
+
+class BM25Index:
+    """Index inversé BM25 : postings triés par terme, poids BM25 précalculés
+
+    Vocabulaire en bloc UTF-8 + offsets (DocumentStore) : un tableau de chaînes NumPy
+    aurait la largeur du plus long terme pour chaque entrée.
+    """
+
+    def __init__(self, terms, indptr, doc_ids, impacts, idf, n_docs):
+        self.terms = terms        # DocumentStore (ou liste) : terme i
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.indptr = indptr      # int64[n_terms + 1]
+        self.doc_ids = doc_ids    # int32[n_postings]
+        self.impacts = impacts    # float32[n_postings], partie tf/longueur du score BM25
+        self.idf = idf            # float32[n_terms]
+        self.n_docs = n_docs
+
+    @classmethod
+    def build(cls, texts, k1=BM25_K1, b=BM25_B):
+        """Construit l'index à partir des textes (document i = vecteur FAISS i)"""
+        vocab = {}
+        # Tampons compacts (4 octets par posting) : des millions de lignes tiennent en mémoire
+        post_terms, post_docs, post_tfs = array('i'), array('i'), array('f')
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for doc_id, texte in enumerate(texts):
+            tokens = tokeniser(texte)
+            doc_lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                post_terms.append(vocab.setdefault(token, len(vocab)))
+                post_docs.append(doc_id)
+                post_tfs.append(tf)
+
+        post_terms = np.frombuffer(post_terms, dtype=np.int32)
+        post_docs = np.frombuffer(post_docs, dtype=np.int32)
+        post_tfs = np.frombuffer(post_tfs, dtype=np.float32)
+
+        # Regroupement des postings par terme (format CSR)
+        order = np.argsort(post_terms, kind='stable')
+        post_terms, post_docs, post_tfs = post_terms[order], post_docs[order], post_tfs[order]
+        df = np.bincount(post_terms, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+
+        n_docs = len(texts)
+        avgdl = float(doc_lengths.mean()) if n_docs else 0.0
+        norm = k1 * (1 - b + b * doc_lengths[post_docs] / max(avgdl, 1e-9))
+        impacts = (post_tfs * (k1 + 1) / (post_tfs + norm)).astype(np.float32)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        # vocab conserve l'ordre d'insertion : terme i à la position i
+        return cls(DocumentStore.build(vocab), indptr, post_docs, impacts, idf, n_docs)
+
+    def save(self, path):
+        """Sauvegarde l'index (npz, sans pickle)"""
+        np.savez(
+            path,
+            terms_blob=self.terms.blob,
+            terms_offsets=self.terms.offsets,
+            indptr=self.indptr,
+            doc_ids=self.doc_ids,
+            impacts=self.impacts,
+            idf=self.idf,
+            n_docs=np.int64(self.n_docs),
+        )
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """Charge un index sauvegardé par save() (mmap=True : postings partagés en lecture seule)"""
+        data = charger_npz(path, mmap)
+        if 'terms' in data:
+            terms = data['terms'].tolist()  # ancien format (chaînes à largeur fixe)
+        else:
+            terms = DocumentStore(data['terms_blob'], data['terms_offsets'])
+        return cls(
+            terms, data['indptr'], data['doc_ids'],
+            data['impacts'], data['idf'], int(data['n_docs'])
+        )
+
+    def scores(self, query):
+        """Scores BM25 de tous les documents pour la requête (vecteur dense float32)"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for token in set(tokeniser(query)):
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # Un document apparaît au plus une fois par terme : l'addition indexée est sûre
+            scores[self.doc_ids[start:end]] += self.idf[term_id] * self.impacts[start:end]
+        return scores
+
+    def search(self, query, k, mask=None):
+        """Retourne (scores, ids) des k meilleurs documents ayant au moins un terme commun
+
+        mask : tableau booléen optionnel des documents autorisés (filtres de métadonnées).
+        """
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = np.argsort(-scores[candidates], kind='stable')
+        ids = candidates[order]
+        return scores[ids], ids
+
+
+def fusion_rrf(rankings, k, rrf_k=60):
+    """Fusion par rangs réciproques (RRF) de plusieurs listes d'ids classées
+
+    Les échelles de score (distance L2, BM25) ne sont pas comparables ;
+    seuls les rangs sont combinés. Retourne [(id, score_fusionné)] trié.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Index inversé incrémental des logs pour le serveur de monitoring SecondMind
+Lignes réparties en segments horaires (les plus anciens sont évincés) ;
+chaque segment garde ses postings terme → numéros de lignes, triés par construction
+"""
+
+import threading
+import time
+from array import array
+from datetime import datetime
+from functools import reduce
+import numpy as np
+from log_records import LOG_LEVELS, parse_log_line, tokeniser_log
+
+LOG_SEGMENT_SECONDS = 3600   # durée couverte par un segment
+LOG_MAX_SEGMENTS = 48        # segments gardés (48 h de logs)
+LOG_SEARCH_LIMIT = 100
+
+
+class _Segment:
+    """Lignes d'une tranche de temps : colonnes + postings (array d'entiers, sans copie à la lecture)"""
+
+    def __init__(self, debut):
+        self.debut = debut
+        self.timestamps = array('d')
+        self.levels = array('B')   # index dans LOG_LEVELS + 1, 0 = inconnu
+        self.logs = array('B')     # index du nom de log dans LogIndex.log_names
+        self.lines = []
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add(self, timestamp, level, log, line, termes):
+        i = len(self.lines)
+        self.timestamps.append(timestamp)
+        self.levels.append(level)
+        self.logs.append(log)
+        self.lines.append(line)
+        for terme in set(termes):
+            postings = self.postings.get(terme)
+            if postings is None:
+                postings = self.postings[terme] = array('I')
+            postings.append(i)
+
+    def search(self, termes, debut, fin, level, log):
+        """Numéros des lignes contenant tous les termes et passant les filtres"""
+        if termes:
+            listes = [self.postings.get(terme) for terme in termes]
+            if any(liste is None for liste in listes):
+                return np.zeros(0, dtype=np.int64)
+            listes = sorted((np.frombuffer(liste, dtype=np.uint32) for liste in listes), key=len)
+            ids = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), listes).astype(np.int64)
+        else:
+            ids = np.arange(len(self.lines))
+
+        garder = np.ones(len(ids), dtype=bool)
+        if debut is not None or fin is not None:
+            timestamps = np.frombuffer(self.timestamps, dtype=np.float64)[ids]
+            if debut is not None:
+                garder &= timestamps >= debut
+            if fin is not None:
+                garder &= timestamps <= fin
+        if level is not None:
+            garder &= np.frombuffer(self.levels, dtype=np.uint8)[ids] == level
+        if log is not None:
+            garder &= np.frombuffer(self.logs, dtype=np.uint8)[ids] == log
+        return ids[garder]
+
+
+class LogIndex:
+    """Recherche plein texte sur les lignes ingérées (thread watchdog) et interrogées (Flask)
+
+    Une ligne hors format (suite de traceback) hérite de l'horodatage et du niveau de
+    la dernière ligne formatée du même log : une recherche par niveau trouve la trace complète.
+    """
+
+    def __init__(self, segment_seconds=LOG_SEGMENT_SECONDS, max_segments=LOG_MAX_SEGMENTS):
+        self.segment_seconds = segment_seconds
+        self.max_segments = max_segments
+        self.log_names = []
+        self._log_ids = {}
+        self._segments = {}        # numéro de tranche → _Segment
+        self._dernier = {}         # log → (horodatage, niveau) de la dernière ligne formatée
+        self._lock = threading.Lock()
+
+    def add_lines(self, log, lines, records=None):
+        """Indexe les nouvelles lignes d'un log (records : lignes déjà lues par parse_log_line)"""
+        if records is None:
+            records = [parse_log_line(line, log) for line in lines]
+        with self._lock:
+            log_id = self._log_ids.get(log)
+            if log_id is None:
+                log_id = self._log_ids[log] = len(self.log_names)
+                self.log_names.append(log)
+            for line, record in zip(lines, records):
+                if not line:
+                    continue
+                if record is not None:
+                    horodatage = record.timestamp
+                    level = LOG_LEVELS.index(record.level) + 1 if record.level in LOG_LEVELS else 0
+                    self._dernier[log] = (horodatage, level)
+                else:
+                    horodatage, level = self._dernier.get(log, (time.time(), 0))
+                segment = self._segment(int(horodatage // self.segment_seconds))
+                if segment is not None:
+                    segment.add(horodatage, level, log_id, line, tokeniser_log(line))
+
+    def _segment(self, tranche):
+        """Segment de la tranche (créé au besoin), None si plus ancien que tout ce qui est gardé"""
+        segment = self._segments.get(tranche)
+        if segment is not None:
+            return segment
+        if len(self._segments) >= self.max_segments and tranche < min(self._segments):
+            return None
+        segment = self._segments[tranche] = _Segment(tranche * self.segment_seconds)
+        # Éviction des segments les plus anciens
+        for ancienne in sorted(self._segments)[:max(len(self._segments) - self.max_segments, 0)]:
+            del self._segments[ancienne]
+        return segment
+
+    def search(self, query, debut=None, fin=None, level=None, log=None, limit=LOG_SEARCH_LIMIT):
+        """Lignes contenant tous les termes de la requête, des plus récentes aux plus anciennes
+
+        debut / fin : epoch ; level : 'ERROR', 'WARNING'... ; log : nom de LOG_FILES.
+        Les segments sont parcourus du plus récent au plus ancien, arrêt dès `limit` résultats.
+        """
+        termes = tokeniser_log(query or "")
+        level_id = LOG_LEVELS.index(level.upper()) + 1 if level else None
+        resultats = []
+        with self._lock:
+            log_id = self._log_ids.get(log) if log else None
+            if log and log_id is None:
+                return []
+            for tranche in sorted(self._segments, reverse=True):
+                segment = self._segments[tranche]
+                if fin is not None and segment.debut > fin:
+                    continue
+                if debut is not None and segment.debut + self.segment_seconds <= debut:
+                    break
+                ids = segment.search(termes, debut, fin, level_id, log_id)
+                if not len(ids):
+                    continue
+                timestamps = np.frombuffer(segment.timestamps, dtype=np.float64)[ids]
+                for i in ids[np.argsort(-timestamps, kind='stable')][:limit - len(resultats)]:
+                    resultats.append({
+                        'log': self.log_names[segment.logs[i]],
+                        'timestamp': datetime.fromtimestamp(segment.timestamps[i]).isoformat(),
+                        'level': LOG_LEVELS[segment.levels[i] - 1] if segment.levels[i] else None,
+                        'line': segment.lines[i],
+                    })
+                if len(resultats) >= limit:
+                    break
+        return resultats
+
+    def stats(self):
+        with self._lock:
+            return {
+                'segments': len(self._segments),
+                'lines': sum(len(segment) for segment in self._segments.values()),
+                'terms': sum(len(segment.postings) for segment in self._segments.values()),
+            }
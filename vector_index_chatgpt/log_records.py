@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture des lignes de logs SecondMind
+Format commun à tous les composants : '%(asctime)s - %(levelname)s - %(message)s'.
+Chaque ligne devient un enregistrement (horodatage, niveau, source, message) ;
+le gabarit d'un message remplace ses valeurs variables pour regrouper les messages semblables
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+from datetime import datetime
+
+LOG_LINE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:,\d{1,6})?) - ([A-Z]+) - (.*)$')
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+TEMPLATE_MAX_LENGTH = 200
+# Valeurs variables remplacées dans les gabarits (dans cet ordre)
+TEMPLATE_SUBSTITUTIONS = (
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "'<*>'"),
+    (re.compile(r"(?:\b[A-Za-z]:)?[\\/][^\s:,;()']+"), "<chemin>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\b\d+(?:[.,]\d+)?\b"), "<n>"),
+)
+
+LogRecord = namedtuple('LogRecord', ['timestamp', 'level', 'source', 'message'])
+
+
+def parse_log_line(line, source=None):
+    """LogRecord(timestamp epoch, niveau, source, message), ou None si la ligne ne suit pas
+    le format (suite d'un traceback, print, etc.) ; source : nom du log d'origine"""
+    match = LOG_LINE_RE.match(line)
+    if not match:
+        return None
+    asctime, level, message = match.groups()
+    try:
+        timestamp = datetime.fromisoformat(asctime.replace(',', '.')).timestamp()
+    except ValueError:
+        return None
+    return LogRecord(timestamp, level, source, message)
+
+
+def gabarit_message(message):
+    """Gabarit d'un message : chaînes entre guillemets, chemins et nombres remplacés
+
+    "Recherche effectuée : 'genou' -> 5 résultats (premier résultat 12 ms, total 30 ms)"
+    → "Recherche effectuée : '<*>' -> <n> résultats (premier résultat <n> ms, total <n> ms)"
+    """
+    for motif, remplacement in TEMPLATE_SUBSTITUTIONS:
+        message = motif.sub(remplacement, message)
+    return message[:TEMPLATE_MAX_LENGTH]
+
+
+def tokeniser_log(texte):
+    """Termes d'une ligne de log : minuscules, sans accents, découpage sur \\w+"""
+    texte = texte.lower()
+    if not texte.isascii():
+        texte = "".join(c for c in unicodedata.normalize('NFKD', texte) if not unicodedata.combining(c))
+    return TOKEN_RE.findall(texte)
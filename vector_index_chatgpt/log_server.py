@@ -6,15 +6,27 @@ Version corrigée avec chemins absolus et améliorations
 
 import os
 import sys
+import gzip
+import math
 import json
 import time
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template_string
+from werkzeug.http import is_resource_modified
 import threading
 import logging
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-import psutil
+from metrics_history import MetricsHistory, SystemSampler, MONITORED_SCRIPTS, SYSTEM_FIELDS
+from log_tail import LogFollower, lire_dernieres_lignes
+from event_stream import EventHub, STREAM_HEARTBEAT, format_sse
+from file_events import FileEventStore
+from log_index import LogIndex, LOG_SEARCH_LIMIT
+from log_records import LOG_LEVELS, parse_log_line
+from log_stats import LogAggregator, STATS_TOP_TEMPLATES
+from metrics_client import METRICS_UDP_HOST, METRICS_UDP_PORT
+from metrics_collector import MetricsCollector
+from health_probes import HealthMonitor, sonde_fichier, sonde_port, sonde_recherche
 
 # Configuration des chemins absolus
 BASE_DIR = r"C:\Users\rag_personnel\Logs"
@@ -27,6 +39,15 @@ LOG_FILES = {
     'server': os.path.join(BASE_DIR, 'log_server.log')
 }
 
+DISK_PATH = 'C:'
+SAMPLE_INTERVAL = 1    # secondes entre deux échantillons système
+PUBLISH_EVERY = 10     # échantillons entre deux mises à jour du dashboard
+HISTORY_MAX_POINTS = 2000
+GZIP_MIN_SIZE = 1024   # octets en dessous desquels une réponse n'est pas compressée
+GZIP_LEVEL = 6
+# Distingue les ETag d'une instance du serveur à l'autre (les numéros de lignes repartent de 0)
+SERVER_INSTANCE = format(int(time.time() * 1000), 'x')
+
 INDEX_DIR = os.path.join(BASE_DIR, "vector_index_chatgpt")
 CONVERSATIONS_FILE = os.path.join(BASE_DIR, "conversations_extraites.txt")
 
@@ -45,55 +66,95 @@ logging.basicConfig(
 )
 
 # Variables globales pour le monitoring
-log_data = {}
 system_stats = {}
-file_changes = []
+file_stats = {}
+# Index plein texte des lignes ingérées (segments horaires, 48 h)
+log_index = LogIndex()
+# Comptes par minute par niveau et par gabarit de message (24 h)
+log_stats = LogAggregator()
+# Changements des logs (rafales regroupées), interrogeables par fichier et par période
+file_events = FileEventStore()
+# Un suivi incrémental par log (offset + tampon des dernières lignes), alimenté par watchdog
+log_followers = {name: LogFollower(filepath) for name, filepath in LOG_FILES.items()}
+_followers_by_path = {os.path.normcase(os.path.abspath(filepath)): name
+                      for name, filepath in LOG_FILES.items()}
+# Nouvelles lignes et variations des métriques, diffusées aux dashboards (/api/stream)
+event_hub = EventHub()
+# Échantillons système (1 s) et leurs moyennes par minute et par heure
+sampler = SystemSampler(DISK_PATH)
+metrics_history = MetricsHistory(sampler.fields)
+# Compteurs, jauges et latences envoyés par les applications (UDP), exportés en Prometheus
+metrics_collector = MetricsCollector()
+# Sondes de santé en parallèle dans un thread de fond ; /api/health sert le dernier résultat
+health_monitor = HealthMonitor(
+    {
+        **{name: sonde_fichier(path) for name, path in LOG_FILES.items()},
+        **{f'port_{port}': sonde_port(port) for port in (7860, 7861)},  # Ports Gradio
+        'search': sonde_recherche(),
+    },
+    critical=('search',)
+)
 
 class LogFileHandler(FileSystemEventHandler):
     """Gestionnaire des changements de fichiers de logs"""
     
     def on_modified(self, event):
-        if not event.is_directory and event.src_path.endswith('.log'):
-            file_changes.append({
-                'file': os.path.basename(event.src_path),
-                'timestamp': datetime.now().isoformat(),
-                'type': 'modified',
-                'path': event.src_path
-            })
-            # Garder seulement les 100 derniers changements
-            if len(file_changes) > 100:
-                file_changes.pop(0)
+        if not event.is_directory:
+            file_events.add(event.src_path, 'modified')
+            follow_log(event.src_path)
+    
+    def on_created(self, event):
+        # Rotation : le nouveau fichier est repéré par son inode
+        if not event.is_directory:
+            file_events.add(event.src_path, 'created')
+            follow_log(event.src_path)
+    
+    def on_deleted(self, event):
+        if not event.is_directory:
+            file_events.add(event.src_path, 'deleted')
+    
+    def on_moved(self, event):
+        if not event.is_directory:
+            file_events.add(event.src_path, 'moved')
+
+def follow_log(path):
+    """Lit les lignes ajoutées à un log suivi (appelé à chaque événement watchdog)"""
+    name = _followers_by_path.get(os.path.normcase(os.path.abspath(path)))
+    if name is None:
+        return
+    try:
+        nouvelles = log_followers[name].lire_nouveautes()
+        if nouvelles:
+            records = [parse_log_line(line, name) for line in nouvelles]
+            log_index.add_lines(name, nouvelles, records)
+            log_stats.add(records)
+            event_hub.publish('log', {'name': name, 'lines': nouvelles})
+    except OSError as e:
+        # Pas de logging.error ici : log_server.log est lui-même suivi
+        print(f"⚠️ Lecture incrémentale impossible ({path}): {e}")
 
 def read_log_file(filepath, lines=50):
-    """Lit les dernières lignes d'un fichier de log"""
+    """Lit les dernières lignes d'un fichier de log (depuis la fin, sans lire tout le fichier)"""
     try:
         if not os.path.exists(filepath):
             return []
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
-            return [line.strip() for line in all_lines[-lines:]]
+        return lire_dernieres_lignes(filepath, lines)
     except Exception as e:
         logging.error(f"Erreur lecture log {filepath}: {e}")
         return [f"Erreur: {str(e)}"]
 
-def get_system_info():
-    """Récupère les informations système"""
+def get_system_info(sample):
+    """Informations système du dashboard à partir d'un échantillon du sampler"""
     try:
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('C:')
-        
-        return {
-            'cpu_percent': cpu_percent,
-            'memory_percent': memory.percent,
-            'memory_used_gb': memory.used / (1024**3),
-            'memory_total_gb': memory.total / (1024**3),
-            'disk_percent': disk.percent,
-            'disk_used_gb': disk.used / (1024**3),
-            'disk_total_gb': disk.total / (1024**3),
-            'timestamp': datetime.now().isoformat()
+        info = {field: sample[field] for field in SYSTEM_FIELDS}
+        # Processus surveillés en cours d'exécution seulement (NaN = absent)
+        info['processes'] = {
+            name: {'cpu_percent': sample[f"{name}.cpu_percent"], 'rss_mb': sample[f"{name}.rss_mb"]}
+            for name in MONITORED_SCRIPTS if not math.isnan(sample[f"{name}.rss_mb"])
         }
+        info['timestamp'] = datetime.now().isoformat()
+        return info
     except Exception as e:
         logging.error(f"Erreur récupération système: {e}")
         return {}
@@ -105,7 +166,8 @@ def get_file_stats():
     files_to_check = {
         'conversations': CONVERSATIONS_FILE,
         'index_pkl': os.path.join(INDEX_DIR, 'index.pkl'),
-        'index_faiss': os.path.join(INDEX_DIR, 'index.faiss')
+        'index_faiss': os.path.join(INDEX_DIR, 'local', 'index.faiss'),
+        'index_faiss_online': os.path.join(INDEX_DIR, 'online', 'index.faiss')
     }
     
     for name, path in files_to_check.items():
@@ -125,28 +187,82 @@ def get_file_stats():
     return stats
 
 def update_log_data():
-    """Met à jour les données de logs"""
-    global log_data
-    
-    for name, filepath in LOG_FILES.items():
-        log_data[name] = {
-            'lines': read_log_file(filepath),
-            'last_update': datetime.now().isoformat(),
-            'exists': os.path.exists(filepath)
-        }
+    """Lit les ajouts de tous les logs suivis (amorçage, ou sondage si watchdog est indisponible)"""
+    for filepath in LOG_FILES.values():
+        follow_log(filepath)
+
+def log_entry(name, lines=50, since=None):
+    """Lignes d'un log : celles qui suivent le numéro `since` si le tampon les contient encore,
+    sinon les dernières (depuis le tampon en mémoire, ou depuis la fin du fichier au-delà)
+
+    seq : numéro de la dernière ligne, à renvoyer comme since à la requête suivante ;
+    reset : since n'a pas pu être honoré, les lignes sont un nouvel état complet.
+    """
+    follower = log_followers[name]
+    seq, lignes, incremental = follower.depuis(since, min(lines, follower.max_lines))
+    if not incremental and lines > follower.max_lines:
+        lignes = read_log_file(follower.filepath, lines)
+    entry = {
+        'lines': lignes,
+        'seq': seq,
+        'last_update': follower.last_update,
+        'exists': follower.exists
+    }
+    if since is not None:
+        entry['reset'] = not incremental
+    return entry
+
+def parse_since(valeur, names):
+    """Paramètre since : numéro de ligne (un seul log) ou 'nom:numéro,...' → {nom: numéro}"""
+    if not valeur:
+        return {}
+    if ':' not in valeur:
+        if len(names) != 1:
+            raise ValueError("since=<seq> suppose un seul log (sinon since=nom:seq,nom:seq)")
+        return {names[0]: int(valeur)}
+    since = {}
+    for paire in valeur.split(','):
+        name, seq = paire.split(':', 1)
+        if name in names:
+            since[name] = int(seq)
+    return since
+
+def publier_variations(type, avant, apres):
+    """Publie seulement les clés dont la valeur a changé depuis le dernier tour"""
+    delta = {key: value for key, value in apres.items() if avant.get(key) != value}
+    if delta:
+        event_hub.publish(type, delta)
 
-def monitor_loop():
-    """Boucle de monitoring en arrière-plan"""
-    global system_stats
+def monitor_loop(poll_logs=False):
+    """Boucle de monitoring en arrière-plan
+
+    Un échantillon système par seconde (non bloquant) alimente l'historique ;
+    le dashboard reçoit les variations tous les PUBLISH_EVERY échantillons.
+    Les logs sont lus sur événement watchdog ; poll_logs=True les sonde aussi
+    (surveillance des fichiers indisponible).
+    """
+    global system_stats, file_stats
     
+    tour = 0
     while True:
+        debut = time.monotonic()
         try:
-            system_stats = get_system_info()
-            update_log_data()
-            time.sleep(10)  # Mise à jour toutes les 10 secondes
+            sample = sampler.sample()
+            metrics_history.add(time.time(), sample)
+            if tour % PUBLISH_EVERY == 0:
+                nouvelles_stats = get_system_info(sample)
+                publier_variations('system', system_stats, nouvelles_stats)
+                system_stats = nouvelles_stats
+                nouveaux_fichiers = get_file_stats()
+                publier_variations('files', file_stats, nouveaux_fichiers)
+                file_stats = nouveaux_fichiers
+                if poll_logs:
+                    update_log_data()
         except Exception as e:
             logging.error(f"Erreur monitoring: {e}")
             time.sleep(30)
+        tour += 1
+        time.sleep(max(0.0, SAMPLE_INTERVAL - (time.monotonic() - debut)))
 
 # Routes Flask
 @app.route('/')
@@ -156,23 +272,156 @@ def dashboard():
 
 @app.route('/api/logs')
 def get_logs():
-    """API pour récupérer les logs"""
+    """API pour récupérer les logs : ?type=all&lines=50&since=...
+
+    ETag dérivé des numéros de lignes de chaque log : un sondage sans nouvelle ligne reçoit 304
+    sans que la réponse soit construite. since : seulement les lignes ajoutées après ce numéro
+    (champ 'seq' de la réponse précédente ; 'nom:seq,nom:seq' pour plusieurs logs).
+    """
     try:
         lines = int(request.args.get('lines', 50))
         log_type = request.args.get('type', 'all')
+        if log_type != 'all' and log_type not in LOG_FILES:
+            return jsonify({'error': 'Type de log invalide'}), 400
+        names = list(LOG_FILES) if log_type == 'all' else [log_type]
+        since = parse_since(request.args.get('since'), names)
         
-        if log_type == 'all':
-            return jsonify(log_data)
-        elif log_type in LOG_FILES:
-            return jsonify({
-                log_type: {
-                    'lines': read_log_file(LOG_FILES[log_type], lines),
-                    'last_update': datetime.now().isoformat()
-                }
-            })
+        followers = [log_followers[name] for name in names]
+        etat = ",".join(f"{name}:{f.seq}:{int(f.exists)}" for name, f in zip(names, followers))
+        etag = f"{SERVER_INSTANCE}-{lines}-{request.args.get('since', '')}-{etat}"
+        modifies = [f.modifie for f in followers if f.modifie is not None]
+        last_modified = datetime.fromtimestamp(max(modifies)).astimezone() if modifies else None
+        # Décision sur l'ETag seul : Last-Modified (à la seconde) est informatif, une ligne
+        # ajoutée dans la même seconde ne doit pas donner 304 à un client If-Modified-Since
+        if not is_resource_modified(request.environ, etag=etag):
+            reponse = Response(status=304)
         else:
+            reponse = jsonify({name: log_entry(name, lines, since.get(name)) for name in names})
+        reponse.set_etag(etag, weak=True)
+        if last_modified is not None:
+            reponse.last_modified = last_modified
+        reponse.cache_control.no_cache = True
+        return reponse
+    except ValueError as e:
+        return jsonify({'error': f"Paramètre invalide : {e}"}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.after_request
+def compresser(response):
+    """Compression gzip des réponses volumineuses si le client l'accepte (pas du flux SSE)"""
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough \
+            or 'Content-Encoding' in response.headers:
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower():
+        return response
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def stream_snapshot(log_type='all', lines=50):
+    """État complet envoyé à la connexion d'un dashboard (ou si sa reprise est trop ancienne)"""
+    names = list(LOG_FILES) if log_type == 'all' else [log_type]
+    return {
+        'logs': {name: log_entry(name, min(lines, log_followers[name].max_lines)) for name in names},
+        'system': system_stats,
+        'files': file_stats
+    }
+
+@app.route('/api/stream')
+def stream():
+    """Flux SSE : état initial, puis seulement les nouvelles lignes et variations des métriques
+
+    Reprise : le navigateur renvoie Last-Event-ID à la reconnexion (ou ?last_event_id=) ;
+    les événements manqués sont rejoués depuis l'historique, sinon un nouvel état complet est envoyé.
+    """
+    log_type = request.args.get('type', 'all')
+    if log_type != 'all' and log_type not in LOG_FILES:
+        return jsonify({'error': 'Type de log invalide'}), 400
+    lines = int(request.args.get('lines', 50))
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+
+    def generate():
+        dernier = last_id
+        while True:
+            events = event_hub.wait(dernier, STREAM_HEARTBEAT) if dernier is not None else None
+            if events is None:
+                # Id pris avant l'état : un événement concomitant peut être envoyé deux fois, jamais perdu
+                dernier = event_hub.seq
+                yield format_sse(dernier, 'snapshot', stream_snapshot(log_type, lines))
+                continue
+            if not events:
+                yield ": ping\n\n"
+                continue
+            for event in events:
+                if event.type != 'log' or log_type in ('all', event.data['name']):
+                    yield format_sse(event.id, event.type, event.data)
+            dernier = events[-1].id
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/logs/search')
+def search_logs():
+    """Recherche plein texte dans les logs : ?q=erreur faiss&from=...&to=...&level=ERROR&type=gradio_local
+
+    Tous les termes doivent apparaître ; from / to en epoch ou ISO. Réponse depuis l'index, sans relire les fichiers.
+    """
+    try:
+        log_type = request.args.get('type')
+        if log_type and log_type not in LOG_FILES:
             return jsonify({'error': 'Type de log invalide'}), 400
-            
+        level = request.args.get('level')
+        if level and level.upper() not in LOG_LEVELS:
+            return jsonify({'error': f"Niveau invalide (attendu : {', '.join(LOG_LEVELS)})"}), 400
+        limit = min(max(int(request.args.get('limit', LOG_SEARCH_LIMIT)), 1), 1000)
+        debut = time.perf_counter()
+        results = log_index.search(
+            request.args.get('q', ''),
+            debut=parse_epoch(request.args.get('from')),
+            fin=parse_epoch(request.args.get('to')),
+            level=level,
+            log=log_type,
+            limit=limit
+        )
+        return jsonify({
+            'query': request.args.get('q', ''),
+            'count': len(results),
+            'results': results,
+            'took_ms': (time.perf_counter() - debut) * 1000
+        })
+    except ValueError as e:
+        return jsonify({'error': f"Paramètre invalide : {e}"}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/logs/stats')
+def get_log_stats():
+    """Comptes agrégés des logs : ?minutes=60&type=gradio_local&template=Recherche effectuée&top=20&to=...
+
+    Séries par minute par niveau, taux d'erreur, gabarits de messages les plus fréquents ;
+    template : série par minute des gabarits contenant ce texte (volume de recherches, etc.).
+    """
+    try:
+        log_type = request.args.get('type')
+        if log_type and log_type not in LOG_FILES:
+            return jsonify({'error': 'Type de log invalide'}), 400
+        summary = log_stats.summary(
+            minutes=int(request.args.get('minutes', 60)),
+            fin=parse_epoch(request.args.get('to')),
+            source=log_type,
+            template=request.args.get('template'),
+            top=min(max(int(request.args.get('top', STATS_TOP_TEMPLATES)), 0), 200)
+        )
+        summary.update(log_stats.stats())
+        return jsonify(summary)
+    except ValueError as e:
+        return jsonify({'error': f"Paramètre invalide : {e}"}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -183,43 +432,86 @@ def get_system():
         return jsonify({
             'system': system_stats,
             'files': get_file_stats(),
-            'changes': file_changes[-20:]  # 20 derniers changements
+            'changes': file_events.query(limit=20)  # 20 derniers changements
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_epoch(valeur):
+    """Paramètre de date : epoch en secondes ou ISO 8601 (None si absent)"""
+    if not valeur:
+        return None
+    try:
+        return float(valeur)
+    except ValueError:
+        return datetime.fromisoformat(valeur).timestamp()
+
+@app.route('/api/changes')
+def get_changes():
+    """Changements de fichiers : ?file=gradio_local.log&since=...&until=...&type=modified&limit=100"""
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), file_events.per_file * 10)
+        changes = file_events.query(
+            file=request.args.get('file'),
+            since=parse_epoch(request.args.get('since')),
+            until=parse_epoch(request.args.get('until')),
+            type=request.args.get('type'),
+            limit=limit
+        )
+        return jsonify({'count': len(changes), 'changes': changes, 'files': file_events.files()})
+    except ValueError as e:
+        return jsonify({'error': f"Paramètre invalide : {e}"}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/system/history')
+def get_system_history():
+    """Séries des métriques pour les graphiques
+
+    resolution : 1s (10 min), 1m (24 h) ou 1h (30 jours) ; since : epoch ou ISO ;
+    points : nombre maximal de points (moyennes) ; fields : champs séparés par des virgules.
+    """
+    try:
+        resolution = request.args.get('resolution', '1m')
+        if resolution not in metrics_history.steps:
+            return jsonify({'error': f"Résolution inconnue (disponibles : {', '.join(metrics_history.steps)})"}), 400
+        since = parse_epoch(request.args.get('since'))
+        points = min(int(request.args.get('points', HISTORY_MAX_POINTS)), HISTORY_MAX_POINTS)
+        fields = request.args.get('fields')
+        fields = [field.strip() for field in fields.split(',')] if fields else None
+        
+        return jsonify({
+            'resolution': resolution,
+            'step': metrics_history.steps[resolution],
+            'series': metrics_history.series(resolution, since=since, points=points, fields=fields)
+        })
+    except ValueError as e:
+        return jsonify({'error': f"Paramètre invalide : {e}"}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics')
+def get_metrics():
+    """Métriques des applications au format texte Prometheus"""
+    return Response(metrics_collector.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics')
+def get_metrics_json():
+    """Métriques des applications en JSON (compteurs, jauges, quantiles des latences)"""
+    try:
+        return jsonify(metrics_collector.snapshot())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/health')
 def health_check():
-    """Vérification de santé du système"""
+    """Vérification de santé du système : dernier tour des sondes, sans attente
+
+    Fichiers, ports Gradio et recherche synthétique de bout en bout sondés en parallèle
+    toutes les HEALTH_INTERVAL secondes ; 'status' suit la recherche (ok, degraded, down).
+    """
     try:
-        health = {
-            'status': 'ok',
-            'timestamp': datetime.now().isoformat(),
-            'services': {}
-        }
-        
-        # Vérification des fichiers critiques
-        for name, path in LOG_FILES.items():
-            health['services'][name] = {
-                'status': 'ok' if os.path.exists(path) else 'missing',
-                'path': path
-            }
-        
-        # Vérification des processus (ports)
-        ports_to_check = [7860, 7861]  # Ports Gradio
-        for port in ports_to_check:
-            try:
-                import socket
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    result = s.connect_ex(('127.0.0.1', port))
-                    health['services'][f'port_{port}'] = {
-                        'status': 'active' if result == 0 else 'inactive'
-                    }
-            except:
-                health['services'][f'port_{port}'] = {'status': 'error'}
-        
-        return jsonify(health)
-        
+        return jsonify(health_monitor.snapshot())
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -227,6 +519,33 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/health/history')
+def get_health_history():
+    """Latences et disponibilité des sondes : ?resolution=1m&since=...&fields=search.latency_ms,search.up
+
+    {sonde}.latency_ms : latence (ms, absente si le service ne répond pas) ;
+    {sonde}.up : 1 si la sonde est ok (moyenne par minute / heure = disponibilité).
+    """
+    try:
+        history = health_monitor.history
+        resolution = request.args.get('resolution', '1m')
+        if resolution not in history.steps:
+            return jsonify({'error': f"Résolution inconnue (disponibles : {', '.join(history.steps)})"}), 400
+        points = min(int(request.args.get('points', HISTORY_MAX_POINTS)), HISTORY_MAX_POINTS)
+        fields = request.args.get('fields')
+        fields = [field.strip() for field in fields.split(',')] if fields else None
+        
+        return jsonify({
+            'resolution': resolution,
+            'step': history.steps[resolution],
+            'series': history.series(resolution, since=parse_epoch(request.args.get('since')),
+                                     points=points, fields=fields)
+        })
+    except ValueError as e:
+        return jsonify({'error': f"Paramètre invalide : {e}"}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Template HTML pour le dashboard
 DASHBOARD_HTML = """
 <!DOCTYPE html>
@@ -357,7 +676,7 @@ DASHBOARD_HTML = """
 </head>
 <body>
     <div class="auto-refresh" id="refreshStatus">
-        🔄 Auto-refresh: ON
+        🔄 Flux temps réel: ON
     </div>
     
     <div class="container">
@@ -375,7 +694,7 @@ DASHBOARD_HTML = """
             
             <div class="controls">
                 <button class="btn btn-primary" onclick="refreshLogs()">🔄 Actualiser</button>
-                <button class="btn btn-success" onclick="toggleAutoRefresh()">⏸️ Auto-refresh</button>
+                <button class="btn btn-success" onclick="toggleAutoRefresh()">⏸️ Temps réel</button>
                 <select id="logType" onchange="refreshLogs()">
                     <option value="all">Tous les logs</option>
                     <option value="gradio_online">Gradio Online</option>
@@ -385,7 +704,7 @@ DASHBOARD_HTML = """
                     <option value="fix_faiss">Fix FAISS</option>
                     <option value="server">Log Server</option>
                 </select>
-                <input type="number" id="logLines" value="50" min="10" max="500" placeholder="Lignes">
+                <input type="number" id="logLines" value="50" min="10" max="500" placeholder="Lignes" onchange="refreshLogs()">
             </div>
             
             <div id="logsContainer">
@@ -396,81 +715,125 @@ DASHBOARD_HTML = """
 
     <script>
         let autoRefresh = true;
-        let refreshInterval;
+        let source = null;
+        let lastEventId = null;
+        let maxLines = 50;
+        const state = { system: {}, files: {} };
 
         function updateStats() {
-            fetch('/api/system')
-                .then(response => response.json())
-                .then(data => {
-                    const statsGrid = document.getElementById('statsGrid');
-                    const system = data.system || {};
-                    const files = data.files || {};
-                    
-                    statsGrid.innerHTML = `
-                        <div class="stat-card">
-                            <h3>💻 CPU</h3>
-                            <div class="stat-value">${(system.cpu_percent || 0).toFixed(1)}%</div>
-                        </div>
-                        <div class="stat-card">
-                            <h3>🧠 Mémoire</h3>
-                            <div class="stat-value">${(system.memory_percent || 0).toFixed(1)}%</div>
-                            <small>${(system.memory_used_gb || 0).toFixed(1)}GB / ${(system.memory_total_gb || 0).toFixed(1)}GB</small>
-                        </div>
-                        <div class="stat-card">
-                            <h3>💾 Disque</h3>
-                            <div class="stat-value">${(system.disk_percent || 0).toFixed(1)}%</div>
-                            <small>${(system.disk_used_gb || 0).toFixed(1)}GB / ${(system.disk_total_gb || 0).toFixed(1)}GB</small>
-                        </div>
-                        <div class="stat-card">
-                            <h3>📁 Fichiers</h3>
-                            <div>
-                                <span class="status-indicator ${files.conversations?.exists ? 'status-ok' : 'status-error'}"></span>
-                                Conversations: ${files.conversations?.exists ? '✅' : '❌'}<br>
-                                <span class="status-indicator ${files.index_pkl?.exists ? 'status-ok' : 'status-error'}"></span>
-                                Index PKL: ${files.index_pkl?.exists ? '✅' : '❌'}<br>
-                                <span class="status-indicator ${files.index_faiss?.exists ? 'status-ok' : 'status-error'}"></span>
-                                Index FAISS: ${files.index_faiss?.exists ? '✅' : '❌'}
-                            </div>
-                        </div>
-                    `;
-                })
-                .catch(error => {
-                    console.error('Erreur lors du chargement des stats:', error);
-                });
+            const statsGrid = document.getElementById('statsGrid');
+            const system = state.system;
+            const files = state.files;
+            
+            statsGrid.innerHTML = `
+                <div class="stat-card">
+                    <h3>💻 CPU</h3>
+                    <div class="stat-value">${(system.cpu_percent || 0).toFixed(1)}%</div>
+                </div>
+                <div class="stat-card">
+                    <h3>🧠 Mémoire</h3>
+                    <div class="stat-value">${(system.memory_percent || 0).toFixed(1)}%</div>
+                    <small>${(system.memory_used_gb || 0).toFixed(1)}GB / ${(system.memory_total_gb || 0).toFixed(1)}GB</small>
+                </div>
+                <div class="stat-card">
+                    <h3>💾 Disque</h3>
+                    <div class="stat-value">${(system.disk_percent || 0).toFixed(1)}%</div>
+                    <small>${(system.disk_used_gb || 0).toFixed(1)}GB / ${(system.disk_total_gb || 0).toFixed(1)}GB</small>
+                </div>
+                <div class="stat-card">
+                    <h3>📁 Fichiers</h3>
+                    <div>
+                        <span class="status-indicator ${files.conversations?.exists ? 'status-ok' : 'status-error'}"></span>
+                        Conversations: ${files.conversations?.exists ? '✅' : '❌'}<br>
+                        <span class="status-indicator ${files.index_pkl?.exists ? 'status-ok' : 'status-error'}"></span>
+                        Index PKL: ${files.index_pkl?.exists ? '✅' : '❌'}<br>
+                        <span class="status-indicator ${files.index_faiss?.exists ? 'status-ok' : 'status-error'}"></span>
+                        Index FAISS: ${files.index_faiss?.exists ? '✅' : '❌'}
+                    </div>
+                </div>
+            `;
+        }
+
+        function appendLines(box, lines) {
+            // Seules les nouvelles lignes sont ajoutées au DOM ; les plus anciennes sortent par le haut
+            const fragment = document.createDocumentFragment();
+            for (const line of lines) {
+                const div = document.createElement('div');
+                div.className = 'log-line';
+                div.textContent = line;
+                fragment.appendChild(div);
+            }
+            box.appendChild(fragment);
+            while (box.childElementCount > maxLines) {
+                box.removeChild(box.firstElementChild);
+            }
         }
 
-        function refreshLogs() {
+        function logBox(name, exists) {
+            let box = document.getElementById(`log-${name}`);
+            if (!box) {
+                const logDiv = document.createElement('div');
+                logDiv.innerHTML = `
+                    <h3>📄 ${name.toUpperCase()} 
+                        <span class="status-indicator ${exists ? 'status-ok' : 'status-error'}"></span>
+                    </h3>
+                    <div class="log-container" id="log-${name}"></div>
+                `;
+                document.getElementById('logsContainer').appendChild(logDiv);
+                box = document.getElementById(`log-${name}`);
+            }
+            return box;
+        }
+
+        function onSnapshot(event) {
+            const data = JSON.parse(event.data);
+            lastEventId = event.lastEventId;
+            state.system = data.system || {};
+            state.files = data.files || {};
+            updateStats();
+            document.getElementById('logsContainer').innerHTML = '';
+            for (const [name, logData] of Object.entries(data.logs)) {
+                appendLines(logBox(name, logData.exists), logData.lines);
+            }
+        }
+
+        function onLog(event) {
+            const data = JSON.parse(event.data);
+            lastEventId = event.lastEventId;
+            appendLines(logBox(data.name, true), data.lines);
+        }
+
+        function onDelta(key) {
+            return event => {
+                lastEventId = event.lastEventId;
+                Object.assign(state[key], JSON.parse(event.data));
+                updateStats();
+            };
+        }
+
+        function refreshLogs(resume = false) {
+            // Flux SSE : état complet à la connexion, puis seulement les changements
             const logType = document.getElementById('logType').value;
-            const lines = document.getElementById('logLines').value;
-            
-            fetch(`/api/logs?type=${logType}&lines=${lines}`)
-                .then(response => response.json())
-                .then(data => {
-                    const container = document.getElementById('logsContainer');
-                    container.innerHTML = '';
-                    
-                    for (const [type, logData] of Object.entries(data)) {
-                        if (logData.lines) {
-                            const logDiv = document.createElement('div');
-                            logDiv.innerHTML = `
-                                <h3>📄 ${type.toUpperCase()} 
-                                    <span class="status-indicator ${logData.exists ? 'status-ok' : 'status-error'}"></span>
-                                </h3>
-                                <div class="log-container">
-                                    ${logData.lines.map(line => 
-                                        `<div class="log-line">${line}</div>`
-                                    ).join('')}
-                                </div>
-                            `;
-                            container.appendChild(logDiv);
-                        }
-                    }
-                })
-                .catch(error => {
-                    console.error('Erreur lors du chargement des logs:', error);
-                    document.getElementById('logsContainer').innerHTML = 
-                        '<div class="stat-card">❌ Erreur lors du chargement des logs</div>';
-                });
+            maxLines = parseInt(document.getElementById('logLines').value) || 50;
+            if (source) {
+                source.close();
+            }
+            let url = `/api/stream?type=${logType}&lines=${maxLines}`;
+            if (resume && lastEventId) {
+                url += `&last_event_id=${lastEventId}`;
+            }
+            source = new EventSource(url);
+            source.addEventListener('snapshot', onSnapshot);
+            source.addEventListener('log', onLog);
+            source.addEventListener('system', onDelta('system'));
+            source.addEventListener('files', onDelta('files'));
+            source.onerror = () => {
+                // EventSource se reconnecte seul et renvoie Last-Event-ID
+                document.getElementById('refreshStatus').textContent = '⚠️ Flux interrompu, reconnexion...';
+            };
+            source.onopen = () => {
+                document.getElementById('refreshStatus').textContent = '🔄 Flux temps réel: ON';
+            };
         }
 
         function toggleAutoRefresh() {
@@ -479,30 +842,20 @@ DASHBOARD_HTML = """
             const status = document.getElementById('refreshStatus');
             
             if (autoRefresh) {
-                btn.textContent = '⏸️ Auto-refresh';
-                status.textContent = '🔄 Auto-refresh: ON';
-                startAutoRefresh();
+                btn.textContent = '⏸️ Temps réel';
+                status.textContent = '🔄 Flux temps réel: ON';
+                refreshLogs(true);
             } else {
-                btn.textContent = '▶️ Auto-refresh';
-                status.textContent = '⏸️ Auto-refresh: OFF';
-                clearInterval(refreshInterval);
+                btn.textContent = '▶️ Temps réel';
+                status.textContent = '⏸️ Flux temps réel: OFF';
+                source.close();
+                source = null;
             }
         }
 
-        function startAutoRefresh() {
-            refreshInterval = setInterval(() => {
-                if (autoRefresh) {
-                    updateStats();
-                    refreshLogs();
-                }
-            }, 5000); // Refresh toutes les 5 secondes
-        }
-
         // Initialisation
         document.addEventListener('DOMContentLoaded', function() {
-            updateStats();
             refreshLogs();
-            startAutoRefresh();
         });
     </script>
 </body>
@@ -514,7 +867,8 @@ def start_file_monitoring():
     try:
         event_handler = LogFileHandler()
         observer = Observer()
-        observer.schedule(event_handler, BASE_DIR, recursive=True)
+        # Les logs sont à la racine de BASE_DIR : les reconstructions d'index (sous-dossiers) sont ignorées
+        observer.schedule(event_handler, BASE_DIR, recursive=False)
         observer.start()
         logging.info("📁 Surveillance des fichiers démarrée")
         return observer
@@ -531,16 +885,20 @@ if __name__ == "__main__":
         os.makedirs(BASE_DIR, exist_ok=True)
         os.makedirs(INDEX_DIR, exist_ok=True)
         
-        # Démarrage de la surveillance des fichiers
+        # Amorçage des tampons (fin de chaque log), puis suivi par événements
+        update_log_data()
         observer = start_file_monitoring()
+        metrics_collector.serve(METRICS_UDP_HOST, METRICS_UDP_PORT)
+        health_monitor.start()
         
         # Démarrage du thread de monitoring
-        monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
+        monitor_thread = threading.Thread(target=monitor_loop, args=(observer is None,), daemon=True)
         monitor_thread.start()
         
         print("🌐 Serveur web disponible sur: http://127.0.0.1:5000")
         print("📊 Dashboard de monitoring accessible")
-        print("🔄 Mise à jour automatique toutes les 10 secondes")
+        print("📈 Métriques Prometheus sur: http://127.0.0.1:5000/metrics")
+        print("🔄 Logs mis à jour à chaque écriture, système échantillonné chaque seconde")
         
         # Démarrage du serveur Flask
         app.run(
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Compteurs glissants des logs pour le serveur de monitoring SecondMind
+Comptes par minute, par niveau et par source, et par gabarit de message
+("Recherche effectuée : '<*>' -> <n> résultats ..."), en tableaux circulaires de taille fixe
+"""
+
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from log_records import LOG_LEVELS, gabarit_message
+
+STATS_MINUTES = 1440          # minutes gardées (24 h)
+STATS_MAX_TEMPLATES = 500     # gabarits distincts suivis, les suivants sont regroupés
+STATS_TOP_TEMPLATES = 20
+ERROR_LEVELS = ('ERROR', 'CRITICAL')
+OTHER_TEMPLATE = "<autres messages>"
+
+
+class LogAggregator:
+    """Comptes par minute des enregistrements de logs (écrits par watchdog, lus par Flask)
+
+    La minute m occupe la case m % minutes de chaque tableau ; une case réutilisée par
+    une minute plus récente est remise à zéro. Les enregistrements plus anciens que la
+    fenêtre gardée ne comptent que dans les totaux des gabarits. Niveaux et gabarits sont
+    comptés par source : summary(source=...) ne voit que les lignes de ce log.
+    """
+
+    def __init__(self, minutes=STATS_MINUTES, max_templates=STATS_MAX_TEMPLATES):
+        self.minutes = minutes
+        self.max_templates = max_templates
+        self._minute_case = np.full(minutes, -1, dtype=np.int64)   # minute occupant chaque case
+        self._derniere_minute = -1
+        self._par_source = {}       # source → int32[niveau, case]
+        self._gabarits = {}         # gabarit → id (commun à toutes les sources)
+        self._infos = []            # id → {'template', 'level', 'count', 'counts', 'example', 'last'}
+        self._par_gabarit = {}      # source → int32[gabarit, case]
+        self._lock = threading.Lock()
+
+    def add(self, records):
+        """Compte les enregistrements (LogRecord ; les None, lignes hors format, sont ignorés)"""
+        with self._lock:
+            for record in records:
+                if record is None or record.level not in LOG_LEVELS:
+                    continue
+                case = self._case(int(record.timestamp // 60))
+                gabarit = self._gabarit(gabarit_message(record.message), record)
+                if case is None:
+                    continue
+                compteurs = self._par_source.get(record.source)
+                if compteurs is None:
+                    compteurs = self._par_source[record.source] = np.zeros(
+                        (len(LOG_LEVELS), self.minutes), dtype=np.int32)
+                    self._par_gabarit[record.source] = np.zeros(
+                        (self.max_templates, self.minutes), dtype=np.int32)
+                compteurs[LOG_LEVELS.index(record.level), case] += 1
+                self._par_gabarit[record.source][gabarit, case] += 1
+
+    def _case(self, minute):
+        """Case de la minute (remise à zéro si elle contenait une minute plus ancienne),
+        None si la minute est sortie de la fenêtre"""
+        if minute <= self._derniere_minute - self.minutes:
+            return None
+        case = minute % self.minutes
+        if self._minute_case[case] != minute:
+            for compteurs in self._par_source.values():
+                compteurs[:, case] = 0
+            for compteurs in self._par_gabarit.values():
+                compteurs[:, case] = 0
+            self._minute_case[case] = minute
+        self._derniere_minute = max(self._derniere_minute, minute)
+        return case
+
+    def _gabarit(self, gabarit, record):
+        """Id du gabarit (créé au besoin) ; totaux et dernier exemple mis à jour"""
+        gabarit_id = self._gabarits.get(gabarit)
+        if gabarit_id is None:
+            if len(self._infos) >= self.max_templates - 1:
+                # Dernière place réservée aux gabarits au-delà de la limite
+                gabarit = OTHER_TEMPLATE
+                gabarit_id = self._gabarits.get(gabarit)
+            if gabarit_id is None:
+                gabarit_id = self._gabarits[gabarit] = len(self._infos)
+                self._infos.append({'template': gabarit, 'level': record.level, 'count': 0, 'counts': {}})
+        info = self._infos[gabarit_id]
+        info['count'] += 1
+        info['counts'][record.source] = info['counts'].get(record.source, 0) + 1
+        info['example'] = record.message
+        info['last'] = record.timestamp
+        return gabarit_id
+
+    def summary(self, minutes=60, fin=None, source=None, template=None, top=STATS_TOP_TEMPLATES):
+        """Agrégats des `minutes` minutes se terminant à `fin` (epoch, maintenant par défaut)
+
+        source : nom du log (toutes par défaut) ; template : texte cherché dans les gabarits,
+        pour la série par minute des messages correspondants (ex. 'Recherche effectuée').
+        """
+        minutes = min(max(int(minutes), 1), self.minutes)
+        fin = time.time() if fin is None else fin
+        derniere = int(fin // 60)
+        fenetre = np.arange(derniere - minutes + 1, derniere + 1)
+        cases = fenetre % self.minutes
+
+        with self._lock:
+            valides = self._minute_case[cases] == fenetre
+            if source is not None:
+                compteurs = self._par_source.get(source)
+                par_niveau = compteurs[:, cases] if compteurs is not None \
+                    else np.zeros((len(LOG_LEVELS), minutes), dtype=np.int32)
+            else:
+                par_niveau = sum((compteurs[:, cases] for compteurs in self._par_source.values()),
+                                 np.zeros((len(LOG_LEVELS), minutes), dtype=np.int32))
+            par_niveau = np.where(valides, par_niveau, 0)
+
+            n = len(self._infos)
+            if source is not None:
+                compteurs = self._par_gabarit.get(source)
+                par_gabarit = compteurs[:n, cases] if compteurs is not None \
+                    else np.zeros((n, minutes), dtype=np.int32)
+            else:
+                par_gabarit = sum((compteurs[:n, cases] for compteurs in self._par_gabarit.values()),
+                                  np.zeros((n, minutes), dtype=np.int32))
+            par_gabarit = np.where(valides, par_gabarit, 0)
+            totaux_gabarits = par_gabarit.sum(axis=1)
+            ordre = [i for i in np.argsort(-totaux_gabarits, kind='stable')[:top] if totaux_gabarits[i]]
+            templates = [self._format(i, int(totaux_gabarits[i]), source) for i in ordre]
+
+            recherche = None
+            if template:
+                ids = [i for i, info in enumerate(self._infos[:n]) if template in info['template']]
+                recherche = {
+                    'query': template,
+                    'templates': [self._infos[i]['template'] for i in ids],
+                    'counts': par_gabarit[ids].sum(axis=0).tolist(),
+                }
+
+        total = par_niveau.sum(axis=0)
+        erreurs = par_niveau[[LOG_LEVELS.index(level) for level in ERROR_LEVELS]].sum(axis=0)
+        return {
+            'minutes': minutes,
+            't': (fenetre * 60).tolist(),
+            'levels': {level: par_niveau[i].tolist() for i, level in enumerate(LOG_LEVELS)},
+            'total': total.tolist(),
+            'error_rate': [round(e / t, 4) if t else None for e, t in zip(erreurs.tolist(), total.tolist())],
+            'totals': {level: int(par_niveau[i].sum()) for i, level in enumerate(LOG_LEVELS)},
+            'templates': templates,
+            'template': recherche,
+        }
+
+    def _format(self, gabarit_id, count, source=None):
+        info = self._infos[gabarit_id]
+        return {
+            'template': info['template'],
+            'level': info['level'],
+            'count': count,
+            'total': info['count'] if source is None else info['counts'].get(source, 0),
+            'example': info['example'],
+            'last': datetime.fromtimestamp(info['last']).isoformat(),
+        }
+
+    def stats(self):
+        with self._lock:
+            return {'sources': sorted(s for s in self._par_source if s), 'n_templates': len(self._infos)}
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture de la fin des fichiers de logs pour SecondMind RAG
+Remonte depuis la fin du fichier par blocs et ne décode que les lignes demandées :
+le coût dépend du nombre de lignes, pas de la taille du fichier.
+LogFollower suit ensuite un log en ne lisant que les octets ajoutés.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+TAIL_BLOCK_SIZE = 64 * 1024  # octets lus à chaque pas en arrière
+LOG_BUFFER_LINES = 2000      # lignes gardées en mémoire par log suivi
+MAX_CATCHUP_BYTES = 8 * 1024 * 1024  # au-delà, on repart de la fin plutôt que de tout relire
+
+
+def lire_dernieres_lignes(filepath, lines=50, block_size=TAIL_BLOCK_SIZE):
+    """Dernières lignes d'un fichier UTF-8, sans espaces de bord (comme readlines()[-lines:])
+
+    Le découpage se fait sur les octets : un \\n ne peut pas apparaître au milieu
+    d'un caractère UTF-8 multi-octets, seules les lignes retenues sont décodées.
+    """
+    if lines <= 0:
+        return []
+
+    with open(filepath, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        if position == 0:
+            return []
+        f.seek(position - 1)
+        # Le \n final ne commence pas de nouvelle ligne : il en faut un de plus
+        besoin = lines + 1 if f.read(1) == b'\n' else lines
+
+        blocs = []
+        sauts = 0
+        while position > 0 and sauts < besoin:
+            taille = min(block_size, position)
+            position -= taille
+            f.seek(position)
+            bloc = f.read(taille)
+            blocs.append(bloc)
+            sauts += bloc.count(b'\n')
+
+    morceaux = b''.join(reversed(blocs)).split(b'\n')
+    if besoin > lines:
+        morceaux.pop()  # chaîne vide après le \n final
+    return [morceau.decode('utf-8', errors='replace').strip() for morceau in morceaux[-lines:]]
+
+
+class LogFollower:
+    """Suivi incrémental d'un fichier de log : offset, identité du fichier, tampon circulaire
+
+    lire_nouveautes() ne lit que les octets ajoutés depuis l'appel précédent ; une rotation
+    (nouvel inode) ou une troncature (taille < offset) fait repartir du début du nouveau fichier.
+    Appelé depuis le thread watchdog et lu par les requêtes Flask : accès protégés par un verrou.
+    Chaque ligne reçue porte un numéro croissant (seq = numéro de la dernière) : un client
+    ne redemande que les lignes qui suivent son dernier numéro.
+    """
+
+    def __init__(self, filepath, max_lines=LOG_BUFFER_LINES):
+        self.filepath = filepath
+        self.lines = deque(maxlen=max_lines)
+        self.offset = 0
+        self.identite = None    # (st_dev, st_ino) du fichier lu
+        self.partiel = b''      # dernière ligne pas encore terminée par \n
+        self._dernier_octet = b''
+        self.seq = 0            # lignes ajoutées au tampon depuis le démarrage
+        self._saut = -1         # seq avant le dernier saut à la fin du fichier (lignes sautées)
+        self.last_update = None
+        self.modifie = None     # epoch du dernier ajout (Last-Modified)
+        self._lock = threading.Lock()
+
+    @property
+    def max_lines(self):
+        return self.lines.maxlen
+
+    @property
+    def exists(self):
+        return self.identite is not None
+
+    def lire_nouveautes(self):
+        """Ajoute au tampon les lignes écrites depuis le dernier appel et les retourne"""
+        with self._lock:
+            try:
+                stat = os.stat(self.filepath)
+            except FileNotFoundError:
+                self.identite, self.offset, self.partiel = None, 0, b''
+                return []
+
+            identite = (stat.st_dev, stat.st_ino)
+            if identite != self.identite or stat.st_size < self.offset or not self._continuite():
+                # Nouveau fichier (rotation) ou fichier vidé puis réécrit : lecture depuis le début
+                self.identite, self.offset, self.partiel = identite, 0, b''
+            if stat.st_size == self.offset:
+                return []
+            if stat.st_size - self.offset > MAX_CATCHUP_BYTES:
+                return self._repartir_de_la_fin(stat.st_size)
+
+            with open(self.filepath, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(stat.st_size - self.offset)
+            self.offset += len(data)
+            self._dernier_octet = data[-1:]
+            *completes, self.partiel = (self.partiel + data).split(b'\n')
+            nouvelles = [ligne.decode('utf-8', errors='replace').strip() for ligne in completes]
+            self._ajouter(nouvelles)
+            return nouvelles
+
+    def _continuite(self):
+        """Le dernier octet lu est toujours en place (sinon le fichier a été vidé puis réécrit
+        au-delà de l'ancien offset entre deux événements)"""
+        if not self.offset:
+            return True
+        with open(self.filepath, 'rb') as f:
+            f.seek(self.offset - 1)
+            return f.read(1) == self._dernier_octet
+
+    def _repartir_de_la_fin(self, taille):
+        """Remplit le tampon avec la fin du fichier sans lire ce qui précède (amorçage, gros retard)
+
+        Une dernière ligne pas encore terminée par \\n reste dans partiel (complétée à la
+        lecture suivante) ; les clients antérieurs au saut repartent de zéro (voir depuis()).
+        """
+        partiel = self._fin_non_terminee(taille)
+        lignes = lire_dernieres_lignes(self.filepath, self.max_lines + (1 if partiel else 0))
+        if partiel:
+            lignes.pop()
+        self.lines.clear()
+        self._saut = self.seq
+        self._ajouter(lignes)
+        self.offset, self.partiel = taille, partiel
+        with open(self.filepath, 'rb') as f:
+            f.seek(taille - 1)
+            self._dernier_octet = f.read(1)
+        return lignes
+
+    def _fin_non_terminee(self, taille, block_size=TAIL_BLOCK_SIZE):
+        """Octets après le dernier \\n des `taille` premiers octets du fichier"""
+        blocs = []
+        position = taille
+        with open(self.filepath, 'rb') as f:
+            while position > 0:
+                pas = min(block_size, position)
+                position -= pas
+                f.seek(position)
+                bloc = f.read(pas)
+                fin = bloc.rfind(b'\n')
+                if fin >= 0:
+                    blocs.append(bloc[fin + 1:])
+                    break
+                blocs.append(bloc)
+        return b''.join(reversed(blocs))
+
+    def _ajouter(self, lignes):
+        self.lines.extend(lignes)
+        self.seq += len(lignes)
+        self.modifie = time.time()
+        self.last_update = datetime.fromtimestamp(self.modifie).isoformat()
+
+    def depuis(self, since=None, lines=50):
+        """(seq, lignes, incrémental) lus ensemble sous le verrou
+
+        Lignes de numéro > since si le tampon les contient toutes (incrémental = True) ;
+        sinon (since absent, trop ancien, antérieur à un saut à la fin du fichier, ou d'une
+        instance précédente) les `lines` dernières.
+        """
+        with self._lock:
+            n = len(self.lines)
+            if since is not None and max(self.seq - n, self._saut + 1) <= since <= self.seq:
+                return self.seq, list(islice(self.lines, n - (self.seq - since), None)), True
+            debut = max(n - max(lines, 0), 0)
+            return self.seq, list(islice(self.lines, debut, None)), False
+
+    def tail(self, lines=50):
+        """Dernières lignes du tampon (au plus max_lines)"""
+        with self._lock:
+            debut = max(len(self.lines) - max(lines, 0), 0)
+            return list(islice(self.lines, debut, None))
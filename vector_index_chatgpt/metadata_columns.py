@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Métadonnées colonnaires pour SecondMind RAG
+Rôle, ligne et horodatage stockés en tableaux NumPy compacts, dans l'ordre des vecteurs FAISS,
+plus un index positionnel ligne → id de document (accès O(1), sans embedding)
+"""
+
+from datetime import datetime
+import numpy as np
+from mmap_store import charger_npz
+
+METADATA_COLUMNS_FILENAME = "metadata_columns.npz"
+SECONDES_PAR_JOUR = 86400
+
+
+def _to_epoch(valeur):
+    """Convertit un horodatage (ISO, datetime ou nombre) en secondes epoch"""
+    if valeur is None:
+        return None
+    if isinstance(valeur, datetime):
+        return valeur.timestamp()
+    if isinstance(valeur, str):
+        return datetime.fromisoformat(valeur).timestamp()
+    return float(valeur)
+
+
+def _index_positionnel(lignes):
+    """Table ligne → id de document (les ids suivent l'ordre des lignes)"""
+    if len(lignes) == 0:
+        return np.zeros(0, dtype=np.int32)
+    toutes_lignes = np.arange(int(lignes[-1]) + 1)
+    return np.searchsorted(lignes, toutes_lignes, side='left').astype(np.int32)
+
+
+class MetadataColumns:
+    """Colonnes de métadonnées indexées par id FAISS"""
+
+    def __init__(self, roles, role_codes, lignes, timestamps, line_to_doc=None, conversations=None):
+        self.roles = roles              # str[n_roles], vocabulaire des rôles
+        self.role_codes = role_codes    # uint8/uint16[n_docs]
+        self.lignes = lignes            # int32[n_docs], croissant (ordre du fichier source)
+        self.timestamps = timestamps    # float64[n_docs], secondes epoch (0 = date inconnue)
+        # int32[max_ligne + 1] : premier document à la ligne donnée ou après
+        self.line_to_doc = line_to_doc if line_to_doc is not None else _index_positionnel(lignes)
+        # int32[n_docs], numéro du bloc de conversation (croissant)
+        self.conversations = conversations if conversations is not None else np.zeros(len(lignes), dtype=np.int32)
+        self._role_ids = {role: i for i, role in enumerate(roles)}
+        self._timestamp_max = None
+
+    def __len__(self):
+        return len(self.lignes)
+
+    @classmethod
+    def build(cls, metadatas):
+        """Construit les colonnes à partir des métadonnées des documents LangChain"""
+        roles = {}
+        codes = [roles.setdefault(meta.get('role', 'unknown'), len(roles)) for meta in metadatas]
+        lignes = [meta.get('ligne', 0) for meta in metadatas]
+        timestamps = [_to_epoch(meta.get('timestamp')) or 0.0 for meta in metadatas]
+        conversations = [meta.get('conversation', 0) for meta in metadatas]
+
+        role_array = np.empty(len(roles), dtype=object)
+        for role, i in roles.items():
+            role_array[i] = role
+        return cls(
+            role_array.astype(str),
+            np.asarray(codes, dtype=np.min_scalar_type(max(len(roles) - 1, 0))),
+            np.asarray(lignes, dtype=np.int32),
+            np.asarray(timestamps, dtype=np.float64),
+            conversations=np.asarray(conversations, dtype=np.int32),
+        )
+
+    def save(self, path):
+        """Sauvegarde les colonnes (npz, sans pickle)"""
+        np.savez(
+            path,
+            roles=self.roles,
+            role_codes=self.role_codes,
+            lignes=self.lignes,
+            timestamps=self.timestamps,
+            line_to_doc=self.line_to_doc,
+            conversations=self.conversations,
+        )
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """Charge des colonnes sauvegardées par save() (mmap=True : lecture seule partagée)"""
+        data = charger_npz(path, mmap)
+        return cls(data['roles'], data['role_codes'], data['lignes'], data['timestamps'],
+                   data.get('line_to_doc'), data.get('conversations'))
+
+    def role(self, doc_id):
+        return str(self.roles[self.role_codes[doc_id]])
+
+    def date(self, doc_id):
+        """Horodatage ISO du document, None si inconnu"""
+        timestamp = float(self.timestamps[doc_id])
+        return datetime.fromtimestamp(timestamp).isoformat() if timestamp > 0 else None
+
+    @property
+    def timestamp_max(self):
+        """Horodatage du document le plus récent (référence de la récence), calculé une fois"""
+        if self._timestamp_max is None:
+            self._timestamp_max = float(self.timestamps.max()) if len(self.timestamps) else 0.0
+        return self._timestamp_max
+
+    def doc_for_line(self, ligne):
+        """Id du document à cette ligne, ou du suivant si la ligne était vide (None si hors index)"""
+        if ligne < 1 or ligne >= len(self.line_to_doc):
+            return None
+        return int(self.line_to_doc[ligne])
+
+    def neighbours(self, doc_id, n):
+        """Ids des documents adjacents (±n tours), le document lui-même inclus"""
+        return range(max(0, doc_id - n), min(len(self), doc_id + n + 1))
+
+    def mask(self, role=None, ligne_min=None, ligne_max=None,
+             timestamp_min=None, timestamp_max=None, jours=None):
+        """Masque booléen des documents satisfaisant tous les filtres (None si aucun filtre)
+
+        jours : fenêtre glissante, documents des N derniers jours avant le plus récent de l'index.
+        """
+        conditions = []
+        if role:
+            role_id = self._role_ids.get(role.strip().lower())
+            if role_id is None:
+                return np.zeros(len(self), dtype=bool)
+            conditions.append(self.role_codes == role_id)
+        if ligne_min is not None:
+            conditions.append(self.lignes >= int(ligne_min))
+        if ligne_max is not None:
+            conditions.append(self.lignes <= int(ligne_max))
+        if timestamp_min is not None:
+            conditions.append(self.timestamps >= _to_epoch(timestamp_min))
+        if timestamp_max is not None:
+            conditions.append(self.timestamps <= _to_epoch(timestamp_max))
+        if jours is not None:
+            conditions.append(self.timestamps >= self.timestamp_max - float(jours) * SECONDES_PAR_JOUR)
+
+        if not conditions:
+            return None
+        return np.logical_and.reduce(conditions)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Envoi des métriques des applications SecondMind vers le serveur de logs
+Format texte façon StatsD sur UDP local : « nom:valeur|type|#tag:valeur,... »
+(c = compteur, ms = durée, g = jauge). Sans attente ni erreur côté appelant :
+les mesures sont mises en file et un thread démon les envoie par paquets.
+"""
+
+import os
+import re
+import atexit
+import socket
+import threading
+import time
+from collections import deque
+
+METRICS_UDP_HOST = os.getenv("SECONDMIND_METRICS_HOST", "127.0.0.1")
+METRICS_UDP_PORT = int(os.getenv("SECONDMIND_METRICS_PORT", "7863"))
+METRICS_FLUSH_INTERVAL = 0.5   # secondes entre deux envois
+METRICS_QUEUE_MAX = 10000      # mesures en attente au plus (au-delà, perdues et comptées)
+METRICS_DATAGRAM_MAX = 1400    # octets par datagramme (sous la MTU)
+METRIC_TYPES = ('c', 'ms', 'g')
+_INTERDITS_RE = re.compile(r"[^\w.\-]")
+
+
+def formater_metrique(name, value, kind, tags):
+    """Ligne « nom:valeur|type|#tag:valeur » (caractères réservés remplacés par _)"""
+    ligne = f"{_INTERDITS_RE.sub('_', name)}:{value:g}|{kind}"
+    if tags:
+        ligne += "|#" + ",".join(
+            f"{_INTERDITS_RE.sub('_', str(k))}:{_INTERDITS_RE.sub('_', str(v))}" for k, v in sorted(tags.items())
+        )
+    return ligne
+
+
+class MetricsClient:
+    """Client « fire-and-forget » : incr / observe / gauge ne font qu'ajouter à une file
+
+    Le serveur de logs absent ou saturé ne ralentit ni ne casse l'application :
+    les mesures perdues (file pleine, envoi impossible) sont simplement comptées dans `dropped`.
+    """
+
+    def __init__(self, app, host=METRICS_UDP_HOST, port=METRICS_UDP_PORT, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.app = app
+        self.address = (host, port)
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = deque()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._flush_lock = threading.Lock()
+        threading.Thread(target=self._boucle, name="metrics-client", daemon=True).start()
+        # Processus courts (vectorisation) : dernières mesures envoyées à la sortie
+        atexit.register(self.flush)
+
+    def incr(self, name, value=1, **tags):
+        self._ajouter((name, value, 'c', tags))
+
+    def observe(self, name, duree_ms, **tags):
+        self._ajouter((name, duree_ms, 'ms', tags))
+
+    def gauge(self, name, value, **tags):
+        self._ajouter((name, value, 'g', tags))
+
+    def _ajouter(self, mesure):
+        if len(self._queue) >= METRICS_QUEUE_MAX:
+            self.dropped += 1
+            return
+        self._queue.append(mesure)
+
+    def flush(self):
+        """Envoie les mesures en attente, regroupées en datagrammes de METRICS_DATAGRAM_MAX octets"""
+        with self._flush_lock:
+            paquet, taille = [], 0
+            while True:
+                try:
+                    name, value, kind, tags = self._queue.popleft()
+                except IndexError:
+                    break
+                ligne = formater_metrique(name, value, kind, dict(tags, app=self.app)).encode('utf-8')
+                if paquet and taille + len(ligne) + 1 > METRICS_DATAGRAM_MAX:
+                    self._envoyer(paquet)
+                    paquet, taille = [], 0
+                paquet.append(ligne)
+                taille += len(ligne) + 1
+            if paquet:
+                self._envoyer(paquet)
+
+    def _envoyer(self, lignes):
+        try:
+            self._socket.sendto(b"\n".join(lignes), self.address)
+        except OSError:
+            # Serveur arrêté, tampon plein... : la mesure est perdue, jamais l'appel
+            self.dropped += len(lignes)
+
+    def _boucle(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
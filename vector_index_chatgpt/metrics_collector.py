@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Réception des métriques des applications SecondMind (serveur de logs)
+Datagrammes UDP au format de metrics_client, agrégés par nom et par tags :
+compteurs cumulés, dernières valeurs des jauges, histogrammes de durées.
+Export au format texte Prometheus et en JSON
+"""
+
+import re
+import socket
+import threading
+import logging
+from metrics_client import METRIC_TYPES
+from search_metrics import LatencyHistogram, format_labels, lignes_histogramme
+
+METRIC_PREFIX = "secondmind_"
+METRIC_LINE_RE = re.compile(r'^([\w.\-]+):([^|]+)\|([a-z]+)(?:\|@[\d.]+)?(?:\|#(.*))?$')
+_NOM_PROMETHEUS_RE = re.compile(r"[^a-zA-Z0-9_]")
+MAX_SERIES = 5000   # séries distinctes gardées (protège contre des tags à valeurs illimitées)
+
+
+def nom_prometheus(name):
+    return METRIC_PREFIX + _NOM_PROMETHEUS_RE.sub('_', name)
+
+
+class MetricsCollector:
+    """Agrégats des métriques reçues, clés (nom, tags triés)"""
+
+    def __init__(self, max_series=MAX_SERIES):
+        self.max_series = max_series
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.received = 0
+        self.malformed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def handle(self, datagram):
+        """Traite un datagramme (une mesure par ligne)"""
+        for ligne in datagram.decode('utf-8', errors='replace').splitlines():
+            mesure = self._lire(ligne)
+            if mesure is None:
+                self.malformed += 1
+                continue
+            self._ajouter(*mesure)
+
+    def _lire(self, ligne):
+        match = METRIC_LINE_RE.match(ligne.strip())
+        if not match or match.group(3) not in METRIC_TYPES:
+            return None
+        name, valeur, kind, tags = match.groups()
+        try:
+            valeur = float(valeur)
+        except ValueError:
+            return None
+        paires = tuple(sorted(
+            tuple(tag.split(':', 1)) for tag in (tags or '').split(',') if ':' in tag
+        ))
+        return name, valeur, kind, paires
+
+    def _ajouter(self, name, valeur, kind, tags):
+        cle = (name, tags)
+        with self._lock:
+            self.received += 1
+            table = {'c': self.counters, 'g': self.gauges, 'ms': self.histograms}[kind]
+            if cle not in table and self._series() >= self.max_series:
+                self.rejected += 1
+                return
+            if kind == 'c':
+                self.counters[cle] = self.counters.get(cle, 0.0) + valeur
+            elif kind == 'g':
+                self.gauges[cle] = valeur
+            else:
+                histogram = self.histograms.get(cle)
+                if histogram is None:
+                    histogram = self.histograms[cle] = LatencyHistogram()
+        if kind == 'ms':
+            histogram.observe(valeur)
+
+    def _series(self):
+        return len(self.counters) + len(self.gauges) + len(self.histograms)
+
+    def serve(self, host, port):
+        """Écoute les datagrammes dans un thread démon ; retourne le socket (None si port occupé)"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((host, port))
+        except OSError as e:
+            logging.warning(f"⚠️ Réception des métriques impossible sur {host}:{port} : {e}")
+            sock.close()
+            return None
+
+        def boucle():
+            while True:
+                try:
+                    datagram, _ = sock.recvfrom(65535)
+                except OSError:
+                    return
+                self.handle(datagram)
+
+        threading.Thread(target=boucle, name="metrics-collector", daemon=True).start()
+        logging.info(f"📈 Réception des métriques applicatives sur udp://{host}:{port}")
+        return sock
+
+    def render_prometheus(self):
+        """Export texte Prometheus (compteurs *_total, jauges, histogrammes en ms)"""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            received, malformed, rejected = self.received, self.malformed, self.rejected
+
+        lignes = []
+
+        def entete(metric, kind, vu):
+            if metric not in vu:
+                vu.add(metric)
+                lignes.append(f"# TYPE {metric} {kind}")
+
+        vu = set()
+        for (name, tags), valeur in counters:
+            metric = nom_prometheus(name) + "_total"
+            entete(metric, "counter", vu)
+            lignes.append(f"{metric}{format_labels(dict(tags))} {valeur:g}")
+        for (name, tags), valeur in gauges:
+            metric = nom_prometheus(name)
+            entete(metric, "gauge", vu)
+            lignes.append(f"{metric}{format_labels(dict(tags))} {valeur:g}")
+        for (name, tags), histogram in histograms:
+            metric = nom_prometheus(name)
+            entete(metric, "histogram", vu)
+            lignes.extend(lignes_histogramme(metric, dict(tags), histogram))
+
+        lignes.append("# TYPE secondmind_metrics_received_total counter")
+        lignes.append(f"secondmind_metrics_received_total {received}")
+        lignes.append("# TYPE secondmind_metrics_malformed_total counter")
+        lignes.append(f"secondmind_metrics_malformed_total {malformed}")
+        lignes.append("# TYPE secondmind_metrics_rejected_total counter")
+        lignes.append(f"secondmind_metrics_rejected_total {rejected}")
+        return "\n".join(lignes) + "\n"
+
+    def snapshot(self):
+        """Vue JSON : compteurs, jauges et résumé des histogrammes, par nom puis par tags"""
+        with self._lock:
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+            histograms = list(self.histograms.items())
+        vue = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        for table, items in (('counters', counters), ('gauges', gauges)):
+            for (name, tags), valeur in items:
+                vue[table].setdefault(name, []).append({'tags': dict(tags), 'value': valeur})
+        for (name, tags), histogram in histograms:
+            vue['histograms'].setdefault(name, []).append({'tags': dict(tags), **histogram.snapshot()})
+        vue.update({'received': self.received, 'malformed': self.malformed, 'rejected': self.rejected})
+        return vue
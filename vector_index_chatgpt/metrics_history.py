@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Historique des métriques système pour le serveur de monitoring SecondMind
+Échantillonnage non bloquant (psutil sans intervalle d'attente), tampons circulaires
+de taille fixe à plusieurs résolutions (1 s, 1 min, 1 h) et séries sous-échantillonnées
+"""
+
+import os
+import math
+import threading
+import time
+import numpy as np
+import psutil
+
+# (nom, pas en secondes, nombre de points) : 10 min à la seconde, 24 h à la minute, 30 j à l'heure
+HISTORY_RESOLUTIONS = (('1s', 1, 600), ('1m', 60, 1440), ('1h', 3600, 720))
+PROCESS_SCAN_INTERVAL = 30  # secondes entre deux recherches des processus surveillés
+# Processus suivis : nom → script Python reconnu dans la ligne de commande
+MONITORED_SCRIPTS = {
+    'gradio_local': 'app_gradio_local.py',
+    'gradio_online': 'gradio_online_fixed.py',
+    'vectorize_local': 'vectorize_local_fixed.py',
+    'vectorize_online': 'vectorize_online_fixed.py',
+    'fix_faiss': 'fix_faiss_index.py',
+}
+SYSTEM_FIELDS = ('cpu_percent', 'memory_percent', 'memory_used_gb', 'memory_total_gb',
+                 'disk_percent', 'disk_used_gb', 'disk_total_gb')
+PROCESS_FIELDS = ('cpu_percent', 'rss_mb')
+
+
+class RingBuffer:
+    """Points (horodatage, valeurs) en tableau circulaire de capacité fixe"""
+
+    def __init__(self, capacity, n_fields):
+        self.times = np.full(capacity, np.nan)
+        self.values = np.full((capacity, n_fields), np.nan, dtype=np.float32)
+        self.count = 0
+
+    def append(self, timestamp, values):
+        i = self.count % len(self.times)
+        self.times[i] = timestamp
+        self.values[i] = values
+        self.count += 1
+
+    def ordered(self):
+        """Copie chronologique (horodatages, valeurs)"""
+        capacity = len(self.times)
+        if self.count <= capacity:
+            return self.times[:self.count].copy(), self.values[:self.count].copy()
+        i = self.count % capacity
+        return (np.concatenate([self.times[i:], self.times[:i]]),
+                np.concatenate([self.values[i:], self.values[:i]]))
+
+
+def moyennes_par_paquets(times, values, points):
+    """Réduit une série à au plus `points` points (moyenne par paquets, NaN ignorés)"""
+    facteur = math.ceil(len(times) / points)
+    if facteur <= 1:
+        return times, values
+    manque = -len(times) % facteur
+    times = np.concatenate([times, np.full(manque, np.nan)]).reshape(-1, facteur)
+    values = np.concatenate([values, np.full((manque, values.shape[1]), np.nan, dtype=values.dtype)])
+    values = values.reshape(-1, facteur, values.shape[1])
+    presents = ~np.isnan(values)
+    sommes = np.where(presents, values, 0).sum(axis=1)
+    comptes = presents.sum(axis=1)
+    moyennes = np.divide(sommes, comptes, out=np.full(sommes.shape, np.nan, dtype=np.float32), where=comptes > 0)
+    return times[:, 0], moyennes
+
+
+class MetricsHistory:
+    """Séries temporelles à plusieurs résolutions, mêmes champs partout
+
+    Chaque échantillon va dans le tampon le plus fin ; les résolutions plus larges reçoivent
+    la moyenne de chaque intervalle une fois celui-ci terminé. Mémoire fixe.
+    """
+
+    def __init__(self, fields, resolutions=HISTORY_RESOLUTIONS):
+        self.fields = tuple(fields)
+        self._index = {field: i for i, field in enumerate(self.fields)}
+        self.steps = {name: step for name, step, _ in resolutions}
+        self._buffers = {name: RingBuffer(capacity, len(self.fields)) for name, _, capacity in resolutions}
+        self._finest = resolutions[0][0]
+        # Agrégation en cours des résolutions larges : [intervalle, sommes, comptes]
+        self._rollups = {name: [None, np.zeros(len(self.fields)), np.zeros(len(self.fields))]
+                         for name, _, _ in resolutions[1:]}
+        self._lock = threading.Lock()
+
+    def add(self, timestamp, sample):
+        """Ajoute un échantillon {champ: valeur} (champs absents ou None = NaN)"""
+        values = np.array([sample.get(field, np.nan) for field in self.fields], dtype=np.float64)
+        presents = ~np.isnan(values)
+        with self._lock:
+            self._buffers[self._finest].append(timestamp, values)
+            for name, rollup in self._rollups.items():
+                step = self.steps[name]
+                intervalle = int(timestamp // step)
+                if rollup[0] is not None and intervalle != rollup[0]:
+                    self._clore(name, rollup)
+                rollup[0] = intervalle
+                rollup[1][presents] += values[presents]
+                rollup[2] += presents
+
+    def _clore(self, name, rollup):
+        intervalle, sommes, comptes = rollup
+        moyennes = np.divide(sommes, comptes, out=np.full(len(sommes), np.nan), where=comptes > 0)
+        self._buffers[name].append(intervalle * self.steps[name], moyennes)
+        sommes[:] = 0
+        comptes[:] = 0
+
+    def series(self, resolution, since=None, points=None, fields=None):
+        """Série d'une résolution : {'t': [...], champ: [...]} (None pour les valeurs absentes)
+
+        since : horodatage epoch minimal ; points : nombre maximal de points (moyennes par paquets).
+        """
+        fields = [field for field in (fields or self.fields) if field in self._index]
+        with self._lock:
+            times, values = self._buffers[resolution].ordered()
+        if since is not None:
+            garder = times >= since
+            times, values = times[garder], values[garder]
+        values = values[:, [self._index[field] for field in fields]]
+        if points and len(times) > points:
+            times, values = moyennes_par_paquets(times, values, points)
+
+        def liste(colonne):
+            return [None if math.isnan(x) else round(x, 3) for x in colonne.tolist()]
+
+        serie = {'t': liste(times)}
+        serie.update({field: liste(values[:, i]) for i, field in enumerate(fields)})
+        return serie
+
+
+class SystemSampler:
+    """Mesures système et par processus sans attente (psutil.cpu_percent(interval=None))
+
+    Le CPU est mesuré entre deux appels successifs : appeler sample() à intervalle régulier.
+    Les processus surveillés sont recherchés toutes les PROCESS_SCAN_INTERVAL secondes
+    et gardés entre deux recherches (leur mesure CPU dépend aussi de l'appel précédent).
+    """
+
+    def __init__(self, disk_path, scripts=MONITORED_SCRIPTS):
+        self.disk_path = disk_path
+        self.scripts = scripts
+        self._processes = {}  # pid → (nom, psutil.Process)
+        self._last_scan = 0.0
+        psutil.cpu_percent(interval=None)  # première mesure : référence seulement
+
+    @property
+    def fields(self):
+        return SYSTEM_FIELDS + tuple(
+            f"{name}.{field}" for name in self.scripts for field in PROCESS_FIELDS
+        )
+
+    def _scan(self):
+        """Recherche les processus dont la ligne de commande lance un script surveillé"""
+        for proc in psutil.process_iter(['pid', 'cmdline']):
+            if proc.pid in self._processes:
+                continue
+            cmdline = proc.info.get('cmdline') or []
+            scripts = {os.path.basename(arg) for arg in cmdline}
+            for name, script in self.scripts.items():
+                if script in scripts:
+                    try:
+                        proc.cpu_percent(interval=None)
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        break
+                    self._processes[proc.pid] = (name, proc)
+                    break
+        self._last_scan = time.monotonic()
+
+    def sample(self):
+        """Échantillon plat {champ: valeur} ; processus absents : NaN"""
+        if time.monotonic() - self._last_scan >= PROCESS_SCAN_INTERVAL:
+            self._scan()
+
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        sample = {
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'memory_percent': memory.percent,
+            'memory_used_gb': memory.used / (1024**3),
+            'memory_total_gb': memory.total / (1024**3),
+            'disk_percent': disk.percent,
+            'disk_used_gb': disk.used / (1024**3),
+            'disk_total_gb': disk.total / (1024**3),
+        }
+
+        totaux = {}
+        for pid, (name, proc) in list(self._processes.items()):
+            try:
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(interval=None)
+                    rss = proc.memory_info().rss / (1024**2)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                del self._processes[pid]
+                continue
+            # Plusieurs processus pour un même script (workers) : valeurs additionnées
+            total = totaux.setdefault(name, [0.0, 0.0])
+            total[0] += cpu
+            total[1] += rss
+        for name in self.scripts:
+            cpu, rss = totaux.get(name, (np.nan, np.nan))
+            sample[f"{name}.cpu_percent"] = cpu
+            sample[f"{name}.rss_mb"] = rss
+        return sample
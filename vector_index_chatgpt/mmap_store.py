@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Stockage mappé en mémoire pour SecondMind RAG
+Fichiers d'index ouverts en lecture seule via mmap : plusieurs processus de service
+partagent le même cache de pages au lieu de charger chacun sa copie
+"""
+
+import struct
+import zipfile
+from vector_backend import faiss
+import numpy as np
+
+DOCUMENTS_STORE_FILENAME = "documents.npz"
+# Codes lus directement dans le fichier (index plats) ; repli sur le mmap IVF des anciennes versions
+FAISS_MMAP_FLAGS = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+
+
+def charger_npz(path, mmap=False):
+    """Charge les tableaux d'un .npz ; mmap=True les mappe en lecture seule sans copie
+
+    np.load ignore mmap_mode pour les .npz : chaque membre non compressé (np.savez)
+    est mappé directement à son offset dans l'archive.
+    """
+    if not mmap:
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    arrays = {}
+    with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Membre compressé, mmap impossible : {info.filename}")
+            f.seek(info.header_offset)
+            header = _ZIP_LOCAL_HEADER.unpack(f.read(_ZIP_LOCAL_HEADER.size))
+            f.seek(header[-2] + header[-1], 1)  # nom de fichier + champ extra
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if dtype.hasobject:
+                raise ValueError(f"Tableau d'objets, mmap impossible : {name}")
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(),
+                                         shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+
+def charger_faiss(path, mmap=False):
+    """Lit un index FAISS ; mmap=True partage les vecteurs via le cache de pages"""
+    if mmap:
+        return faiss.read_index(path, FAISS_MMAP_FLAGS)
+    return faiss.read_index(path)
+
+
+class DocumentStore:
+    """Textes des documents en un bloc UTF-8 + offsets, indexés par id FAISS
+
+    Se comporte comme une liste de chaînes en lecture (len, [i]) ; seul le texte
+    demandé est décodé, le reste reste sur disque.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob          # uint8[total_octets]
+        self.offsets = offsets    # int64[n_docs + 1]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return bytes(self.blob[start:end]).decode('utf-8')
+
+    def __iter__(self):
+        """Tous les textes dans l'ordre (un seul passage sur le bloc)"""
+        data, offsets = bytes(self.blob), self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode('utf-8')
+
+    @classmethod
+    def build(cls, texts):
+        encoded = [texte.encode('utf-8') for texte in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def save(self, path):
+        """Sauvegarde non compressée (npz) : mappable par charger_npz(mmap=True)"""
+        np.savez(path, blob=self.blob, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        data = charger_npz(path, mmap)
+        return cls(data['blob'], data['offsets'])
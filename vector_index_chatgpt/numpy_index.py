@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de recherche vectorielle NumPy pour SecondMind RAG (sans FAISS)
+Sous-ensemble compatible de l'API faiss pour les index plats : IndexFlatL2 / IndexFlatIP,
+search, range_search, sélecteurs d'ids, read_index / write_index au format .faiss
+(plus une variante float16 du même format, lisible uniquement par ce moteur)
+
+Recherche exacte par blocs : produit matriciel requêtes × bloc, top-k par argpartition,
+blocs répartis sur plusieurs threads (NumPy libère le GIL pendant le calcul BLAS).
+"""
+
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+__version__ = "numpy-" + np.__version__
+
+METRIC_INNER_PRODUCT = 0
+METRIC_L2 = 1
+IO_FLAG_READ_ONLY = 2
+IO_FLAG_MMAP = 4
+IO_FLAG_MMAP_IFC = 8
+SEARCH_BLOCK_SIZE = 16384  # vecteurs par bloc (multiple de 8 : alignement des bitmaps)
+
+# En-tête d'un index plat sérialisé par faiss.write_index
+_FOURCC = {METRIC_INNER_PRODUCT: b"IxFI", METRIC_L2: b"IxF2"}
+# Même en-tête, vecteurs en float16 (propre à numpy_index : faiss ne sait pas le relire)
+_FOURCC_FLOAT16 = {METRIC_INNER_PRODUCT: b"IxHI", METRIC_L2: b"IxH2"}
+_DTYPES = {**{fourcc: np.float32 for fourcc in _FOURCC.values()},
+           **{fourcc: np.float16 for fourcc in _FOURCC_FLOAT16.values()}}
+_HEADER = struct.Struct('<4siqqq?iQ')
+_threads = os.cpu_count() or 1
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def omp_set_num_threads(n):
+    """Nombre de threads de recherche (même rôle que faiss.omp_set_num_threads)"""
+    global _threads, _executor
+    with _executor_lock:
+        _threads = max(1, int(n))
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_threads, thread_name_prefix="numpy-index")
+        return _executor
+
+
+def normalize_L2(x):
+    """Normalise les lignes de x sur place (comme faiss.normalize_L2)"""
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    np.divide(x, norms, out=x, where=norms > 0)
+
+
+def swig_ptr(array):
+    """Compatibilité faiss : les sélecteurs NumPy gardent directement le tableau"""
+    return array
+
+
+class IDSelectorRange:
+    """Ids dans [imin, imax)"""
+
+    def __init__(self, imin, imax):
+        self.imin, self.imax = int(imin), int(imax)
+
+    def bounds(self, n):
+        return max(self.imin, 0), min(self.imax, n)
+
+    def block_mask(self, start, end):
+        return None
+
+
+class IDSelectorBitmap:
+    """Ids dont le bit est à 1 (bitmap petit-boutiste, comme np.packbits(bitorder='little'))
+
+    n : taille du bitmap en octets, comme faiss.IDSelectorBitmap
+    """
+
+    def __init__(self, n, bitmap):
+        self.n = int(n)
+        self.bitmap = np.asarray(bitmap, dtype=np.uint8)
+
+    def bounds(self, n):
+        return 0, min(self.n * 8, n)
+
+    def block_mask(self, start, end):
+        octets = self.bitmap[start // 8:(end + 7) // 8]
+        decalage = start % 8
+        return np.unpackbits(octets, bitorder='little')[decalage:decalage + end - start].astype(bool)
+
+
+class SearchParameters:
+    def __init__(self, sel=None):
+        self.sel = sel
+
+
+class IndexFlat:
+    """Index plat exact sur un tableau (n, d) en mémoire ou mappé (float32 ou float16)"""
+
+    def __init__(self, d, metric_type=METRIC_L2, vectors=None):
+        self.d = int(d)
+        self.metric_type = metric_type
+        self.vectors = vectors if vectors is not None else np.zeros((0, self.d), dtype=np.float32)
+        self._norms = None
+
+    @property
+    def ntotal(self):
+        return len(self.vectors)
+
+    @property
+    def is_trained(self):
+        return True
+
+    def add(self, x):
+        x = np.ascontiguousarray(x, dtype=self.vectors.dtype)
+        self.vectors = np.concatenate([self.vectors, x]) if self.ntotal else x
+        self._norms = None
+
+    def reset(self):
+        self.vectors = np.zeros((0, self.d), dtype=np.float32)
+        self._norms = None
+
+    def reconstruct(self, key):
+        return np.asarray(self.vectors[int(key)], dtype=np.float32)
+
+    def reconstruct_n(self, n0=0, ni=None):
+        ni = self.ntotal - n0 if ni is None else ni
+        return np.asarray(self.vectors[n0:n0 + ni], dtype=np.float32)
+
+    def reconstruct_batch(self, keys):
+        return np.asarray(self.vectors[np.asarray(keys, dtype=np.int64)], dtype=np.float32)
+
+    def to_float16(self):
+        """Copie en mémoire en demi-précision : deux fois moins de RAM, scores à ~1e-3 près
+
+        Chaque bloc est reconverti en float32 avant le produit matriciel : recherche plus lente.
+        write_index() l'écrit au format float16, que read_index(IO_FLAG_MMAP) mappe sans copie.
+        """
+        return IndexFlat(self.d, self.metric_type, np.asarray(self.vectors).astype(np.float16))
+
+    # --- Calcul par blocs ---
+
+    def _norms_sq(self):
+        """Normes² des vecteurs (L2), calculées une fois par blocs"""
+        if self._norms is None:
+            norms = np.empty(self.ntotal, dtype=np.float32)
+            for start in range(0, self.ntotal, SEARCH_BLOCK_SIZE):
+                block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_SIZE], dtype=np.float32)
+                norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+            self._norms = norms
+        return self._norms
+
+    def _blocks(self, params):
+        """Plages (début, fin) à parcourir, restreintes par un IDSelectorRange"""
+        sel = params.sel if params is not None else None
+        lo, hi = sel.bounds(self.ntotal) if sel is not None else (0, self.ntotal)
+        starts = range(lo - lo % SEARCH_BLOCK_SIZE, hi, SEARCH_BLOCK_SIZE)
+        return [(max(s, lo), min(s + SEARCH_BLOCK_SIZE, hi)) for s in starts], sel
+
+    def _block_scores(self, x, start, end, sel):
+        """Scores (nq, bloc) orientés « plus petit = meilleur » + masque des ids exclus"""
+        block = np.asarray(self.vectors[start:end], dtype=np.float32)
+        dots = x @ block.T
+        if self.metric_type == METRIC_INNER_PRODUCT:
+            scores = -dots
+        else:
+            scores = (x * x).sum(axis=1, keepdims=True) - 2 * dots + self._norms_sq()[start:end]
+            np.maximum(scores, 0, out=scores)
+        mask = sel.block_mask(start, end) if sel is not None else None
+        if mask is not None:
+            scores[:, ~mask] = np.inf
+        return scores
+
+    def _map_blocks(self, fn, blocks):
+        if len(blocks) <= 1 or _threads == 1:
+            return [fn(*b) for b in blocks]
+        return list(_pool().map(lambda b: fn(*b), blocks))
+
+    def search(self, x, k, *, params=None, D=None, I=None):
+        """k plus proches voisins de chaque requête : retourne (distances, ids), -1 si absent"""
+        x = np.ascontiguousarray(x, dtype=np.float32).reshape(-1, self.d)
+        nq, k = len(x), int(k)
+        if self.metric_type == METRIC_L2:
+            self._norms_sq()
+        blocks, sel = self._blocks(params)
+
+        def top_bloc(start, end):
+            scores = self._block_scores(x, start, end, sel)
+            kk = min(k, end - start)
+            part = np.argpartition(scores, kk - 1, axis=1)[:, :kk] if kk < end - start \
+                else np.broadcast_to(np.arange(end - start), (nq, end - start))
+            return np.take_along_axis(scores, part, axis=1), part + start
+
+        partiels = self._map_blocks(top_bloc, blocks)
+        if partiels:
+            scores = np.concatenate([p[0] for p in partiels], axis=1)
+            ids = np.concatenate([p[1] for p in partiels], axis=1).astype(np.int64)
+        else:
+            scores = np.zeros((nq, 0), dtype=np.float32)
+            ids = np.zeros((nq, 0), dtype=np.int64)
+
+        # Fusion des top-k par bloc
+        order = np.argsort(scores, axis=1, kind='stable')[:, :k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        ids[~np.isfinite(scores)] = -1
+        if scores.shape[1] < k:
+            pad = k - scores.shape[1]
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=np.inf)
+            ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+        # Emplacements vides : ±FLT_MAX comme faiss
+        scores = np.minimum(scores, np.finfo(np.float32).max)
+        distances = -scores if self.metric_type == METRIC_INNER_PRODUCT else scores
+        return distances.astype(np.float32), ids
+
+    def range_search(self, x, thresh, *, params=None):
+        """Tous les voisins sous le seuil (L2 : distance < thresh, IP : score > thresh)
+
+        Retourne (lims, distances, ids) au format faiss : résultats de la requête i
+        dans distances[lims[i]:lims[i + 1]].
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32).reshape(-1, self.d)
+        if self.metric_type == METRIC_L2:
+            self._norms_sq()
+        limite = -float(thresh) if self.metric_type == METRIC_INNER_PRODUCT else float(thresh)
+        blocks, sel = self._blocks(params)
+
+        def hits_bloc(start, end):
+            scores = self._block_scores(x, start, end, sel)
+            q, col = np.nonzero(scores < limite)
+            return q, scores[q, col], col + start
+
+        partiels = self._map_blocks(hits_bloc, blocks)
+        q = np.concatenate([p[0] for p in partiels]) if partiels else np.zeros(0, dtype=np.int64)
+        scores = np.concatenate([p[1] for p in partiels]) if partiels else np.zeros(0, dtype=np.float32)
+        ids = np.concatenate([p[2] for p in partiels]) if partiels else np.zeros(0, dtype=np.int64)
+        order = np.argsort(q, kind='stable')
+        q, scores, ids = q[order], scores[order], ids[order].astype(np.int64)
+        lims = np.zeros(len(x) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(q, minlength=len(x)), out=lims[1:])
+        distances = -scores if self.metric_type == METRIC_INNER_PRODUCT else scores
+        return lims, distances.astype(np.float32), ids
+
+
+class IndexFlatL2(IndexFlat):
+    def __init__(self, d, vectors=None):
+        super().__init__(d, METRIC_L2, vectors)
+
+
+class IndexFlatIP(IndexFlat):
+    def __init__(self, d, vectors=None):
+        super().__init__(d, METRIC_INNER_PRODUCT, vectors)
+
+
+def write_index(index, path):
+    """Écrit un index plat au format faiss (relisible par faiss.read_index)
+
+    Un index float16 (to_float16) garde sa précision sur disque : format propre à numpy_index.
+    """
+    if index.vectors.dtype == np.float16:
+        fourcc, vectors = _FOURCC_FLOAT16[index.metric_type], np.ascontiguousarray(index.vectors)
+    else:
+        fourcc = _FOURCC[index.metric_type]
+        vectors = np.ascontiguousarray(index.reconstruct_n(0, index.ntotal), dtype=np.float32)
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(fourcc, index.d, index.ntotal,
+                             1 << 20, 1 << 20, True, index.metric_type, vectors.size))
+        f.write(vectors.tobytes())
+
+
+def read_index(path, io_flags=0):
+    """Lit un index plat écrit par faiss.write_index ou write_index() (float32 ou float16)
+
+    Avec IO_FLAG_MMAP / IO_FLAG_MMAP_IFC, les vecteurs restent sur disque (mmap lecture seule).
+    """
+    with open(path, 'rb') as f:
+        fourcc, d, ntotal, _, _, _, metric_type, n_floats = _HEADER.unpack(f.read(_HEADER.size))
+    dtype = _DTYPES.get(fourcc)
+    if dtype is None:
+        raise ValueError(f"Type d'index non pris en charge sans FAISS : {fourcc!r} (index plat requis)")
+    if n_floats != d * ntotal:
+        raise ValueError(f"Index corrompu : {n_floats} valeurs pour {ntotal} vecteurs de dimension {d}")
+
+    if io_flags & (IO_FLAG_MMAP | IO_FLAG_MMAP_IFC) and ntotal:
+        vectors = np.memmap(path, dtype=dtype, mode='r', offset=_HEADER.size, shape=(ntotal, d))
+    else:
+        vectors = np.fromfile(path, dtype=dtype, offset=_HEADER.size, count=n_floats).reshape(ntotal, d)
+    cls = IndexFlatIP if metric_type == METRIC_INNER_PRODUCT else IndexFlatL2
+    return cls(d, vectors)
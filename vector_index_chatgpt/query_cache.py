@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Cache persistant des embeddings de requêtes pour SecondMind RAG
+Une question déjà posée ne refait pas d'appel distant, même après redémarrage ou hors ligne
+"""
+
+import time
+import sqlite3
+import threading
+import numpy as np
+
+QUERY_CACHE_FILENAME = "query_cache.sqlite"
+
+
+class QueryEmbeddingCache:
+    """Embeddings de requêtes sur disque (SQLite), clé = (modèle, requête normalisée)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL : lectures concurrentes possibles depuis plusieurs processus
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "modele TEXT NOT NULL, requete TEXT NOT NULL, vecteur BLOB NOT NULL, "
+                "cree_le REAL NOT NULL, PRIMARY KEY (modele, requete))"
+            )
+            self._conn.commit()
+
+    def get(self, modele, requete):
+        """Vecteur float32 en cache, ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vecteur FROM embeddings WHERE modele = ? AND requete = ?",
+                (modele, requete)
+            ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def put(self, modele, requete, vecteur):
+        blob = np.asarray(vecteur, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                (modele, requete, blob, time.time())
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Classement pondéré par la récence pour SecondMind RAG
+Combine la similarité et une décroissance exponentielle de l'âge des documents,
+calculées en une passe vectorisée sur le pool de candidats
+"""
+
+import numpy as np
+
+RECENCY_HALF_LIFE_DAYS = 30.0  # âge auquel le bonus de récence est divisé par deux
+RECENCY_WEIGHT = 0.3           # part de la récence dans le score final (0 = similarité seule)
+RECENCY_OVERFETCH = 4          # candidats examinés par résultat demandé
+RECENCY_MIN_CANDIDATES = 50
+SECONDES_PAR_JOUR = 86400.0
+
+
+def decroissance(timestamps, reference, demi_vie_jours=RECENCY_HALF_LIFE_DAYS):
+    """Facteur de récence dans [0, 1] : 1 à la date de référence, 0.5 une demi-vie plus tôt
+
+    Les documents sans date (horodatage 0) valent 0 ; les dates futures sont bornées à 1.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    age_jours = np.maximum(reference - timestamps, 0.0) / SECONDES_PAR_JOUR
+    facteur = np.exp2(-age_jours / max(float(demi_vie_jours), 1e-9))
+    facteur[timestamps <= 0] = 0.0
+    return facteur.astype(np.float32)
+
+
+def scores_recence(similarites, timestamps, reference,
+                   demi_vie_jours=RECENCY_HALF_LIFE_DAYS, poids=RECENCY_WEIGHT):
+    """Score combiné (1 - poids) · similarité + poids · récence, même ordre que les entrées"""
+    similarites = np.asarray(similarites, dtype=np.float32)
+    return (1.0 - poids) * similarites + poids * decroissance(timestamps, reference, demi_vie_jours)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+API HTTP/JSON asynchrone pour SecondMind RAG
+Expose LocalRAGSystem sans passer par l'interface Gradio
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Header, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from search_metrics import PROBE_HEADER, metrics
+
+API_MAX_RESULTS = 50
+API_MAX_CONTEXT = 20
+KEEP_ALIVE_TIMEOUT = 75  # secondes, connexions persistantes des clients scriptés
+WORKER_INDEX_DIR_ENV = "SECONDMIND_INDEX_DIR"
+WORKER_THREADS_ENV = "SECONDMIND_WORKER_THREADS"
+
+
+class SearchRequest(BaseModel):
+    query: str
+    k: int = 5
+    mode: str = "vector"
+    expand_context: int = 0
+    min_score: Optional[float] = None
+    mmr_lambda: Optional[float] = None
+    demi_vie: Optional[float] = None
+    role: Optional[str] = None
+    ligne_min: Optional[int] = None
+    ligne_max: Optional[int] = None
+    timestamp_min: Optional[str] = None
+    timestamp_max: Optional[str] = None
+    jours: Optional[float] = None
+
+    def filters(self):
+        return _filters(self.role, self.ligne_min, self.ligne_max,
+                        self.timestamp_min, self.timestamp_max, self.jours)
+
+
+def _filters(role, ligne_min, ligne_max, timestamp_min, timestamp_max, jours=None):
+    """Dict de filtres pour search_similar (clés absentes = pas de filtre)"""
+    filters = {
+        'role': role,
+        'ligne_min': ligne_min,
+        'ligne_max': ligne_max,
+        'timestamp_min': timestamp_min,
+        'timestamp_max': timestamp_max,
+        'jours': jours,
+    }
+    return {key: value for key, value in filters.items() if value is not None} or None
+
+
+def _format_results(query, results, status):
+    """Convertit les résultats de search_similar en réponse JSON structurée"""
+    return {
+        'query': query,
+        'status': status,
+        'count': len(results),
+        'results': [
+            {
+                'rank': r['rank'],
+                'text': r['text'],
+                'ligne': r.get('ligne'),
+                'role': r.get('role'),
+                'date': r.get('date'),
+                'score': r['score'],
+                'context': r.get('context', []),
+            }
+            for r in results
+        ],
+    }
+
+
+def create_api(rag_system):
+    """Crée l'application FastAPI partageant l'instance LocalRAGSystem donnée"""
+    api = FastAPI(title="SecondMind RAG - API de recherche")
+
+    async def _search(query, k, mode, filters=None, expand_context=0, min_score=None, mmr_lambda=None,
+                      demi_vie=None, probe=False):
+        # Sonde de santé : même chemin de recherche, sans compteurs ni latences
+        with metrics.sans_mesures(probe):
+            return await _search_mesure(query, k, mode, filters, expand_context, min_score,
+                                        mmr_lambda, demi_vie)
+
+    async def _search_mesure(query, k, mode, filters, expand_context, min_score, mmr_lambda, demi_vie):
+        if not query.strip():
+            return JSONResponse({'error': 'Requête vide'}, status_code=400)
+        if rag_system.texts is None:
+            return JSONResponse({'error': 'Système non initialisé'}, status_code=503)
+
+        k = max(1, min(k, API_MAX_RESULTS))
+        # L'encodage et la recherche FAISS sont bloquants : on libère la boucle d'événements
+        results, status = await run_in_threadpool(
+            rag_system.search_similar, query, k, mode=mode, filters=filters,
+            expand_context=min(max(expand_context, 0), API_MAX_CONTEXT), min_score=min_score,
+            mmr_lambda=mmr_lambda, demi_vie=demi_vie
+        )
+        with metrics.span("local.formatting"):
+            return _format_results(query, results, status)
+
+    @api.get('/api/search')
+    async def search_get(q: str = Query(...), k: int = 5, mode: str = "vector",
+                         role: Optional[str] = None,
+                         ligne_min: Optional[int] = None, ligne_max: Optional[int] = None,
+                         timestamp_min: Optional[str] = None,
+                         timestamp_max: Optional[str] = None, jours: Optional[float] = None,
+                         expand_context: int = 0, min_score: Optional[float] = None,
+                         mmr_lambda: Optional[float] = None, demi_vie: Optional[float] = None,
+                         probe: Optional[str] = Header(None, alias=PROBE_HEADER)):
+        filters = _filters(role, ligne_min, ligne_max, timestamp_min, timestamp_max, jours)
+        return await _search(q, k, mode, filters, expand_context, min_score, mmr_lambda, demi_vie,
+                             probe=bool(probe))
+
+    @api.post('/api/search')
+    async def search_post(body: SearchRequest):
+        return await _search(body.query, body.k, body.mode, body.filters(), body.expand_context,
+                             body.min_score, body.mmr_lambda, body.demi_vie)
+
+    @api.get('/api/line')
+    async def line(ligne: int, voisins: int = 0):
+        # Accès positionnel O(1) : pas d'embedding, inutile de quitter la boucle d'événements
+        results, status = rag_system.get_line(ligne, min(max(voisins, 0), API_MAX_CONTEXT))
+        return {'ligne': ligne, 'status': status, 'results': results}
+
+    @api.get('/api/metrics')
+    async def metrics_json():
+        return metrics.snapshot()
+
+    @api.get('/metrics')
+    async def metrics_prometheus():
+        return PlainTextResponse(metrics.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+    @api.get('/api/status')
+    async def status():
+        return {
+            'ready': bool(rag_system.model and rag_system.vectorstore),
+            'lexical': rag_system.lexical is not None,
+            'documents': len(rag_system.texts) if rag_system.texts else 0,
+            'worker': os.getpid(),
+            'timestamp': datetime.now().isoformat(),
+        }
+
+    return api
+
+
+def launch(interface, rag_system, host="127.0.0.1", port=7861):
+    """Sert l'API JSON et l'interface Gradio dans le même processus (index partagé)"""
+    import gradio as gr
+
+    api = create_api(rag_system)
+    # Les routes /api/* sont déclarées avant le montage : elles restent prioritaires
+    app = gr.mount_gradio_app(api, interface, path="/")
+
+    logging.info(f"🔌 API JSON disponible sur http://{host}:{port}/api/search")
+    uvicorn.run(
+        app,
+        host=host,
+        port=port,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        log_level="warning",
+    )
+
+
+def limiter_threads(threads):
+    """Borne les threads de calcul d'un worker (évite N processus × tous les cœurs)"""
+    from vector_backend import faiss
+    faiss.omp_set_num_threads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def create_worker_app():
+    """Fabrique uvicorn d'un processus de service : index mappés en lecture seule, API JSON seule"""
+    from app_gradio_local import LocalRAGSystem, INDEX_DIR, configurer_logging
+
+    configurer_logging()
+    limiter_threads(int(os.getenv(WORKER_THREADS_ENV, "1")))
+    metrics.connecter("gradio_local")
+    rag_system = LocalRAGSystem(index_dir=os.getenv(WORKER_INDEX_DIR_ENV, INDEX_DIR))
+    success, message = rag_system.initialize(mmap=True)
+    logging.info(f"👷 Worker {os.getpid()} : {message}")
+    return create_api(rag_system)
+
+
+def launch_workers(workers, index_dir, host="127.0.0.1", port=7861):
+    """Sert l'API JSON sur N processus derrière un même socket d'écoute
+
+    Le processus parent ouvre le port et le partage : le noyau répartit les connexions
+    entre les workers. Chaque worker encode ses requêtes sur son propre cœur (pas de GIL
+    partagé) ; les index, mappés en lecture seule, ne sont présents qu'une fois en RAM.
+    L'interface Gradio reste mono-processus (sa file d'attente est propre au processus).
+    """
+    os.environ[WORKER_INDEX_DIR_ENV] = index_dir
+    os.environ.setdefault(WORKER_THREADS_ENV, str(max(1, (os.cpu_count() or 1) // workers)))
+
+    logging.info(f"🔌 API JSON ({workers} workers) disponible sur http://{host}:{port}/api/search")
+    uvicorn.run(
+        "search_api:create_worker_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        log_level="warning",
+    )
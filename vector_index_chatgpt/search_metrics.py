@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation de latence pour SecondMind RAG
+Spans chronométrés par étape de recherche, agrégés en histogrammes (in-process et HTTP),
+et transmis au serveur de logs avec les compteurs une fois le processus connecté
+"""
+
+import os
+import json
+import time
+import contextvars
+import threading
+import logging
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from metrics_client import MetricsClient
+
+# Bornes des buckets en millisecondes (la dernière est +Inf)
+BUCKETS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+METRICS_ENABLED = os.getenv("SECONDMIND_METRICS", "1") not in ("0", "false", "off")
+_NULL_SPAN = nullcontext()
+# En-tête des requêtes de sonde de santé : servies normalement, mais sans mesures
+PROBE_HEADER = "X-SecondMind-Probe"
+_HORS_MESURES = contextvars.ContextVar("secondmind_hors_mesures", default=False)
+
+
+class LatencyHistogram:
+    """Histogramme à buckets fixes (cumul, somme, quantiles approchés)"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total_ms = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, duree_ms):
+        for i, borne in enumerate(BUCKETS_MS):
+            if duree_ms <= borne:
+                break
+        with self._lock:
+            self.counts[i] += 1
+            self.total_ms += duree_ms
+            self.count += 1
+
+    def quantile(self, q):
+        """Borne supérieure du bucket contenant le quantile q"""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if count == 0:
+            return None
+        rang, cumul = q * count, 0
+        for borne, n in zip(BUCKETS_MS, counts):
+            cumul += n
+            if cumul >= rang:
+                return borne
+        return BUCKETS_MS[-1]
+
+    def snapshot(self):
+        with self._lock:
+            count, total = self.count, self.total_ms
+        return {
+            'count': count,
+            'mean_ms': total / count if count else None,
+            'p50_ms': self.quantile(0.50),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+        }
+
+
+def format_labels(labels):
+    """{'stage': 'local.ann'} → '{stage="local.ann"}' (valeurs échappées)"""
+    if not labels:
+        return ""
+    paires = []
+    for nom, valeur in labels.items():
+        valeur = str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        paires.append(f'{nom}="{valeur}"')
+    return "{" + ",".join(paires) + "}"
+
+
+def lignes_histogramme(metric, labels, histogram):
+    """Lignes Prometheus d'un histogramme : buckets cumulés, somme et nombre"""
+    with histogram._lock:
+        counts, total, count = list(histogram.counts), histogram.total_ms, histogram.count
+    lignes, cumul = [], 0
+    for borne, n in zip(BUCKETS_MS, counts):
+        cumul += n
+        le = "+Inf" if borne == float('inf') else f"{borne:g}"
+        lignes.append(f'{metric}_bucket{format_labels(dict(labels, le=le))} {cumul}')
+    lignes.append(f'{metric}_sum{format_labels(labels)} {total:.3f}')
+    lignes.append(f'{metric}_count{format_labels(labels)} {count}')
+    return lignes
+
+
+class _Span:
+    __slots__ = ('registry', 'stage', 'debut')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, (time.perf_counter() - self.debut) * 1000)
+        return False
+
+
+class SearchMetrics:
+    """Registre des histogrammes par étape (ex. "local.embedding", "online.ann")"""
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.histograms = {}
+        self.client = None
+        self._lock = threading.Lock()
+
+    def connecter(self, app):
+        """Transmet désormais les mesures au serveur de logs (app : nom du composant émetteur)"""
+        if self.enabled and self.client is None:
+            self.client = MetricsClient(app)
+        return self.client
+
+    def span(self, stage):
+        """Context manager chronométrant une étape ; quasi gratuit si désactivé"""
+        if not self.enabled or _HORS_MESURES.get():
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    @contextmanager
+    def sans_mesures(self, actif=True):
+        """Ni latences ni compteurs dans ce contexte (propagé aux threads de run_in_threadpool) :
+        les recherches de sonde ne faussent pas les requêtes comptées ni les histogrammes"""
+        jeton = _HORS_MESURES.set(actif)
+        try:
+            yield
+        finally:
+            _HORS_MESURES.reset(jeton)
+
+    def observe(self, stage, duree_ms):
+        if _HORS_MESURES.get():
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        histogram.observe(duree_ms)
+        if self.client is not None:
+            self.client.observe("search_stage_ms", duree_ms, stage=stage)
+
+    def incr(self, name, value=1, **tags):
+        """Compteur transmis au serveur de logs (sans effet si le processus n'est pas connecté)"""
+        if self.client is not None and not _HORS_MESURES.get():
+            self.client.incr(name, value, **tags)
+
+    def gauge(self, name, value, **tags):
+        """Jauge transmise au serveur de logs (sans effet si le processus n'est pas connecté)"""
+        if self.client is not None and not _HORS_MESURES.get():
+            self.client.gauge(name, value, **tags)
+
+    @contextmanager
+    def batch(self, stage, documents):
+        """Chronomètre un lot (ex. vectorisation) : durée de l'étape, documents comptés, débit en jauge"""
+        if not self.enabled:
+            yield
+            return
+        debut = time.perf_counter()
+        yield
+        duree = time.perf_counter() - debut
+        self.observe(stage, duree * 1000)
+        self.incr("documents", documents, stage=stage)
+        if duree > 0:
+            self.gauge("documents_per_second", documents / duree, stage=stage)
+
+    def snapshot(self):
+        """Vue JSON : count, moyenne et quantiles par étape"""
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+        return {stage: h.snapshot() for stage, h in histograms}
+
+    def render_prometheus(self):
+        """Export au format texte Prometheus"""
+        lignes = [
+            "# HELP secondmind_search_stage_ms Latence par étape de recherche (ms)",
+            "# TYPE secondmind_search_stage_ms histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+        for stage, h in histograms:
+            lignes.extend(lignes_histogramme("secondmind_search_stage_ms", {'stage': stage}, h))
+        return "\n".join(lignes) + "\n"
+
+
+# Registre global partagé par tous les composants du processus
+metrics = SearchMetrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/metrics'):
+            body, content_type = metrics.render_prometheus(), 'text/plain; version=0.0.4'
+        elif self.path.startswith('/api/metrics'):
+            body, content_type = json.dumps(metrics.snapshot()), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host="127.0.0.1", port=7862):
+    """Expose /metrics et /api/metrics dans un thread démon (processus sans FastAPI)
+
+    Retourne le serveur, None si le port est occupé (l'application démarre sans métriques HTTP).
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.warning(f"⚠️ Serveur de métriques impossible sur {host}:{port} : {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"📈 Métriques de latence disponibles sur http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Sélection du moteur de recherche vectorielle pour SecondMind RAG
+FAISS s'il est installé, sinon le moteur NumPy (numpy_index, même API pour les index plats).
+SECONDMIND_SEARCH_BACKEND=numpy force le moteur NumPy.
+"""
+
+import os
+import logging
+
+SEARCH_BACKEND_ENV = "SECONDMIND_SEARCH_BACKEND"
+
+if os.getenv(SEARCH_BACKEND_ENV, "faiss").lower() == "numpy":
+    import numpy_index as faiss
+else:
+    try:
+        import faiss
+    except ImportError:
+        import numpy_index as faiss
+        logging.warning("⚠️ faiss-cpu non installé : moteur de recherche NumPy (index plats uniquement)")
+
+BACKEND_NAME = "numpy" if faiss.__name__ == "numpy_index" else "faiss"
@@ -5,40 +5,19 @@ Version corrigée avec chemins absolus et améliorations
 """
 import os
 import sys
+import time
 import json
-import pickle
 import numpy as np
 from datetime import datetime
 from sentence_transformers import SentenceTransformer
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_core.documents import Document
+from ingestion import extraire_documents, horodatage_fichier, sauvegarder_documents_partages
+from search_metrics import metrics
+from hierarchical_index import BlockIndex, BLOCKS_INDEX_FILENAME
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
-def nettoyer_ligne(texte):
-    """Nettoie et standardise une ligne de texte"""
-    return texte.strip().replace("\n", " ").replace("\r", "").replace("  ", " ").strip()
-
-def extraire_role_et_contenu(ligne):
-    """Extrait le rôle et le contenu d'une ligne de conversation"""
-    ligne_nettoyee = nettoyer_ligne(ligne)
-    if not ligne_nettoyee:
-        return None, None
-    
-    # Détection du format "role|contenu" ou similaire
-    if "|" in ligne_nettoyee:
-        parts = ligne_nettoyee.split("|", 1)
-        role = parts[0].strip().lower()
-        contenu = parts[1].strip()
-    elif ligne_nettoyee.lower().startswith(("user:", "assistant:", "human:", "ai:")):
-        parts = ligne_nettoyee.split(":", 1)
-        role = parts[0].strip().lower()
-        contenu = parts[1].strip() if len(parts) > 1 else ""
-    else:
-        role = "unknown"
-        contenu = ligne_nettoyee
-    
-    return role, contenu
-
 def main():
     print("🚀 DÉMARRAGE DE LA VECTORISATION LOCALE (HuggingFace)")
     print("=" * 65)
@@ -47,9 +26,13 @@ def main():
     BASE_DIR = r"C:\Users\rag_personnel"
     DATA_PATH = os.path.join(BASE_DIR, "Logs", "conversations_extraites.txt")
     DB_FAISS_PATH = os.path.join(BASE_DIR, "Logs", "vector_index_chatgpt")
+    # Index nommé : les espaces d'embedding local et online coexistent sur les mêmes ids
+    INDEX_PATH = os.path.join(DB_FAISS_PATH, "local")
+    # Vecteurs normalisés + produit scalaire = similarité cosinus (seuils de score directs)
+    DISTANCE_STRATEGY = DistanceStrategy.MAX_INNER_PRODUCT
     
     print(f"📁 Fichier source : {DATA_PATH}")
-    print(f"📁 Dossier index : {DB_FAISS_PATH}")
+    print(f"📁 Dossier index : {INDEX_PATH}")
     
     # === VÉRIFICATIONS PRÉLIMINAIRES ===
     if not os.path.exists(DATA_PATH):
@@ -58,7 +41,7 @@ def main():
         sys.exit(1)
     
     # Créer le dossier de destination si nécessaire
-    os.makedirs(DB_FAISS_PATH, exist_ok=True)
+    os.makedirs(INDEX_PATH, exist_ok=True)
     
     # === LECTURE ET TRAITEMENT DES DONNÉES ===
     print("\n📖 Lecture du fichier source...")
@@ -74,33 +57,11 @@ def main():
     
     # === CRÉATION DES DOCUMENTS ===
     print("\n🔄 Traitement des documents...")
-    docs = []
-    stats = {"user": 0, "assistant": 0, "unknown": 0, "empty": 0}
-    
-    for i, line in enumerate(all_lines):
-        role, contenu = extraire_role_et_contenu(line)
-        
-        if not contenu:
-            stats["empty"] += 1
-            continue
-        
-        # Mise à jour des statistiques
-        if role in stats:
-            stats[role] += 1
-        else:
-            stats["unknown"] += 1
-        
-        # Création du document
-        metadata = {
-            "source": "conversations_extraites.txt",
-            "ligne": i + 1,
-            "role": role,
-            "longueur": len(contenu),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        doc = Document(page_content=contenu, metadata=metadata)
-        docs.append(doc)
+    contenus, metadatas, stats = extraire_documents(all_lines, horodatage_defaut=horodatage_fichier(DATA_PATH))
+    docs = [
+        Document(page_content=contenu, metadata=metadata)
+        for contenu, metadata in zip(contenus, metadatas)
+    ]
     
     print(f"✅ {len(docs)} documents créés")
     print(f"📊 Statistiques : {stats}")
@@ -135,6 +96,9 @@ def main():
     
     # === VECTORISATION ===
     print("\n🔄 Vectorisation en cours...")
+    # Débit (documents/s) envoyé au serveur de logs pendant la vectorisation
+    metrics.connecter("vectorize_local")
+    debut_vectorisation = time.perf_counter()
     try:
         # Traitement par batch pour gérer la mémoire
         batch_size = 50  # Plus petit pour le local
@@ -144,13 +108,15 @@ def main():
             
             # Premier batch pour initialiser l'index
             first_batch = docs[:batch_size]
-            index = FAISS.from_documents(first_batch, embeddings)
+            with metrics.batch("vectorize_local.batch", len(first_batch)):
+                index = FAISS.from_documents(first_batch, embeddings, distance_strategy=DISTANCE_STRATEGY)
             print(f"✅ Premier batch traité : {len(first_batch)} documents")
             
             # Batches suivants
             for i in range(batch_size, len(docs), batch_size):
                 batch = docs[i:i+batch_size]
-                batch_index = FAISS.from_documents(batch, embeddings)
+                with metrics.batch("vectorize_local.batch", len(batch)):
+                    batch_index = FAISS.from_documents(batch, embeddings, distance_strategy=DISTANCE_STRATEGY)
                 index.merge_from(batch_index)
                 print(f"✅ Batch {i//batch_size + 1} traité : {len(batch)} documents")
                 
@@ -159,9 +125,11 @@ def main():
                 percentage = (progress / len(docs)) * 100
                 print(f"📊 Progrès : {progress}/{len(docs)} ({percentage:.1f}%)")
         else:
-            index = FAISS.from_documents(docs, embeddings)
+            with metrics.batch("vectorize_local.batch", len(docs)):
+                index = FAISS.from_documents(docs, embeddings, distance_strategy=DISTANCE_STRATEGY)
         
-        print("✅ Vectorisation terminée")
+        duree = time.perf_counter() - debut_vectorisation
+        print(f"✅ Vectorisation terminée ({len(docs) / duree:.1f} documents/s)")
         
     except Exception as e:
         print(f"❌ ERREUR lors de la vectorisation : {e}")
@@ -171,11 +139,11 @@ def main():
     # === SAUVEGARDE ===
     print("\n💾 Sauvegarde de l'index...")
     try:
-        index.save_local(DB_FAISS_PATH)
+        index.save_local(INDEX_PATH)
         print("✅ Index FAISS sauvegardé")
         
         # Sauvegarde des métadonnées supplémentaires
-        metadata_file = os.path.join(DB_FAISS_PATH, "metadata.json")
+        metadata_file = os.path.join(INDEX_PATH, "metadata.json")
         metadata_info = {
             "created_at": datetime.now().isoformat(),
             "source_file": DATA_PATH,
@@ -191,20 +159,16 @@ def main():
         
         print("✅ Métadonnées sauvegardées")
         
-        # Sauvegarde des métadonnées pour compatibilité avec les anciens scripts
-        metadatas_list = []
-        for doc in docs:
-            metadatas_list.append({
-                "ligne_originale": doc.metadata["ligne"],
-                "role": doc.metadata["role"],
-                "texte_complet": doc.page_content,
-                "longueur": doc.metadata["longueur"]
-            })
-        
-        with open(os.path.join(DB_FAISS_PATH, "index.pkl"), "wb") as f:
-            pickle.dump(metadatas_list, f)
+        # Fichiers partagés par les index nommés : documents, BM25, colonnes de métadonnées
+        lexical, columns = sauvegarder_documents_partages(contenus, metadatas, DB_FAISS_PATH)
+        print("✅ Documents partagés sauvegardés")
+        print(f"✅ Index lexical BM25 sauvegardé ({len(lexical.terms)} termes)")
+        print(f"✅ Colonnes de métadonnées sauvegardées ({len(columns.roles)} rôles)")
         
-        print("✅ Métadonnées de compatibilité sauvegardées")
+        # Index grossier : un centroïde par bloc de conversation (recherche hiérarchique)
+        blocks = BlockIndex.build(index.index, columns.conversations)
+        blocks.save(os.path.join(INDEX_PATH, BLOCKS_INDEX_FILENAME))
+        print(f"✅ Index des conversations sauvegardé ({len(blocks)} blocs)")
         
     except Exception as e:
         print(f"❌ ERREUR lors de la sauvegarde : {e}")
@@ -212,7 +176,7 @@ def main():
         sys.exit(1)
     
     # === CRÉATION DU DIAGNOSTIC ===
-    diagnostic_file = os.path.join(DB_FAISS_PATH, "diagnostic.txt")
+    diagnostic_file = os.path.join(INDEX_PATH, "diagnostic.txt")
     try:
         with open(diagnostic_file, "w", encoding="utf-8") as f:
             f.write(f"=== DIAGNOSTIC VECTORISATION LOCALE ===\n")
@@ -223,7 +187,7 @@ def main():
             f.write(f"Statistiques par rôle :\n")
             for role, count in stats.items():
                 f.write(f"  - {role} : {count}\n")
-            f.write(f"\nIndex sauvegardé dans : {DB_FAISS_PATH}\n")
+            f.write(f"\nIndex sauvegardé dans : {INDEX_PATH}\n")
             f.write(f"✅ Vectorisation réussie\n")
         
         print("✅ Diagnostic créé")
@@ -236,9 +200,10 @@ def main():
     try:
         # Test de rechargement
         test_index = FAISS.load_local(
-            DB_FAISS_PATH, 
+            INDEX_PATH, 
             embeddings,
-            allow_dangerous_deserialization=True
+            allow_dangerous_deserialization=True,
+            distance_strategy=DISTANCE_STRATEGY
         )
         
         # Test de recherche
@@ -262,7 +227,7 @@ def main():
     print("\n" + "=" * 65)
     print("🎉 VECTORISATION LOCALE TERMINÉE AVEC SUCCÈS !")
     print(f"✅ {len(docs)} documents vectorisés")
-    print(f"📁 Index sauvegardé dans : {DB_FAISS_PATH}")
+    print(f"📁 Index sauvegardé dans : {INDEX_PATH}")
     print(f"🧠 Modèle utilisé : {model_name}")
     print("💡 Avantages du modèle local :")
     print("   - Aucun coût d'API")
@@ -5,43 +5,21 @@ Version corrigée avec chemins absolus et améliorations
 """
 import os
 import sys
+import time
 import faiss
 import pickle
 from datetime import datetime
 from langchain_community.vectorstores import FAISS
 from langchain_community.docstore import InMemoryDocstore
 from langchain_core.documents import Document
+from ingestion import extraire_documents, horodatage_fichier, sauvegarder_documents_partages
+from search_metrics import metrics
 from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement
 load_dotenv()
 
-def nettoyer_ligne(texte):
-    """Nettoie et standardise une ligne de texte"""
-    return texte.strip().replace("\n", " ").replace("\r", "").replace("  ", " ").strip()
-
-def extraire_role_et_contenu(ligne):
-    """Extrait le rôle et le contenu d'une ligne de conversation"""
-    ligne_nettoyee = nettoyer_ligne(ligne)
-    if not ligne_nettoyee:
-        return None, None
-    
-    # Détection du format "role|contenu" ou similaire
-    if "|" in ligne_nettoyee:
-        parts = ligne_nettoyee.split("|", 1)
-        role = parts[0].strip().lower()
-        contenu = parts[1].strip()
-    elif ligne_nettoyee.lower().startswith(("user:", "assistant:", "human:", "ai:")):
-        parts = ligne_nettoyee.split(":", 1)
-        role = parts[0].strip().lower()
-        contenu = parts[1].strip() if len(parts) > 1 else ""
-    else:
-        role = "unknown"
-        contenu = ligne_nettoyee
-    
-    return role, contenu
-
 def main():
     print("🚀 DÉMARRAGE DE LA VECTORISATION ONLINE (OpenAI)")
     print("=" * 60)
@@ -50,9 +28,11 @@ def main():
     BASE_DIR = r"C:\Users\rag_personnel"
     DATA_PATH = os.path.join(BASE_DIR, "Logs", "conversations_extraites.txt")
     DB_FAISS_PATH = os.path.join(BASE_DIR, "Logs", "vector_index_chatgpt")
+    # Index nommé : les espaces d'embedding local et online coexistent sur les mêmes ids
+    INDEX_PATH = os.path.join(DB_FAISS_PATH, "online")
     
     print(f"📁 Fichier source : {DATA_PATH}")
-    print(f"📁 Dossier index : {DB_FAISS_PATH}")
+    print(f"📁 Dossier index : {INDEX_PATH}")
     
     # === VÉRIFICATIONS PRÉLIMINAIRES ===
     if not os.path.exists(DATA_PATH):
@@ -61,7 +41,7 @@ def main():
         sys.exit(1)
     
     # Créer le dossier de destination si nécessaire
-    os.makedirs(DB_FAISS_PATH, exist_ok=True)
+    os.makedirs(INDEX_PATH, exist_ok=True)
     
     # Vérifier la clé API OpenAI
     if not os.getenv("OPENAI_API_KEY"):
@@ -84,33 +64,11 @@ def main():
     
     # === CRÉATION DES DOCUMENTS ===
     print("\n🔄 Traitement des documents...")
-    docs = []
-    stats = {"user": 0, "assistant": 0, "unknown": 0, "empty": 0}
-    
-    for i, line in enumerate(all_lines):
-        role, contenu = extraire_role_et_contenu(line)
-        
-        if not contenu:
-            stats["empty"] += 1
-            continue
-        
-        # Mise à jour des statistiques
-        if role in stats:
-            stats[role] += 1
-        else:
-            stats["unknown"] += 1
-        
-        # Création du document
-        metadata = {
-            "source": "conversations_extraites.txt",
-            "ligne": i + 1,
-            "role": role,
-            "longueur": len(contenu),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        doc = Document(page_content=contenu, metadata=metadata)
-        docs.append(doc)
+    contenus, metadatas, stats = extraire_documents(all_lines, horodatage_defaut=horodatage_fichier(DATA_PATH))
+    docs = [
+        Document(page_content=contenu, metadata=metadata)
+        for contenu, metadata in zip(contenus, metadatas)
+    ]
     
     print(f"✅ {len(docs)} documents créés")
     print(f"📊 Statistiques : {stats}")
@@ -135,6 +93,9 @@ def main():
     
     # === VECTORISATION ===
     print("\n🔄 Vectorisation en cours...")
+    # Débit (documents/s) envoyé au serveur de logs pendant la vectorisation
+    metrics.connecter("vectorize_online")
+    debut_vectorisation = time.perf_counter()
     try:
         # Traitement par batch pour éviter les timeouts
         batch_size = 100
@@ -143,19 +104,23 @@ def main():
             
             # Premier batch pour initialiser l'index
             first_batch = docs[:batch_size]
-            index = FAISS.from_documents(first_batch, embeddings)
+            with metrics.batch("vectorize_online.batch", len(first_batch)):
+                index = FAISS.from_documents(first_batch, embeddings)
             print(f"✅ Premier batch traité : {len(first_batch)} documents")
             
             # Batches suivants
             for i in range(batch_size, len(docs), batch_size):
                 batch = docs[i:i+batch_size]
-                batch_index = FAISS.from_documents(batch, embeddings)
+                with metrics.batch("vectorize_online.batch", len(batch)):
+                    batch_index = FAISS.from_documents(batch, embeddings)
                 index.merge_from(batch_index)
                 print(f"✅ Batch {i//batch_size + 1} traité : {len(batch)} documents")
         else:
-            index = FAISS.from_documents(docs, embeddings)
+            with metrics.batch("vectorize_online.batch", len(docs)):
+                index = FAISS.from_documents(docs, embeddings)
         
-        print("✅ Vectorisation terminée")
+        duree = time.perf_counter() - debut_vectorisation
+        print(f"✅ Vectorisation terminée ({len(docs) / duree:.1f} documents/s)")
     except Exception as e:
         print(f"❌ ERREUR lors de la vectorisation : {e}")
         input("Appuyez sur Entrée pour fermer...")
@@ -164,11 +129,11 @@ def main():
     # === SAUVEGARDE ===
     print("\n💾 Sauvegarde de l'index...")
     try:
-        index.save_local(DB_FAISS_PATH)
+        index.save_local(INDEX_PATH)
         print("✅ Index FAISS sauvegardé")
         
         # Sauvegarde des métadonnées supplémentaires
-        metadata_file = os.path.join(DB_FAISS_PATH, "metadata.json")
+        metadata_file = os.path.join(INDEX_PATH, "metadata.json")
         import json
         metadata_info = {
             "created_at": datetime.now().isoformat(),
@@ -184,6 +149,12 @@ def main():
         
         print("✅ Métadonnées sauvegardées")
         
+        # Fichiers partagés par les index nommés : documents, BM25, colonnes de métadonnées
+        lexical, columns = sauvegarder_documents_partages(contenus, metadatas, DB_FAISS_PATH)
+        print("✅ Documents partagés sauvegardés")
+        print(f"✅ Index lexical BM25 sauvegardé ({len(lexical.terms)} termes)")
+        print(f"✅ Colonnes de métadonnées sauvegardées ({len(columns.roles)} rôles)")
+        
     except Exception as e:
         print(f"❌ ERREUR lors de la sauvegarde : {e}")
         input("Appuyez sur Entrée pour fermer...")
@@ -194,7 +165,7 @@ def main():
     try:
         # Test de rechargement
         test_index = FAISS.load_local(
-            DB_FAISS_PATH, 
+            INDEX_PATH, 
             embeddings,
             allow_dangerous_deserialization=True
         )
@@ -220,7 +191,7 @@ def main():
     print("\n" + "=" * 60)
     print("🎉 VECTORISATION ONLINE TERMINÉE AVEC SUCCÈS !")
     print(f"✅ {len(docs)} documents vectorisés")
-    print(f"📁 Index sauvegardé dans : {DB_FAISS_PATH}")
+    print(f"📁 Index sauvegardé dans : {INDEX_PATH}")
     print(f"🧠 Modèle utilisé : text-embedding-3-small")
     print("🚀 Vous pouvez maintenant lancer l'interface Gradio")
     print("=" * 60)